@@ -0,0 +1,264 @@
+""" Time each stage of Crystal feature extraction and compare the results against a stored baseline
+
+Run from the repository root, e.g.
+
+    python benchmarks/crystal_benchmark.py --output benchmarks/results.json
+    python benchmarks/crystal_benchmark.py --baseline benchmarks/baseline.json --threshold 0.25
+
+The stages are parsing, oxidation state guessing, vacancy site selection, neighbor analysis with CrystalNN and with
+VectorizedNN, and property table lookups. Each stage runs on every structure in data/test_files and on 1x to 6x
+supercells of one of them. The wall time is the median over the repeats, the peak memory is measured by tracemalloc in
+a separate run so that tracing does not distort the timings, and the throughput is in analyzed sites per second: every
+site for parsing, oxidation state guessing, and vacancy site selection, and the symmetry-distinct O sites, which Crystal
+analyzes, for neighbor analysis and property table lookups.
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+import pymatgen.core
+from pymatgen.analysis.local_env import CrystalNN
+from pymatgen.core import Structure
+
+from deftpy import oxidation
+from deftpy.crystal_analysis import Crystal
+from deftpy.neighbors import VectorizedNN
+from deftpy.oxidation import GuessOxidationStates
+from deftpy.tables import load_tables
+
+TEST_FILES = Path(__file__).parent.parent / "data" / "test_files"
+STAGES = ["parse", "oxidation", "vacancy_sites", "crystal_nn", "vectorized_nn", "lookup"]
+
+
+def measure(function: Callable[[], object], repeat: int) -> Tuple[float, float, int]:
+    """
+    Times a function and measures its peak memory.
+
+    Args:
+        function: The function, which must be repeatable.
+        repeat: The number of timed runs.
+
+    Returns:
+        A tuple of the median and minimum wall times in seconds and the peak traced memory in bytes.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        function()
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return statistics.median(times), min(times), peak_memory
+
+
+def decorated(structure: Structure) -> Structure:
+    """
+    Gets a copy of a structure with guessed oxidation states.
+
+    Args:
+        structure: The structure.
+
+    Returns:
+        The decorated copy.
+    """
+    structure = structure.copy()
+    GuessOxidationStates().assign(structure)
+    return structure
+
+
+def get_stages(
+        source: str,
+        structure: Structure,
+        stages: Sequence[str] = ()
+) -> Dict[str, Tuple[Callable[[], object], int]]:
+    """
+    Gets the benchmarked stages of one structure. Only the selected stages are set up, so the full Crystal analysis
+    the lookups start from runs only if they are selected.
+
+    Args:
+        source: The structure file, or a POSCAR string for synthetic structures.
+        structure: The parsed structure.
+        stages: The stages to get, or an empty sequence for all stages.
+
+    Returns:
+        A dictionary of stage names to tuples of a repeatable function and the number of sites it analyzes.
+    """
+    selected = [name for name in STAGES if not stages or name in stages]
+    decorated_structure = decorated(structure)
+    crystal = Crystal(pymatgen_structure=decorated_structure)
+    crystal_nn = CrystalNN()
+    vectorized_nn = VectorizedNN()
+
+    def parse():
+        if "\n" in source:
+            return Structure.from_str(source, fmt="poscar")
+        return Structure.from_file(source)
+
+    def guess_oxidation_states():
+        # Clear the memoized guesses so that every run pays for the guess
+        oxidation._guesses.clear()
+        return GuessOxidationStates().assign(structure.copy())
+
+    def select_vacancy_sites():
+        return Crystal(pymatgen_structure=decorated_structure, nn_finder=vectorized_nn).view.equivalent_site_groups()
+
+    def lookup():
+        lookup_crystal = Crystal(pymatgen_structure=decorated_structure)
+        lookup_crystal._cn_dicts, lookup_crystal._cn_dicts_initialized = crystal.cn_dicts, True
+        lookup_crystal._site_indices, lookup_crystal._multiplicities = crystal.site_indices, crystal.multiplicities
+        return lookup_crystal.compute()
+
+    functions = {
+        "parse": parse,
+        "oxidation": guess_oxidation_states,
+        "vacancy_sites": select_vacancy_sites,
+        "crystal_nn": lambda: [crystal_nn.get_cn_dict(decorated_structure, i) for i in o_indices],
+        "vectorized_nn": lambda: vectorized_nn.get_cn_dicts(crystal.view, o_indices),
+        "lookup": lookup,
+    }
+    n_analyzed = dict.fromkeys(selected, len(structure))
+    if {"crystal_nn", "vectorized_nn"} & set(selected):
+        # The symmetry-distinct O sites, as Crystal analyzes them, found without running the neighbor analysis
+        view = crystal.view
+        o_indices = [group[0] for group in view.equivalent_site_groups()
+                     if view.symbols[view.species_codes[group[0]]] == "O"]
+        n_analyzed.update(crystal_nn=len(o_indices), vectorized_nn=len(o_indices))
+    if "lookup" in selected:
+        # The lookups start from a finished neighbor analysis, which is not part of their timings
+        n_analyzed["lookup"] = len(crystal.site_indices)
+    return {name: (functions[name], n_analyzed[name]) for name in selected}
+
+
+def get_cases(supercell_file: str, max_supercell: int) -> List[Tuple[str, str, Structure]]:
+    """
+    Gets the benchmarked structures.
+
+    Args:
+        supercell_file: The name of the test file the supercells are built from.
+        max_supercell: The largest supercell scaling factor.
+
+    Returns:
+        A list of tuples of the case name, the source, and the structure.
+    """
+    cases = []
+    for path in sorted(TEST_FILES.iterdir()):
+        cases.append((path.name, str(path), Structure.from_file(path)))
+    unit_cell = Structure.from_file(TEST_FILES / supercell_file)
+    for scale in range(1, max_supercell + 1):
+        supercell = unit_cell * (scale, scale, scale)
+        cases.append((f"{supercell_file}_{scale}x", supercell.to(fmt="poscar"), supercell))
+    return cases
+
+
+def run(repeat: int, supercell_file: str, max_supercell: int, stages: List[str]) -> dict:
+    """
+    Runs the benchmarks.
+
+    Args:
+        repeat: The number of timed runs of each stage.
+        supercell_file: The name of the test file the supercells are built from.
+        max_supercell: The largest supercell scaling factor.
+        stages: The stages to run, or an empty list for all stages.
+
+    Returns:
+        The results, with the environment metadata.
+    """
+    load_tables()
+    results = []
+    for case, source, structure in get_cases(supercell_file, max_supercell):
+        for stage, (function, n_analyzed) in get_stages(source, structure, stages).items():
+            wall_time, min_time, peak_memory = measure(function, repeat)
+            results.append({
+                "case": case,
+                "stage": stage,
+                "n_sites": len(structure),
+                "n_analyzed": n_analyzed,
+                "wall_time": wall_time,
+                "min_time": min_time,
+                "peak_memory": peak_memory,
+                "throughput": n_analyzed / wall_time if wall_time > 0 else None,
+            })
+            print(f"{case:32s} {stage:14s} {wall_time * 1000:10.2f} ms {peak_memory / 2 ** 20:8.2f} MiB")
+    return {
+        "metadata": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "pymatgen": pymatgen.core.__version__,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float, min_time: float) -> List[str]:
+    """
+    Compares results against a baseline.
+
+    Args:
+        results: The new results.
+        baseline: The baseline results.
+        threshold: The allowed relative increase in wall time or peak memory, e.g. 0.25 for 25%.
+        min_time: The wall time in seconds below which timings are too noisy to compare.
+
+    Returns:
+        A list of regression messages, empty if there are none.
+    """
+    baseline_results = {(r["case"], r["stage"]): r for r in baseline["results"]}
+    regressions = []
+    for result in results["results"]:
+        old = baseline_results.get((result["case"], result["stage"]))
+        if old is None:
+            continue
+        name = f"{result['case']} {result['stage']}"
+        if max(result["wall_time"], old["wall_time"]) >= min_time and \
+                result["wall_time"] > old["wall_time"] * (1 + threshold):
+            regressions.append(
+                f"{name}: wall time {old['wall_time'] * 1000:.2f} ms -> {result['wall_time'] * 1000:.2f} ms"
+            )
+        if old["peak_memory"] > 0 and result["peak_memory"] > old["peak_memory"] * (1 + threshold):
+            regressions.append(f"{name}: peak memory {old['peak_memory']} B -> {result['peak_memory']} B")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0].strip())
+    parser.add_argument("--output", default="benchmarks/results.json", help="The results file to write.")
+    parser.add_argument("--baseline", help="A results file to compare against.")
+    parser.add_argument("--threshold", type=float, default=0.25, help="The allowed relative regression.")
+    parser.add_argument("--min-time", type=float, default=0.001, help="The noise floor of timings in seconds.")
+    parser.add_argument("--repeat", type=int, default=5, help="The number of timed runs of each stage.")
+    parser.add_argument("--supercell-file", default="OQMD_CaTiO3_POSCAR.txt", help="The test file to scale up.")
+    parser.add_argument("--max-supercell", type=int, default=6, help="The largest supercell scaling factor.")
+    parser.add_argument("--stage", action="append", default=[], choices=STAGES,
+                        help="Run only this stage; can be repeated.")
+    args = parser.parse_args()
+
+    results = run(args.repeat, args.supercell_file, args.max_supercell, args.stage)
+    with open(args.output, "w") as file:
+        json.dump(results, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.threshold, args.min_time)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Union
+
+import numpy as np
+from pymatgen.core import Structure
+
+
+def structure_fingerprint(structure: Structure, **settings) -> str:
+    """
+    Computes a canonical hash of a structure and the settings its analysis depends on.
+
+    The lattice, species, oxidation states, and fractional coordinates are rounded so that numerically identical
+    structures read from different sources hash the same. Site order is preserved, because results refer to sites by
+    index.
+
+    Args:
+        structure: The structure.
+        **settings: The analysis settings, e.g. the near-neighbor finder and species symbol.
+
+    Returns:
+        A hexadecimal SHA-256 digest.
+
+    Examples:
+        >>> key = structure_fingerprint(structure, nn_finder=CrystalNN(), species_symbol="O")
+    """
+    digest = hashlib.sha256()
+    # Adding 0.0 turns negative zeros into positive zeros, which have different bytes
+    digest.update((np.round(structure.lattice.matrix, 6) + 0.0).astype(np.float64).tobytes())
+    digest.update((np.mod(np.round(structure.frac_coords, 6), 1.0) + 0.0).astype(np.float64).tobytes())
+    species = [(site.specie.symbol, round(float(getattr(site.specie, "oxi_state", 0) or 0), 6)) for site in structure]
+    digest.update(json.dumps(species).encode())
+    digest.update(json.dumps({key: _describe(value) for key, value in sorted(settings.items())}).encode())
+    return digest.hexdigest()
+
+
+def _describe(value: Any) -> Any:
+    """
+    Describes a setting in a JSON-serializable form, using the class name and attributes of objects.
+
+    Args:
+        value: The setting.
+
+    Returns:
+        A JSON-serializable description.
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_describe(v) for v in value]
+    if hasattr(value, "__dict__"):
+        return [type(value).__name__, {k: _describe(v) for k, v in sorted(vars(value).items())}]
+    return repr(value)
+
+
+class CoordinationCache:
+    """
+    A persistent, size-limited cache of coordination analysis results, keyed by structure fingerprint.
+
+    Entries are stored in an SQLite database, which several worker processes can share. When the cache grows beyond
+    max_entries or max_bytes, the least recently used entries are evicted.
+
+    Attributes:
+        path: The path to the SQLite database.
+        max_entries: The maximum number of entries, or None for no limit.
+        max_bytes: The maximum total size of the stored results in bytes, or None for no limit.
+
+    Examples:
+        >>> cache = CoordinationCache("~/.cache/deftpy/coordination.sqlite", max_entries=100000)
+        >>> crystal = Crystal(filepath="POSCAR", cache=cache)
+    """
+
+    def __init__(
+            self,
+            path: Union[str, Path],
+            max_entries: Optional[int] = None,
+            max_bytes: Optional[int] = None,
+            timeout: float = 60
+    ):
+        """
+        Initializes the CoordinationCache object, creating the database if needed.
+
+        Args:
+            path: The path to the SQLite database.
+            max_entries: The maximum number of entries, or None for no limit.
+            max_bytes: The maximum total size of the stored results in bytes, or None for no limit.
+            timeout: The number of seconds to wait for a lock held by another process.
+        """
+        self.path = Path(path).expanduser()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self._connection = None
+        self._pid = None
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Gets the connection of the current process, opening a new one after a fork.
+
+        Returns:
+            The SQLite connection.
+        """
+        if self._connection is None or self._pid != os.getpid():
+            self._connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._pid = os.getpid()
+        return self._connection
+
+    def _serialize(self, value: Any) -> Union[str, bytes]:
+        """
+        Serializes a result for storage.
+
+        Args:
+            value: The JSON-serializable result.
+
+        Returns:
+            The serialized result.
+        """
+        return json.dumps(value)
+
+    def _deserialize(self, serialized: Union[str, bytes]) -> Any:
+        """
+        Deserializes a stored result.
+
+        Args:
+            serialized: The serialized result.
+
+        Returns:
+            The result.
+        """
+        return json.loads(serialized)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Gets a cached result and marks it as recently used.
+
+        Args:
+            key: The structure fingerprint.
+
+        Returns:
+            The cached result, or None on a miss.
+        """
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """
+        Gets many cached results and marks them as recently used.
+
+        Args:
+            keys: The structure fingerprints.
+
+        Returns:
+            A dictionary of the fingerprints that were hit to their results.
+        """
+        keys = list(dict.fromkeys(keys))
+        connection = self._connect()
+        results = {}
+        # SQLite limits the number of parameters of a statement
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ", ".join("?" * len(chunk))
+            rows = connection.execute(f"SELECT key, value FROM entries WHERE key IN ({placeholders})", chunk).fetchall()
+            if rows:
+                connection.execute(
+                    f"UPDATE entries SET accessed = ? WHERE key IN ({', '.join('?' * len(rows))})",
+                    [time.time()] + [key for key, _ in rows]
+                )
+            results.update((key, self._deserialize(value)) for key, value in rows)
+        return results
+
+    def put(self, key: str, value: Any):
+        """
+        Stores a result, evicting the least recently used entries if the cache is over its limits.
+
+        Args:
+            key: The structure fingerprint.
+            value: The result.
+        """
+        self.put_many({key: value})
+
+    def put_many(self, values: Dict[str, Any]):
+        """
+        Stores many results in one transaction, evicting the least recently used entries if the cache is over its
+        limits.
+
+        Args:
+            values: A dictionary of structure fingerprints to results.
+        """
+        rows = []
+        accessed = time.time()
+        for key, value in values.items():
+            serialized = self._serialize(value)
+            rows.append((key, serialized, len(serialized), accessed))
+        connection = self._connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.executemany(
+                "INSERT OR REPLACE INTO entries (key, value, size, accessed) VALUES (?, ?, ?, ?)", rows
+            )
+            self._evict(connection)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def _evict(self, connection: sqlite3.Connection):
+        """
+        Deletes the least recently used entries until the cache is within its limits.
+
+        Args:
+            connection: The SQLite connection, inside a write transaction.
+        """
+        if self.max_entries is not None:
+            connection.execute(
+                "DELETE FROM entries WHERE key IN "
+                "(SELECT key FROM entries ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+        if self.max_bytes is not None:
+            connection.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM "
+                "(SELECT key, SUM(size) OVER (ORDER BY accessed DESC, key) AS total FROM entries) WHERE total > ?)",
+                (self.max_bytes,)
+            )
+
+    def clear(self):
+        """
+        Deletes all entries.
+        """
+        self._connect().execute("DELETE FROM entries")
+
+    def __len__(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def __contains__(self, key: str) -> bool:
+        return self._connect().execute("SELECT 1 FROM entries WHERE key = ?", (key,)).fetchone() is not None
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        state["_connection"] = None
+        state["_pid"] = None
+        return state
+
+
+class DescriptorCache(CoordinationCache):
+    """
+    A persistent, size-limited cache of descriptor vectors, keyed by structure fingerprint.
+
+    Vectors are stored as raw float32 bytes, the precision the pySIPFENN models run at, so a cached KS2022 descriptor
+    takes about 1 kB.
+
+    Examples:
+        >>> cache = DescriptorCache("~/.cache/deftpy/descriptors.sqlite")
+        >>> predict_formation_energies(paths, cache=cache, n_workers=8)
+    """
+
+    def _serialize(self, value: np.ndarray) -> bytes:
+        return np.ascontiguousarray(value, dtype=np.float32).tobytes()
+
+    def _deserialize(self, serialized: bytes) -> np.ndarray:
+        return np.frombuffer(serialized, dtype=np.float32)
@@ -0,0 +1,400 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+FeatureInput = Union[pd.DataFrame, Mapping[str, Any], np.ndarray]
+
+
+def _huber_regressor() -> Any:
+    """
+    Creates the default regressor of crystal feature models.
+
+    Returns:
+        A scikit-learn HuberRegressor.
+    """
+    from sklearn.linear_model import HuberRegressor
+    return HuberRegressor()
+
+
+def _feature_matrix(X: FeatureInput, features: Sequence[str]) -> np.ndarray:
+    """
+    Gets the feature columns of an input as a float matrix.
+
+    Args:
+        X: A dataframe or mapping with the feature columns, such as Crystal.site_features with an Eg column added, or
+            a matrix whose columns are already the features in order.
+        features: The feature names.
+
+    Returns:
+        A matrix with one row per sample and one column per feature.
+
+    Raises:
+        ValueError: If a matrix does not have one column per feature.
+    """
+    if isinstance(X, np.ndarray):
+        X = np.asarray(X, dtype=float)
+        if X.ndim != 2 or X.shape[1] != len(features):
+            raise ValueError(f"Expected a matrix with {len(features)} columns, got shape {X.shape}.")
+        return X
+    if isinstance(X, pd.DataFrame):
+        return X[list(features)].to_numpy(dtype=float)
+    return np.column_stack([np.asarray(X[feature], dtype=float) for feature in features])
+
+
+class CrystalFeatureModel:
+    """
+    A linear crystal feature model (CFM) of a target, such as the vacancy formation energy, in per-site features.
+
+    Predictions are one matrix product over the feature columns, so scoring many sites never iterates over rows.
+
+    Attributes:
+        features: The feature names, e.g. ("Eb_sum", "Vr_max", "Eg").
+        coef: The coefficients, aligned with features.
+        intercept: The intercept.
+        target: The target name, e.g. "Ev".
+        metadata: Information about the fit, such as the dataset, charge state, number of samples, and
+            cross-validated errors.
+
+    Examples:
+        >>> model = fit_cfm(df, ["Eb_sum", "Vr_max", "Eg"])
+        >>> model.predict(crystal.site_features.assign(Eg=3.2))
+    """
+
+    def __init__(
+            self,
+            features: Sequence[str],
+            coef: Sequence[float],
+            intercept: float,
+            target: str = "Ev",
+            metadata: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Initializes the CrystalFeatureModel object.
+
+        Args:
+            features: The feature names.
+            coef: The coefficients, aligned with features.
+            intercept: The intercept.
+            target: The target name.
+            metadata: Information about the fit.
+
+        Raises:
+            ValueError: If there is not one coefficient per feature.
+        """
+        self.features = tuple(features)
+        self.coef = np.asarray(coef, dtype=float)
+        self.intercept = float(intercept)
+        self.target = target
+        self.metadata = dict(metadata or {})
+        if self.coef.shape != (len(self.features),):
+            raise ValueError(f"Expected {len(self.features)} coefficients, got {self.coef.shape}.")
+
+    def predict(self, X: FeatureInput) -> np.ndarray:
+        """
+        Predicts the target of many samples.
+
+        Args:
+            X: A dataframe or mapping with the feature columns, or a matrix whose columns are the features in order.
+
+        Returns:
+            An array with one prediction per sample, NaN where a feature is NaN.
+        """
+        return _feature_matrix(X, self.features) @ self.coef + self.intercept
+
+    @property
+    def equation(self) -> str:
+        """
+        The model as an equation, e.g. "Ev = 1.23 + 0.45 Eb_sum - 0.67 Vr_max".
+        """
+        terms = "".join(f" {'-' if c < 0 else '+'} {abs(c):.2f} {f}" for f, c in zip(self.features, self.coef))
+        return f"{self.target} = {self.intercept:.2f}{terms}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Gets the model as a JSON-serializable dictionary.
+
+        Returns:
+            A dictionary with the features, coefficients, intercept, target, and metadata.
+        """
+        return {
+            "features": list(self.features),
+            "coef": self.coef.tolist(),
+            "intercept": self.intercept,
+            "target": self.target,
+            "metadata": self.metadata,
+        }
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "CrystalFeatureModel":
+        """
+        Rebuilds a model from to_dict.
+
+        Args:
+            d: The dictionary.
+
+        Returns:
+            The CrystalFeatureModel object.
+        """
+        return cls(d["features"], d["coef"], d["intercept"], target=d.get("target", "Ev"), metadata=d.get("metadata"))
+
+    def __repr__(self) -> str:
+        return f"CrystalFeatureModel({self.equation})"
+
+
+def kfold_indices(n_samples: int, n_splits: int = 5, random_state: Optional[int] = 0) -> List[np.ndarray]:
+    """
+    Splits sample indices into shuffled folds of nearly equal size.
+
+    Args:
+        n_samples: The number of samples.
+        n_splits: The number of folds.
+        random_state: The seed of the shuffle, or None to keep the samples in order.
+
+    Returns:
+        The test indices of each fold.
+
+    Raises:
+        ValueError: If there are fewer samples than folds or fewer than two folds.
+    """
+    if n_splits < 2 or n_samples < n_splits:
+        raise ValueError(f"Cannot split {n_samples} samples into {n_splits} folds.")
+    indices = np.arange(n_samples)
+    if random_state is not None:
+        indices = np.random.default_rng(random_state).permutation(n_samples)
+    return np.array_split(indices, n_splits)
+
+
+def _fit_arrays(
+        X: np.ndarray,
+        y: np.ndarray,
+        features: Sequence[str],
+        target: str,
+        n_splits: int,
+        regressor: Optional[Callable[[], Any]],
+        random_state: Optional[int],
+        metadata: Dict[str, Any]
+) -> CrystalFeatureModel:
+    """
+    Fits a model on complete arrays, cross-validating it first.
+
+    Args:
+        X: The feature matrix.
+        y: The target values.
+        features: The feature names.
+        target: The target name.
+        n_splits: The number of cross-validation folds, or 0 to skip cross-validation. Capped at the number of
+            samples; with fewer than 2 samples, cross-validation is skipped.
+        regressor: A function creating an unfitted linear regressor with fit, coef_, and intercept_.
+        random_state: The seed of the fold shuffle.
+        metadata: Information about the fit to keep in the model.
+
+    Returns:
+        The model fitted on all samples, with the number of folds used in its metadata.
+
+    Raises:
+        ValueError: If there are no samples.
+    """
+    if len(y) == 0:
+        raise ValueError("Cannot fit a model without complete rows.")
+    regressor = regressor or _huber_regressor
+    n_splits = min(n_splits, len(y)) if n_splits >= 2 and len(y) >= 2 else 0
+    metadata = dict(metadata, n=len(y), n_splits=n_splits)
+    if n_splits:
+        residuals = np.empty(len(y))
+        for test in kfold_indices(len(y), n_splits, random_state):
+            train = np.ones(len(y), dtype=bool)
+            train[test] = False
+            fold_model = regressor().fit(X[train], y[train])
+            residuals[test] = X[test] @ np.ravel(fold_model.coef_) + float(fold_model.intercept_) - y[test]
+        metadata.update(cv_mae=float(np.abs(residuals).mean()),
+                        cv_rmse=float(np.sqrt((residuals ** 2).mean())))
+    fitted = regressor().fit(X, y)
+    model = CrystalFeatureModel(features, np.ravel(fitted.coef_), float(fitted.intercept_), target, metadata)
+    model.metadata["mae"] = float(np.abs(model.predict(X) - y).mean())
+    return model
+
+
+def _complete_arrays(df: pd.DataFrame, features: Sequence[str], target: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Gets the features and target of the rows where none of them is missing.
+
+    Args:
+        df: The dataframe.
+        features: The feature names.
+        target: The target name.
+
+    Returns:
+        A tuple of the feature matrix and the target values.
+    """
+    X = df[list(features)].to_numpy(dtype=float)
+    y = df[target].to_numpy(dtype=float)
+    complete = ~(np.isnan(X).any(axis=1) | np.isnan(y))
+    return X[complete], y[complete]
+
+
+def fit_cfm(
+        df: pd.DataFrame,
+        features: Sequence[str],
+        target: str = "Ev",
+        n_splits: int = 5,
+        regressor: Optional[Callable[[], Any]] = None,
+        random_state: Optional[int] = 0,
+        metadata: Optional[Dict[str, Any]] = None
+) -> CrystalFeatureModel:
+    """
+    Fits a crystal feature model with k-fold cross-validation. Rows missing a feature or the target are dropped.
+
+    Args:
+        df: The dataframe with the feature and target columns.
+        features: The feature names, e.g. ["Eb_sum", "Vr_max", "Eg"].
+        target: The target name, e.g. "Ev".
+        n_splits: The number of cross-validation folds, or 0 to skip cross-validation. Capped at the number of
+            complete rows; with fewer than 2 rows, cross-validation is skipped.
+        regressor: A function creating an unfitted linear regressor with fit, coef_, and intercept_. Defaults to
+            scikit-learn's HuberRegressor.
+        random_state: The seed of the fold shuffle.
+        metadata: Information about the fit to keep in the model.
+
+    Returns:
+        The model fitted on all complete rows, with the number of samples, number of folds used, training MAE, and
+        cross-validated MAE and RMSE in its metadata.
+
+    Raises:
+        ValueError: If no row is complete.
+
+    Examples:
+        >>> model = fit_cfm(df_cf, ["Eb_sum", "Vr_max", "Eg"])
+        >>> model.metadata["cv_mae"]
+    """
+    X, y = _complete_arrays(df, features, target)
+    return _fit_arrays(X, y, features, target, n_splits, regressor, random_state, metadata or {})
+
+
+def _fit_task(task: Tuple) -> CrystalFeatureModel:
+    """
+    Fits one model in a worker process.
+
+    Args:
+        task: The arguments of _fit_arrays.
+
+    Returns:
+        The fitted model.
+    """
+    return _fit_arrays(*task)
+
+
+def fit_cfms(
+        datasets: Mapping[str, pd.DataFrame],
+        feature_sets: Iterable[Sequence[str]],
+        target: str = "Ev",
+        group_column: Optional[str] = "charge",
+        n_splits: int = 5,
+        regressor: Optional[Callable[[], Any]] = None,
+        random_state: Optional[int] = 0,
+        n_workers: Optional[int] = None
+) -> List[CrystalFeatureModel]:
+    """
+    Fits crystal feature models for every combination of dataset, charge state, and feature set across a process
+    pool, cross-validating each.
+
+    Args:
+        datasets: Dataframes keyed by dataset name, with the feature and target columns.
+        feature_sets: The feature sets, e.g. [["Vr_max", "Eg"], ["Eb_sum", "Vr_max", "Eg"]].
+        target: The target name, e.g. "Ev".
+        group_column: The column to fit a separate model for each value of, e.g. the charge state, or None to fit
+            each dataset as a whole. Datasets without the column are fit as a whole.
+        n_splits: The number of cross-validation folds, or 0 to skip cross-validation. Capped at the number of
+            complete rows of each group; groups with fewer than 2 are fit without cross-validation.
+        regressor: A function creating an unfitted linear regressor with fit, coef_, and intercept_. It must be
+            picklable to run in a process pool. Defaults to scikit-learn's HuberRegressor.
+        random_state: The seed of the fold shuffles.
+        n_workers: The number of worker processes. Defaults to the number of CPUs; 1 runs in the current process.
+
+    Returns:
+        The fitted models, with the dataset name, group value, and number of folds used in their metadata, in the
+        order of the datasets, groups, and feature sets. Groups without complete rows for a feature set are skipped.
+
+    Examples:
+        >>> feature_sets = [["Vr_max", "Eg"], ["Eb_sum", "Vr_max", "Eg"]]
+        >>> models = fit_cfms({"kumagai": df_kumagai, "witman": df_witman}, feature_sets)
+        >>> save_models(models, "cfms.json")
+    """
+    feature_sets = [tuple(features) for features in feature_sets]
+    tasks = []
+    for name, df in datasets.items():
+        if group_column is not None and group_column in df.columns:
+            groups = [(group, rows) for group, rows in df.groupby(group_column, sort=True)]
+        else:
+            groups = [(None, df)]
+        for (group, rows), features in product(groups, feature_sets):
+            group = group.item() if isinstance(group, np.generic) else group
+            X, y = _complete_arrays(rows, features, target)
+            if len(y) == 0:
+                continue
+            metadata = {"dataset": name, group_column or "group": group}
+            tasks.append((X, y, features, target, n_splits, regressor, random_state, metadata))
+
+    if n_workers == 1 or len(tasks) < 2:
+        return [_fit_task(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=n_workers or os.cpu_count() or 1) as executor:
+        return list(executor.map(_fit_task, tasks))
+
+
+def predict_many(models: Sequence[CrystalFeatureModel], X: FeatureInput) -> pd.DataFrame:
+    """
+    Predicts many samples with many models in one matrix product over the union of their features.
+
+    Args:
+        models: The models.
+        X: A dataframe or mapping with the feature columns of all models.
+
+    Returns:
+        A dataframe with one row per sample and one column per model, labeled by the position of the model.
+    """
+    features = list(dict.fromkeys(feature for model in models for feature in model.features))
+    columns = {feature: j for j, feature in enumerate(features)}
+    coef = np.zeros((len(features), len(models)))
+    uses = np.zeros((len(features), len(models)), dtype=bool)
+    for k, model in enumerate(models):
+        rows = [columns[feature] for feature in model.features]
+        coef[rows, k] = model.coef
+        uses[rows, k] = True
+    intercepts = np.array([model.intercept for model in models])
+    # A NaN feature only affects the models that use it
+    matrix = _feature_matrix(X, features)
+    missing = np.isnan(matrix)
+    predictions = np.where(missing, 0, matrix) @ coef + intercepts
+    predictions[missing.astype(float) @ uses > 0] = np.nan
+    return pd.DataFrame(predictions, columns=list(range(len(models))))
+
+
+def save_models(models: Iterable[CrystalFeatureModel], path: Union[str, Path]):
+    """
+    Writes models to a JSON file.
+
+    Args:
+        models: The models.
+        path: The path to the JSON file.
+    """
+    with open(path, "w") as file:
+        json.dump([model.to_dict() for model in models], file, indent=2)
+
+
+def load_models(path: Union[str, Path]) -> List[CrystalFeatureModel]:
+    """
+    Reads models written by save_models.
+
+    Args:
+        path: The path to the JSON file.
+
+    Returns:
+        The models.
+    """
+    with open(path) as file:
+        return [CrystalFeatureModel.from_dict(d) for d in json.load(file)]
@@ -0,0 +1,354 @@
+import argparse
+import importlib.util
+import json
+import os
+import sys
+from glob import glob
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple, Union
+
+import pandas as pd
+from pymatgen.analysis.local_env import CrystalNN
+from tqdm import tqdm
+
+from deftpy import profiling
+from deftpy.cache import CoordinationCache
+from deftpy.crystal_analysis import iter_featurize_structures
+from deftpy.neighbors import VectorizedNN
+from deftpy.tables import LookupMode
+
+CHECKPOINT_NAME = "checkpoint.jsonl"
+SHARD_FORMATS = ("parquet", "csv")
+
+
+def read_manifest(path: Union[str, Path]) -> List[Path]:
+    """
+    Reads a manifest file listing one structure file per line.
+
+    Args:
+        path: The path to the manifest, whose entries are relative to it, with # for comments.
+
+    Returns:
+        The paths of the structure files.
+    """
+    path = Path(path).expanduser()
+    with open(path) as file:
+        lines = [line.strip() for line in file]
+    return [path.parent / line for line in lines if line and not line.startswith("#")]
+
+
+def iter_inputs(
+        sources: Iterable[Union[str, Path]],
+        pattern: str = "*",
+        manifests: Iterable[Union[str, Path]] = ()
+) -> Iterator[str]:
+    """
+    Expands input sources into structure file paths, each yielded once.
+
+    Args:
+        sources: Structure files, directories, whose files matching pattern are used, or glob patterns.
+        pattern: The file name pattern used in directories.
+        manifests: Manifest files, listing one structure file per line with paths relative to the manifest and # for
+            comments. Their entries come before the sources.
+
+    Yields:
+        The absolute paths of the structure files, sorted within each directory or glob pattern.
+
+    Raises:
+        FileNotFoundError: If a source is neither a file, a directory, nor a glob pattern matching any file.
+
+    Examples:
+        >>> list(iter_inputs(["data/test_files"], pattern="*POSCAR*"))
+    """
+    groups = [read_manifest(manifest) for manifest in manifests]
+    for source in sources:
+        source = Path(source).expanduser()
+        if source.is_dir():
+            paths = sorted(path for path in source.glob(pattern) if path.is_file() and not path.name.startswith("."))
+        elif source.is_file():
+            paths = [source]
+        else:
+            paths = sorted(Path(path) for path in glob(str(source), recursive=True) if os.path.isfile(path))
+            if not paths:
+                raise FileNotFoundError(f"No structure files match {str(source)!r}.")
+        groups.append(paths)
+
+    seen = set()
+    for paths in groups:
+        for path in paths:
+            path = os.path.abspath(path)
+            if path not in seen:
+                seen.add(path)
+                yield path
+
+
+def _read_checkpoint(path: Path) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Reads the complete lines of a checkpoint file.
+
+    Args:
+        path: The path to the checkpoint file.
+
+    Returns:
+        A tuple of the records and the size in bytes of the complete lines before the first incomplete one.
+    """
+    records, size = [], 0
+    if path.exists():
+        with open(path, "rb") as file:
+            for line in file:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break
+                size += len(line)
+    return records, size
+
+
+def read_checkpoint(output_dir: Union[str, Path]) -> List[Dict[str, Any]]:
+    """
+    Reads the records of the shards written to an output directory.
+
+    A line cut short by a crash, and anything after it, is ignored, so its inputs are featurized again.
+
+    Args:
+        output_dir: The output directory.
+
+    Returns:
+        One record per shard, with the shard file name (None if no structure succeeded), the inputs, and the errors
+        keyed by input.
+    """
+    return _read_checkpoint(Path(output_dir) / CHECKPOINT_NAME)[0]
+
+
+class ShardWriter:
+    """
+    Writes featurized structures to numbered shards and records each shard in a checkpoint file once it is complete.
+
+    A shard is written to a temporary file and renamed, then its inputs are appended to the checkpoint, so after a
+    crash every input in the checkpoint is in a complete shard and every other input is featurized again.
+
+    Attributes:
+        output_dir: The output directory.
+        fmt: The shard format, "parquet" or "csv".
+        completed: The inputs recorded in the checkpoint.
+        failed: The errors of the inputs that failed, keyed by input.
+    """
+
+    def __init__(self, output_dir: Union[str, Path], fmt: str = "parquet"):
+        """
+        Initializes the ShardWriter object, reading the checkpoint of an earlier run if there is one.
+
+        Args:
+            output_dir: The output directory, created if needed.
+            fmt: The shard format, "parquet" or "csv".
+
+        Raises:
+            ValueError: If the format is unknown.
+            ImportError: If the format is parquet and pyarrow is not installed.
+        """
+        if fmt not in SHARD_FORMATS:
+            raise ValueError(f"Unknown shard format {fmt!r}; use one of {SHARD_FORMATS}.")
+        if fmt == "parquet" and importlib.util.find_spec("pyarrow") is None:
+            raise ImportError("Writing parquet shards requires pyarrow; install it or use the csv format.")
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.fmt = fmt
+        checkpoint = self.output_dir / CHECKPOINT_NAME
+        records, size = _read_checkpoint(checkpoint)
+        if checkpoint.exists() and checkpoint.stat().st_size != size:
+            # Drop the line cut short by a crash, so that new records start on a line of their own
+            os.truncate(checkpoint, size)
+        self.completed: Set[str] = {path for record in records for path in record["inputs"]}
+        self.failed: Dict[str, str] = {}
+        for record in records:
+            self.failed.update(record["errors"])
+            for path in record["inputs"]:
+                if path not in record["errors"]:
+                    self.failed.pop(path, None)
+        self._n_shards = len(records)
+
+    def write(self, inputs: Sequence[str], frames: List[pd.DataFrame], errors: Dict[str, str]) -> Optional[Path]:
+        """
+        Writes one shard and records it in the checkpoint.
+
+        Args:
+            inputs: The inputs featurized in the shard, including those that failed.
+            frames: The site features of the inputs that succeeded.
+            errors: The error messages of the inputs that failed, keyed by input.
+
+        Returns:
+            The path to the shard, or None if no input succeeded.
+        """
+        shard = None
+        if frames:
+            shard = self.output_dir / f"part-{self._n_shards:05d}.{self.fmt}"
+            temporary_path = shard.with_name(f"{shard.name}.tmp")
+            df = pd.concat(frames, ignore_index=True)
+            if self.fmt == "parquet":
+                df.to_parquet(temporary_path, index=False)
+            else:
+                df.to_csv(temporary_path, index=False)
+            os.replace(temporary_path, shard)
+        record = {"shard": shard.name if shard else None, "inputs": list(inputs), "errors": errors}
+        with open(self.output_dir / CHECKPOINT_NAME, "a") as file:
+            file.write(json.dumps(record) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+        self._n_shards += 1
+        self.completed.update(inputs)
+        for path in inputs:
+            self.failed.pop(path, None)
+        self.failed.update(errors)
+        return shard
+
+
+def featurize_to_shards(
+        inputs: Iterable[str],
+        output_dir: Union[str, Path],
+        fmt: str = "parquet",
+        shard_size: int = 1000,
+        retry_failed: bool = False,
+        n_workers: Optional[int] = None,
+        chunksize: int = 1,
+        progress: bool = False,
+        **crystal_kwargs
+) -> Tuple[int, int]:
+    """
+    Featurizes structure files across a process pool into shards of site features, skipping the inputs that an
+    earlier run already recorded in the checkpoint.
+
+    Each shard holds the site_features rows of up to shard_size structures, with an input column giving the
+    structure file of each row.
+
+    Args:
+        inputs: The structure file paths.
+        output_dir: The output directory.
+        fmt: The shard format, "parquet" or "csv".
+        shard_size: The number of structures per shard.
+        retry_failed: Whether to featurize the inputs that failed in an earlier run again.
+        n_workers: The number of worker processes. Defaults to the number of CPUs; 1 runs in the current process.
+        chunksize: The number of structures sent to a worker at a time.
+        progress: Whether to show a progress bar.
+        **crystal_kwargs: Keyword arguments passed to Crystal, e.g. nn_finder or species_symbol.
+
+    Returns:
+        A tuple of the number of structures featurized and the number that failed in this run.
+
+    Examples:
+        >>> featurize_to_shards(iter_inputs(["structures/"]), "features/", n_workers=8)
+    """
+    writer = ShardWriter(output_dir, fmt)
+    skipped = writer.completed if not retry_failed else writer.completed - set(writer.failed)
+    pending = [path for path in inputs if path not in skipped]
+
+    n_done, n_failed = 0, 0
+    batch, frames, errors = [], [], {}
+    results = iter_featurize_structures(pending, n_workers=n_workers, chunksize=chunksize, **crystal_kwargs)
+    for result in tqdm(results, total=len(pending), disable=not progress):
+        path = pending[result.index]
+        batch.append(path)
+        if result.error is not None:
+            errors[path] = result.error
+            n_failed += 1
+        else:
+            frames.append(result.site_features.assign(input=path))
+        n_done += 1
+        if len(batch) >= shard_size:
+            writer.write(batch, frames, errors)
+            batch, frames, errors = [], [], {}
+    if batch:
+        writer.write(batch, frames, errors)
+    return n_done, n_failed
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """
+    Builds the parser of the command-line arguments.
+
+    Returns:
+        The argument parser.
+    """
+    parser = argparse.ArgumentParser(
+        prog="deftpy",
+        description="Featurize the oxygen sites of many structures into resumable shards of site features."
+    )
+    parser.add_argument("inputs", nargs="*", help="Structure files, directories, or glob patterns of structure files.")
+    parser.add_argument("-o", "--output", required=True, help="The output directory of the shards and checkpoint.")
+    parser.add_argument(
+        "--manifest", action="append", default=[],
+        help="A file listing one structure file per line, relative to it. May be given more than once."
+    )
+    parser.add_argument("--pattern", default="*", help="The file name pattern used in input directories.")
+    parser.add_argument("--format", choices=SHARD_FORMATS, default="parquet", help="The shard format.")
+    parser.add_argument("--shard-size", type=int, default=1000, help="The number of structures per shard.")
+    parser.add_argument("--retry-failed", action="store_true", help="Featurize inputs that failed before again.")
+    parser.add_argument("-j", "--workers", type=int, help="The number of worker processes; defaults to all CPUs.")
+    parser.add_argument("--chunksize", type=int, default=1, help="The number of structures sent to a worker at a time.")
+    parser.add_argument("--species", default="O", help="The symbol of the species whose sites are analyzed.")
+    parser.add_argument("--all-sites", action="store_true", help="Report every site, not only distinct ones.")
+    parser.add_argument("--vectorized", action="store_true", help="Use VectorizedNN instead of CrystalNN.")
+    parser.add_argument("--weights", action="store_true", help="Use weighted coordination numbers.")
+    parser.add_argument(
+        "--lookup-mode", choices=[mode.value for mode in LookupMode], default=LookupMode.DISCRETE.value,
+        help="How neighbor oxidation states are matched to the property tables."
+    )
+    parser.add_argument("--cache", help="An SQLite coordination cache shared by the workers.")
+    parser.add_argument("--profile", help="A JSON lines file to record the duration of each analysis stage in.")
+    parser.add_argument("-q", "--quiet", action="store_true", help="Do not show progress.")
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """
+    Runs the deftpy command.
+
+    Args:
+        argv: The command-line arguments, by default those of the process.
+
+    Returns:
+        The exit status: 0 if every structure was featurized, 1 if some failed, and 2 for invalid arguments.
+
+    Examples:
+        $ deftpy structures/ -o features/ -j 16
+        $ deftpy --manifest manifest.txt -o features/ --format csv --vectorized --all-sites
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not args.inputs and not args.manifest:
+        parser.error("give structure files, directories, glob patterns, or --manifest")
+    if args.profile:
+        profiling.enable(args.profile)
+    crystal_kwargs = {
+        "species_symbol": args.species,
+        "all_sites": args.all_sites,
+        "nn_finder": VectorizedNN(weighted_cn=args.weights) if args.vectorized else CrystalNN(weighted_cn=args.weights),
+        "use_weights": args.weights,
+        "lookup_mode": args.lookup_mode,
+    }
+    if args.cache:
+        crystal_kwargs["cache"] = CoordinationCache(args.cache)
+
+    try:
+        n_done, n_failed = featurize_to_shards(
+            iter_inputs(args.inputs, args.pattern, args.manifest),
+            args.output,
+            fmt=args.format,
+            shard_size=args.shard_size,
+            retry_failed=args.retry_failed,
+            n_workers=args.workers,
+            chunksize=args.chunksize,
+            progress=not args.quiet,
+            **crystal_kwargs
+        )
+    except (FileNotFoundError, ImportError, ValueError) as e:
+        print(f"deftpy: error: {e}", file=sys.stderr)
+        return 2
+    if not args.quiet:
+        print(f"Featurized {n_done - n_failed} structures into {args.output}; {n_failed} failed.", file=sys.stderr)
+    return 1 if n_failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
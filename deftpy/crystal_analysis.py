@@ -1,19 +1,29 @@
+import os
 import re
-import sys
-from enum import Enum
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 from pathlib import Path
-from typing import List, Tuple, Optional, Dict, Callable
+from typing import Any, Iterable, Iterator, List, NamedTuple, Tuple, Optional, Dict, Union
 
 import numpy as np
 import pandas as pd
 from ase.visualize import view
-from pymatgen.analysis.defects.generators import VacancyGenerator
 from pymatgen.analysis.local_env import CrystalNN
 from pymatgen.core import Species, Structure
 from pymatgen.io.ase import AseAtomsAdaptor
 
-EB_DICT = {"filepath": "../data/Eb.csv", "column_name": "Eb", "comparison": "os"}
-VR_DICT = {"filepath": "../data/Vr.csv", "column_name": "Vr", "comparison": "n"}
+from deftpy.cache import CoordinationCache, structure_fingerprint
+from deftpy.neighbors import VectorizedNN
+from deftpy.oxidation import GuessOxidationStates, OxidationStateAssigner, has_oxidation_states
+from deftpy.profiling import StageStats, apply_settings, get_process_stats, get_settings, is_enabled, stage
+from deftpy.species import SpeciesKey, parse_species, parse_species_many
+from deftpy.structure_store import StructureStore, get_structure_store, load_structure, set_structure_store
+from deftpy.structure_view import StructureView
+from deftpy.tables import LookupMode, get_index, get_table, load_tables
+
+EB_DICT = {"table": "Eb", "column_name": "Eb", "comparison": "os"}
+VR_DICT = {"table": "Vr", "column_name": "Vr", "comparison": "n"}
 
 
 class Crystal:
@@ -22,15 +32,33 @@ class Crystal:
 
     Attributes:
         structure: The pymatgen Structure object.
-        nn_finder: The CrystalNN object.
-        eb: The bond dissociation enthalpies.
-        vr: The reduction potentials.
+        filepath: The file the structure was loaded from, if any.
+        stats: The duration and call count of each analysis stage, recorded while profiling is enabled.
+        nn_finder: The near-neighbor finder.
+        eb: The shared bond dissociation enthalpy table.
+        vr: The shared reduction potential table.
+        cache: The persistent cache of coordination analysis results, if any.
+        oxidation_assigner: The strategy that assigns oxidation states if the structure has none.
+        oxidation_strategy: The name of the strategy that assigned the oxidation states, or "structure" if the
+            structure already had them.
+        lookup_mode: How neighbor oxidation states are matched to the rows of the property tables.
+        view: A compact array-backed view of the structure, used by the symmetry and neighbor stages.
         cn_dicts: A list of coordination number dictionaries.
+        site_indices: The structure indices of the sites described by cn_dicts.
+        multiplicities: The number of symmetry-equivalent sites of each site described by cn_dicts.
         bond_dissociation_enthalpies: A list of bond dissociation enthalpies.
         reduction_potentials: A list of reduction potentials.
+        site_features: A dataframe of aggregated per-site features.
+
+    The features are computed on first access, so constructing a Crystal only parses the structure.
 
 
     Methods:
+        get_cn_matrix: Gets the coordination numbers as a dense site by neighbor species matrix.
+        compute: Computes all features now instead of on first access.
+        invalidate: Discards all computed features.
+        with_vacancy: Derives the analysis of the structure with one site removed.
+        with_substitution: Derives the analysis of the structure with one site substituted.
         visualize: Visualizes the crystal structure using ASE's view function.
 
 
@@ -55,7 +83,7 @@ class Crystal:
         return re.split(r"(?=\d)", s, maxsplit=1)
 
     @staticmethod
-    def _parse_species_string(species_string: str) -> Tuple[Optional[Species], str, int]:
+    def _parse_species_string(species_string: str) -> Tuple[Optional[Species], str, float]:
         """
         Parses a species string.
 
@@ -68,31 +96,47 @@ class Crystal:
         Examples:
             # TODO: Add examples
         """
-        # Check if the string is of valid format before trying to parse
-        if not re.match(r"[A-Za-z]+\d+\+", species_string):
-            split_str = Crystal._split_before_first_number(species_string)
-            return None, split_str[0], round(float(split_str[1][:-1]))
-
-        species = Species.from_string(species_string)
-        return species, species.symbol, species.oxi_state
+        # Fractional oxidation states, e.g. Fe2.67+, are kept as they are so that lookups can match or interpolate them
+        try:
+            symbol, oxidation_state = parse_species(species_string)
+        except ValueError:
+            symbol, oxidation_state = Crystal._split_before_first_number(species_string)
+            sign = -1 if oxidation_state.endswith("-") else 1
+            return None, symbol, sign * float(oxidation_state.rstrip("+-"))
+        return Species(symbol, oxidation_state), symbol, oxidation_state
 
     def __init__(
             self,
             filepath: Optional[str] = None,
             poscar_string: Optional[str] = None,
             pymatgen_structure: Optional[Structure] = None,
-            nn_finder: Optional[CrystalNN] = None,
+            nn_finder: Optional[Union[CrystalNN, VectorizedNN]] = None,
             use_weights: Optional[bool] = False,
-            species_symbol: Optional[str] = "O"
+            species_symbol: Optional[str] = "O",
+            all_sites: Optional[bool] = False,
+            cache: Optional[CoordinationCache] = None,
+            oxidation_assigner: Optional[OxidationStateAssigner] = None,
+            lookup_mode: Union[str, LookupMode] = LookupMode.DISCRETE
     ):
         """
         Initializes the Crystal object.
 
         Args:
-            filepath: The filepath to the POSCAR file.
+            filepath: The filepath to the POSCAR file. It is loaded through the structure store, if one is set.
             poscar_string: The POSCAR string.
             pymatgen_structure: The pymatgen Structure object.
-            nn_finder: The CrystalNN object.
+            nn_finder: The near-neighbor finder, CrystalNN by default. Finders with a get_cn_dicts method, such as
+                VectorizedNN, analyze all sites in one call.
+            use_weights: Whether to use weighted coordination numbers.
+            species_symbol: The symbol of the species whose sites are analyzed.
+            all_sites: If True, report every site of the species, broadcasting the analysis of each symmetry-distinct
+                site to its equivalent sites. If False, report only the symmetry-distinct sites.
+            cache: A persistent cache of coordination analysis results. On a hit, no neighbor analysis is run.
+            oxidation_assigner: The strategy that assigns oxidation states if the structure has none, by default the
+                memoized guess for the reduced composition.
+            lookup_mode: "discrete" to use the table row with the nearest oxidation state, within 0.01, of each
+                neighbor, or "continuous" to also interpolate between rows for fractional and mixed-valence oxidation
+                states, e.g. Fe2.8+.
 
         Raises:
             ValueError: If neither filepath, poscar_string, nor pymatgen_structure is specified.
@@ -100,10 +144,14 @@ class Crystal:
         Examples:
             # TODO: Add examples
         """
+        self.filepath = filepath
+        self.stats = StageStats()
         if filepath:
-            self.structure = Structure.from_file(filepath)
+            with stage(self.stats, "parse", self):
+                self.structure = load_structure(filepath)
         elif poscar_string:
-            self.structure = Structure.from_str(poscar_string, fmt="poscar")
+            with stage(self.stats, "parse", self):
+                self.structure = Structure.from_str(poscar_string, fmt="poscar")
         elif pymatgen_structure:
             self.structure = pymatgen_structure
         else:
@@ -113,15 +161,235 @@ class Crystal:
         self.use_weights = use_weights
 
         self.species_symbol = species_symbol
+        self.all_sites = all_sites
+        self.cache = cache
+        self.oxidation_assigner = oxidation_assigner or GuessOxidationStates()
+        self.oxidation_strategy = None
+        self.lookup_mode = LookupMode(lookup_mode)
+
+        self.eb = get_table(EB_DICT["table"])
+        self.vr = get_table(VR_DICT["table"])
+
+        self.invalidate()
+
+    @property
+    def view(self) -> StructureView:
+        """
+        The array-backed view of the structure, with oxidation states assigned, built on first access.
+        """
+        if self._view is None:
+            self._assign_oxidation_states()
+            with stage(self.stats, "view", self):
+                self._view = StructureView.from_structure(self.structure)
+        return self._view
+
+    @property
+    def profile_label(self) -> str:
+        """
+        The label of the Crystal in profiling records: the filepath, or the formula if there is none.
+        """
+        return self.filepath or self.structure.composition.formula
+
+    @property
+    def cn_dicts(self) -> List[Dict[str, float]]:
+        """
+        The coordination number dictionaries, computed on first access.
+        """
+        return self._initialize_structure_analysis()
+
+    @property
+    def site_indices(self) -> List[int]:
+        """
+        The structure indices of the sites described by cn_dicts, computed on first access.
+        """
+        self._initialize_structure_analysis()
+        return self._site_indices
+
+    @property
+    def multiplicities(self) -> List[int]:
+        """
+        The number of symmetry-equivalent sites of each site described by cn_dicts, computed on first access.
+        """
+        self._initialize_structure_analysis()
+        if self._multiplicities is None:
+            # Derived crystals find the symmetry of the modified structure only when it is asked for
+            sizes = {int(i): len(group) for group in self.view.equivalent_site_groups() for i in group}
+            self._multiplicities = [sizes[i] for i in self._site_indices]
+        return self._multiplicities
+
+    @property
+    def bond_dissociation_enthalpies(self) -> List[Dict[str, float]]:
+        """
+        The bond dissociation enthalpies of the neighbors of each site, computed on first access.
+        """
+        if self._bond_dissociation_enthalpies is None:
+            self._bond_dissociation_enthalpies = self._get_values(
+                EB_DICT["table"], EB_DICT["column_name"], EB_DICT["comparison"]
+            )
+        return self._bond_dissociation_enthalpies
+
+    @property
+    def reduction_potentials(self) -> List[Dict[str, float]]:
+        """
+        The reduction potentials of the neighbors of each site, computed on first access.
+        """
+        if self._reduction_potentials is None:
+            self._reduction_potentials = self._get_values(
+                VR_DICT["table"], VR_DICT["column_name"], VR_DICT["comparison"]
+            )
+        return self._reduction_potentials
+
+    def compute(self) -> "Crystal":
+        """
+        Computes all features now instead of on first access.
 
-        package_dir = Path(__file__).parent
-        self.eb = pd.read_csv(package_dir / EB_DICT["filepath"])
-        self.vr = pd.read_csv(package_dir / VR_DICT["filepath"])
+        Returns:
+            The Crystal object.
+
+        Examples:
+            >>> crystals = [Crystal(filepath=path) for path in paths]
+            >>> crystals = [crystal.compute() for crystal in crystals if len(crystal.structure) < 200]
+        """
+        self._initialize_structure_analysis()
+        _ = self.bond_dissociation_enthalpies
+        _ = self.reduction_potentials
+        _ = self.site_features
+        return self
 
+    def invalidate(self):
+        """
+        Discards all computed features, e.g. after modifying the structure, so they are computed again on next access.
+        """
+        self._view = None
         self._cn_dicts_initialized = False
-        self.cn_dicts = []
-        self.bond_dissociation_enthalpies = self._get_values(self.eb, EB_DICT["column_name"], EB_DICT["comparison"])
-        self.reduction_potentials = self._get_values(self.vr, VR_DICT["column_name"], VR_DICT["comparison"])
+        self._cn_dicts = []
+        self._site_indices = []
+        self._multiplicities = []
+        self._all_site_cn_dicts = None
+        self._bond_dissociation_enthalpies = None
+        self._reduction_potentials = None
+        self._site_features = None
+
+    def with_vacancy(self, index: int) -> "Crystal":
+        """
+        Derives the analysis of the structure with one site removed, reusing the analysis of this structure.
+
+        Only the sites within the neighbor search cutoff of the vacancy are analyzed again, so enumerating every
+        vacancy of a cell costs one local neighbor analysis per vacancy instead of a whole-cell analysis.
+
+        Args:
+            index: The index of the removed site.
+
+        Returns:
+            A Crystal of the defective structure, reporting every site of the species as if all_sites were set. Its
+            site indices refer to the defective structure.
+
+        Examples:
+            >>> crystal = Crystal(filepath="POSCAR", nn_finder=VectorizedNN())
+            >>> defects = [crystal.with_vacancy(i) for i in crystal.view.site_indices("O")]
+        """
+        return self._derive(index, None)
+
+    def with_substitution(self, index: int, species: Union[str, Species]) -> "Crystal":
+        """
+        Derives the analysis of the structure with one site substituted, reusing the analysis of this structure.
+
+        Only the sites within the neighbor search cutoff of the substituted site are analyzed again.
+
+        Args:
+            index: The index of the substituted site.
+            species: The new species, e.g. "N3-". Give an oxidation state so that the neighbor analysis can use it.
+
+        Returns:
+            A Crystal of the substituted structure, reporting every site of the species as if all_sites were set.
+        """
+        return self._derive(index, species)
+
+    def _get_all_site_cn_dicts(self) -> Dict[int, Dict[str, float]]:
+        """
+        Gets the coordination number dictionary of every site of the species, broadcasting those of the
+        symmetry-distinct sites to their equivalent sites.
+
+        Returns:
+            A dictionary of site indices to coordination number dictionaries.
+        """
+        if self._all_site_cn_dicts is None:
+            if self.all_sites:
+                self._all_site_cn_dicts = dict(zip(self.site_indices, self.cn_dicts))
+            else:
+                groups = {int(group[0]): group for group in self.view.equivalent_site_groups()}
+                self._all_site_cn_dicts = {
+                    int(i): cn_dict for representative, cn_dict in zip(self.site_indices, self.cn_dicts)
+                    for i in groups[representative]
+                }
+        return self._all_site_cn_dicts
+
+    def _derive(self, index: int, species: Optional[Union[str, Species]]) -> "Crystal":
+        """
+        Derives the analysis of the structure with one site removed or substituted.
+
+        Args:
+            index: The index of the removed or substituted site.
+            species: The new species, or None to remove the site.
+
+        Returns:
+            A Crystal of the modified structure.
+        """
+        pristine = self._get_all_site_cn_dicts()
+        cutoff = getattr(self.nn_finder, "search_cutoff", 7)
+        affected = {
+            neighbor.index for neighbor in
+            self.structure.get_sites_in_sphere(self.structure[index].coords, cutoff, include_index=True)
+        }
+        affected.add(index)
+
+        structure = self.structure.copy()
+        if species is None:
+            structure.remove_sites([index])
+            view = self.view.remove_site(index)
+            old_indices = [i for i in range(len(self.structure)) if i != index]
+        else:
+            structure.replace(index, species)
+            view = self.view.replace_site(index, structure[index].specie)
+            old_indices = list(range(len(self.structure)))
+
+        derived = Crystal(
+            pymatgen_structure=structure,
+            nn_finder=self.nn_finder,
+            use_weights=self.use_weights,
+            species_symbol=self.species_symbol,
+            all_sites=True,
+            oxidation_assigner=self.oxidation_assigner,
+            lookup_mode=self.lookup_mode
+        )
+        derived.oxidation_strategy = self.oxidation_strategy
+        derived._view = view
+        site_indices = view.site_indices(self.species_symbol).tolist()
+        recompute = [i for i in site_indices if old_indices[i] in affected or old_indices[i] not in pristine]
+        with stage(derived.stats, "neighbors", derived):
+            if hasattr(self.nn_finder, "get_cn_dicts"):
+                cn_dicts = self.nn_finder.get_cn_dicts(view, recompute, use_weights=self.use_weights)
+            else:
+                cn_dicts = [self.nn_finder.get_cn_dict(structure, i, use_weights=self.use_weights) for i in recompute]
+        recomputed = dict(zip(recompute, cn_dicts))
+
+        derived._site_indices = site_indices
+        derived._cn_dicts = [
+            recomputed[i] if i in recomputed else dict(pristine[old_indices[i]]) for i in site_indices
+        ]
+        derived._multiplicities = None
+        derived._cn_dicts_initialized = True
+        return derived
+
+    def _assign_oxidation_states(self):
+        """
+        Assigns oxidation states with the oxidation assigner if the structure has none, and records the strategy.
+        """
+        if not has_oxidation_states(self.structure):
+            with stage(self.stats, "oxidation", self):
+                self.oxidation_strategy = self.oxidation_assigner.assign(self.structure)
+        elif self.oxidation_strategy is None:
+            self.oxidation_strategy = "structure"
 
     def _initialize_structure_analysis(self) -> List[Dict[str, int]]:
         """
@@ -134,24 +402,79 @@ class Crystal:
             # TODO: Add examples
         """
         if self._cn_dicts_initialized:
-            return self.cn_dicts
+            return self._cn_dicts
 
         # Check for oxidation states and add them if they are not present in the structure object already
-        if sum([x.oxi_state != 0 for x in self.structure.species]) == 0:
-            self.structure.add_oxidation_state_by_guess()
-        vacancy_generator = VacancyGenerator()
-        vacancies = vacancy_generator.get_defects(self.structure)
-        indices = [v.defect_site_index for v in vacancies if v.site.specie.symbol == self.species_symbol]
-        self.cn_dicts = [self.nn_finder.get_cn_dict(self.structure, i, use_weights=self.use_weights) for i in indices]
+        self._assign_oxidation_states()
+
+        cache_key = None
+        if self.cache is not None:
+            cache_key = structure_fingerprint(
+                self.structure,
+                nn_finder=self.nn_finder,
+                use_weights=self.use_weights,
+                species_symbol=self.species_symbol,
+                all_sites=self.all_sites
+            )
+            with stage(self.stats, "cache_get", self):
+                cached = self.cache.get(cache_key)
+            if cached is not None:
+                self._cn_dicts = cached["cn_dicts"]
+                self._site_indices = cached["site_indices"]
+                self._multiplicities = cached["multiplicities"]
+                self._cn_dicts_initialized = True
+                return self._cn_dicts
+
+        # The symmetry-distinct vacancy sites, as pymatgen's VacancyGenerator finds them, straight from spglib
+        view = self.view
+        with stage(self.stats, "vacancy_sites", self):
+            species_codes = [code for code, symbol in enumerate(view.symbols) if symbol == self.species_symbol]
+            equivalent_indices = [
+                group.tolist() for group in view.equivalent_site_groups()
+                if view.species_codes[group[0]] in species_codes
+            ]
+            indices = [group[0] for group in equivalent_indices]
+        with stage(self.stats, "neighbors", self):
+            if hasattr(self.nn_finder, "get_cn_dicts"):
+                cn_dicts = self.nn_finder.get_cn_dicts(view, indices, use_weights=self.use_weights)
+            else:
+                cn_dicts = [
+                    self.nn_finder.get_cn_dict(self.structure, i, use_weights=self.use_weights) for i in indices
+                ]
+
+        if self.all_sites:
+            # Each equivalent site gets its own copy of the coordination number dictionary of its distinct site
+            broadcast = sorted(
+                ((i, cn_dict, len(group)) for group, cn_dict in zip(equivalent_indices, cn_dicts) for i in group),
+                key=lambda x: x[0]
+            )
+            self._site_indices = [i for i, _, _ in broadcast]
+            self._cn_dicts = [dict(cn_dict) for _, cn_dict, _ in broadcast]
+            self._multiplicities = [multiplicity for _, _, multiplicity in broadcast]
+        else:
+            self._site_indices = indices
+            self._cn_dicts = cn_dicts
+            self._multiplicities = [len(group) for group in equivalent_indices]
         self._cn_dicts_initialized = True
-        return self.cn_dicts
 
-    def _get_values(self, dataframe: pd.DataFrame, column_name: str, comparison: str) -> List[Dict[str, float]]:
+        if cache_key is not None:
+            with stage(self.stats, "cache_put", self):
+                self.cache.put(cache_key, {
+                    "cn_dicts": self._cn_dicts,
+                    "site_indices": self._site_indices,
+                    "multiplicities": self._multiplicities,
+                })
+        return self._cn_dicts
+
+    def _get_values(self, table: str, column_name: str, comparison: str) -> List[Dict[str, float]]:
         """
-        Gets the values from the dataframe.
+        Gets the values from a property table.
+
+        All distinct neighbor species of the structure are resolved in one vectorized lookup and the results are
+        broadcast back to the per-site dictionaries.
 
         Args:
-            dataframe: The dataframe.
+            table: The property table name.
             column_name: The column name.
             comparison: The comparison column name.
 
@@ -161,21 +484,110 @@ class Crystal:
         Examples:
             # TODO: Add examples
         """
-        self._initialize_structure_analysis()
-        values = []
-        for cn_dict in self.cn_dicts:
-            value = {}
+        species_strings = self._get_neighbor_species()
+        with stage(self.stats, "lookup", self):
+            values = self._lookup(parse_species_many(species_strings), table, column_name, comparison, self.lookup_mode)
+            lookup = dict(zip(species_strings, values.tolist()))
+            return [{species_string: lookup[species_string] for species_string in cn_dict} for cn_dict in self.cn_dicts]
+
+    def _get_neighbor_species(self) -> List[str]:
+        """
+        Gets the distinct neighbor species strings of all sites, in order of first appearance.
+
+        Returns:
+            A list of species strings.
+        """
+        return list(dict.fromkeys(species_string for cn_dict in self.cn_dicts for species_string in cn_dict))
+
+    @staticmethod
+    def _lookup(
+            species_keys: List[SpeciesKey],
+            table: str,
+            column_name: str,
+            comparison: str,
+            mode: Union[str, LookupMode] = LookupMode.DISCRETE
+    ) -> np.ndarray:
+        """
+        Looks up the values of species in a property table in one vectorized call.
+
+        Args:
+            species_keys: The element symbols and oxidation states of the species, from parse_species_many.
+            table: The property table name.
+            column_name: The column name.
+            comparison: The comparison column name.
+            mode: "discrete" or "continuous", see LookupMode.
+
+        Returns:
+            An array of values, with NaN for species missing from the table.
+        """
+        index = get_index(table, column_name, comparison)
+        symbols = [key.symbol for key in species_keys]
+        return index.get_many(symbols, [key.oxidation_state for key in species_keys], mode=mode)
+
+    def get_cn_matrix(self) -> Tuple[List[str], np.ndarray]:
+        """
+        Gets the coordination numbers as a dense site by neighbor species matrix.
+
+        Returns:
+            A tuple of the neighbor species strings and a matrix with one row per site in cn_dicts and one column per
+            neighbor species.
+
+        Examples:
+            >>> species, cn_matrix = crystal.get_cn_matrix()
+            >>> species
+            ['Ti4+', 'Ca2+']
+        """
+        species_strings = self._get_neighbor_species()
+        columns = {species_string: j for j, species_string in enumerate(species_strings)}
+        cn_matrix = np.zeros((len(self.cn_dicts), len(species_strings)))
+        for i, cn_dict in enumerate(self.cn_dicts):
             for species_string, cn in cn_dict.items():
-                species = Species.from_string(species_string)
-                symbol = species.symbol
-                oxidation_state = species.oxi_state
-                condition = (dataframe.elem == symbol) & (dataframe[comparison] == oxidation_state)
-                if not dataframe.loc[condition, column_name].empty:
-                    value[species_string] = dataframe.loc[condition, column_name].iloc[0]
-                else:
-                    value[species_string] = np.nan
-            values.append(value)
-        return values
+                cn_matrix[i, columns[species_string]] = cn
+        return species_strings, cn_matrix
+
+    @property
+    def site_features(self) -> pd.DataFrame:
+        """
+        The per-site features as a dataframe with one row per site in cn_dicts, computed on first access.
+
+        The columns are the site index and multiplicity, the total coordination number CN (weighted if use_weights is
+        set), the CN-weighted sum and mean of the neighbor bond dissociation enthalpies Eb_sum and Eb_mean, and the
+        maximum and CN-weighted mean of the neighbor reduction potentials Vr_max and Vr_mean. Aggregates are NaN when
+        a neighbor's value is missing from the tables or the site has no neighbors.
+
+        Examples:
+            >>> crystal.site_features[["Eb_sum", "Vr_max"]]
+        """
+        if self._site_features is None:
+            species_strings, cn_matrix = self.get_cn_matrix()
+            species_keys = parse_species_many(species_strings)
+            with stage(self.stats, "site_features", self):
+                eb = self._lookup(
+                    species_keys, EB_DICT["table"], EB_DICT["column_name"], EB_DICT["comparison"], self.lookup_mode
+                )
+                vr = self._lookup(
+                    species_keys, VR_DICT["table"], VR_DICT["column_name"], VR_DICT["comparison"], self.lookup_mode
+                )
+                bonded = cn_matrix > 0
+                cn = cn_matrix.sum(axis=1)
+                eb_sum = np.where(bonded, cn_matrix * eb, 0).sum(axis=1)
+                eb_sum[(bonded & np.isnan(eb)).any(axis=1) | (cn == 0)] = np.nan
+                vr_sum = np.where(bonded, cn_matrix * vr, 0).sum(axis=1)
+                vr_max = np.where(bonded, vr, -np.inf).max(axis=1, initial=-np.inf)
+                vr_missing = (bonded & np.isnan(vr)).any(axis=1) | (cn == 0)
+                vr_sum[vr_missing] = np.nan
+                vr_max[vr_missing] = np.nan
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    self._site_features = pd.DataFrame({
+                        "site_index": np.array(self.site_indices, dtype=int),
+                        "multiplicity": np.array(self.multiplicities, dtype=int),
+                        "CN": cn,
+                        "Eb_sum": eb_sum,
+                        "Eb_mean": eb_sum / cn,
+                        "Vr_max": vr_max,
+                        "Vr_mean": vr_sum / cn,
+                    })
+        return self._site_features
 
     def visualize(self):
         """
@@ -198,3 +610,185 @@ class Crystal:
             # TODO: Add examples
         """
         return f"Crystal({self.structure})"
+
+
+class CrystalFeatures(NamedTuple):
+    """
+    The features of one structure computed by featurize_structures.
+
+    Attributes:
+        index: The position of the structure in the input.
+        cn_dicts: A list of coordination number dictionaries, or None if featurization failed.
+        bond_dissociation_enthalpies: A list of bond dissociation enthalpies, or None if featurization failed.
+        reduction_potentials: A list of reduction potentials, or None if featurization failed.
+        error: The error message if featurization failed, otherwise None.
+        site_features: A dataframe of aggregated per-site features, or None if featurization failed.
+        stats: The stage stats of the Crystal as a dictionary if profiling is enabled, otherwise None.
+    """
+    index: int
+    cn_dicts: Optional[List[Dict[str, float]]]
+    bond_dissociation_enthalpies: Optional[List[Dict[str, float]]]
+    reduction_potentials: Optional[List[Dict[str, float]]]
+    error: Optional[str] = None
+    site_features: Optional[pd.DataFrame] = None
+    stats: Optional[Dict[str, Dict[str, float]]] = None
+
+
+StructureInput = Union[Structure, str, Path]
+
+
+def _crystal_from_input(item: StructureInput, **crystal_kwargs) -> Crystal:
+    """
+    Builds a Crystal from a structure, a file path, or a POSCAR string.
+
+    Args:
+        item: The structure, file path, or POSCAR string.
+        **crystal_kwargs: Keyword arguments passed to Crystal.
+
+    Returns:
+        The Crystal object.
+    """
+    if isinstance(item, Structure):
+        return Crystal(pymatgen_structure=item, **crystal_kwargs)
+    if isinstance(item, Path) or (isinstance(item, str) and "\n" not in item and os.path.isfile(item)):
+        return Crystal(filepath=str(item), **crystal_kwargs)
+    if isinstance(item, str):
+        return Crystal(poscar_string=item, **crystal_kwargs)
+    raise TypeError(f"Cannot build a Crystal from {type(item).__name__}.")
+
+
+def _featurize_one(indexed_item: Tuple[int, StructureInput], crystal_kwargs: Dict[str, Any]) -> CrystalFeatures:
+    """
+    Featurizes one structure, capturing any error instead of raising it.
+
+    Args:
+        indexed_item: The position of the structure in the input and the structure itself.
+        crystal_kwargs: Keyword arguments passed to Crystal.
+
+    Returns:
+        The features of the structure.
+    """
+    index, item = indexed_item
+    try:
+        crystal = _crystal_from_input(item, **crystal_kwargs).compute()
+    except Exception as e:
+        return CrystalFeatures(index, None, None, None, f"{type(e).__name__}: {e}")
+    return CrystalFeatures(
+        index,
+        crystal.cn_dicts,
+        crystal.bond_dissociation_enthalpies,
+        crystal.reduction_potentials,
+        site_features=crystal.site_features,
+        stats=crystal.stats.as_dict() if is_enabled() else None
+    )
+
+
+def _initialize_worker(structure_store: Optional[StructureStore], profiling_settings: Tuple[bool, Optional[Path]]):
+    """
+    Prepares a worker process by loading the property tables and applying the structure store and profiling settings
+    of the parent.
+
+    Args:
+        structure_store: The structure store of the parent process.
+        profiling_settings: The profiling settings of the parent process.
+    """
+    load_tables()
+    set_structure_store(structure_store)
+    apply_settings(profiling_settings)
+
+
+def _featurize_chunk(chunk: List[Tuple[int, StructureInput]], crystal_kwargs: Dict[str, Any]) -> List[CrystalFeatures]:
+    """
+    Featurizes a chunk of structures in a worker process.
+
+    Args:
+        chunk: The positions of the structures in the input and the structures themselves.
+        crystal_kwargs: Keyword arguments passed to Crystal.
+
+    Returns:
+        The features of the structures.
+    """
+    return [_featurize_one(indexed_item, crystal_kwargs) for indexed_item in chunk]
+
+
+def iter_featurize_structures(
+        structures: Iterable[StructureInput],
+        n_workers: Optional[int] = None,
+        chunksize: int = 1,
+        max_pending: Optional[int] = None,
+        **crystal_kwargs
+) -> Iterator[CrystalFeatures]:
+    """
+    Featurizes many structures across a process pool, yielding results in input order as they complete.
+
+    The input is consumed lazily and at most max_pending chunks are in flight, so memory stays flat however many
+    structures the input yields. If profiling is enabled, the stage stats of the workers are merged into the process
+    stats of the caller.
+
+    Args:
+        structures: Pymatgen Structure objects, file paths, or POSCAR strings.
+        n_workers: The number of worker processes. Defaults to the number of CPUs; 1 runs in the current process.
+        chunksize: The number of structures sent to a worker at a time.
+        max_pending: The maximum number of chunks in flight. Defaults to twice the number of workers.
+        **crystal_kwargs: Keyword arguments passed to Crystal, e.g. nn_finder or species_symbol.
+
+    Yields:
+        CrystalFeatures, one per input structure.
+
+    Examples:
+        >>> for result in iter_featurize_structures(iter_witman_records(data_path), n_workers=8):
+        ...     print(result.site_features)
+    """
+    items = enumerate(structures)
+    if n_workers == 1:
+        load_tables()
+        for item in items:
+            yield _featurize_one(item, crystal_kwargs)
+        return
+
+    n_workers = n_workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * n_workers
+    with ProcessPoolExecutor(
+            max_workers=n_workers, initializer=_initialize_worker, initargs=(get_structure_store(), get_settings())
+    ) as executor:
+        pending = deque()
+        while True:
+            while len(pending) < max_pending:
+                chunk = list(islice(items, chunksize))
+                if not chunk:
+                    break
+                pending.append(executor.submit(_featurize_chunk, chunk, crystal_kwargs))
+            if not pending:
+                return
+            for result in pending.popleft().result():
+                if result.stats:
+                    get_process_stats().merge(result.stats)
+                yield result
+
+
+def featurize_structures(
+        structures: Iterable[StructureInput],
+        n_workers: Optional[int] = None,
+        chunksize: int = 1,
+        **crystal_kwargs
+) -> List[CrystalFeatures]:
+    """
+    Featurizes many structures across a process pool.
+
+    The property tables are loaded once per worker, results are returned in input order, and a structure that fails
+    to featurize is reported through the error field of its result instead of aborting the batch.
+
+    Args:
+        structures: Pymatgen Structure objects, file paths, or POSCAR strings.
+        n_workers: The number of worker processes. Defaults to the number of CPUs; 1 runs in the current process.
+        chunksize: The number of structures sent to a worker at a time.
+        **crystal_kwargs: Keyword arguments passed to Crystal, e.g. nn_finder or species_symbol.
+
+    Returns:
+        A list of CrystalFeatures, one per input structure.
+
+    Examples:
+        >>> results = featurize_structures(glob("data/test_files/*.cif"), n_workers=4)
+        >>> failed = [r for r in results if r.error]
+    """
+    return list(iter_featurize_structures(structures, n_workers=n_workers, chunksize=chunksize, **crystal_kwargs))
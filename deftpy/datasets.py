@@ -0,0 +1,582 @@
+import gzip
+import json
+import os
+import tarfile
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from glob import glob
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, NamedTuple, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from pymatgen.core import Structure
+
+from deftpy.crystal_analysis import CrystalFeatures, iter_featurize_structures
+from deftpy.oxidation import SiteOxidationStates
+from deftpy.structure_store import load_structure
+
+
+class DefectRecord(NamedTuple):
+    """
+    The defect calculations of one structure in a dataset.
+
+    Attributes:
+        filename: The name of the structure, without directory or extension.
+        defectid: The identifier of the structure.
+        rows: The dataset rows of the defects in the structure.
+        structure: The pymatgen Structure object, decorated with oxidation states if they are available.
+        oxidation_states: The per-site oxidation states, or None if they are not available.
+    """
+    filename: str
+    defectid: str
+    rows: pd.DataFrame
+    structure: Optional[Structure]
+    oxidation_states: Optional[List[float]]
+
+
+def iter_witman_records(
+        data_path: Union[str, Path],
+        defectname: Optional[str] = "V_O",
+        formula_filter: Optional[Callable[[str], bool]] = None,
+        parse_structures: bool = True
+) -> Iterator[DefectRecord]:
+    """
+    Streams the defect records of a dataset in the Witman layout, one structure at a time.
+
+    The layout has one CSV per structure in csvs/, named after the structure, with matching POSCARs in
+    poscars/<filename>_POSCAR_wyck and run-length encoded oxidation states in oxstate/<filename>_oxstate. Files are
+    opened only when their record is reached, and rows are filtered on defectname and formula before the POSCAR is
+    read, so skipped structures are never parsed. POSCARs are loaded through the structure store, if one is set.
+
+    Args:
+        data_path: The dataset directory.
+        defectname: The defect name to keep, e.g. "V_O", or None to keep all defects.
+        formula_filter: A function of the formula that returns True for structures to keep.
+        parse_structures: Whether to read and parse the POSCAR and oxidation state files.
+
+    Yields:
+        One DefectRecord per structure with matching defects.
+
+    Examples:
+        >>> binary_or_ternary = lambda formula: 2 <= len(Composition(formula).elements) <= 3
+        >>> for record in iter_witman_records(data_path, formula_filter=binary_or_ternary):
+        ...     print(record.defectid, len(record.structure))
+    """
+    data_path = Path(data_path)
+    for csv_path in sorted(glob(str(data_path / "csvs" / "*.csv"))):
+        rows = pd.read_csv(csv_path)
+        if defectname is not None:
+            rows = rows[rows["defectname"] == defectname]
+        if formula_filter is not None and not rows.empty:
+            rows = rows[rows["formula"].map(formula_filter).astype(bool)]
+        if rows.empty:
+            continue
+
+        filename = Path(csv_path).stem
+        defectid = filename.split(".")[-1]
+        rows = rows.assign(filename=filename, defectid=defectid).reset_index(drop=True)
+        structure = None
+        oxidation_states = None
+        if parse_structures:
+            structure = load_structure(data_path / "poscars" / f"{filename}_POSCAR_wyck", fmt="poscar")
+            oxstate_path = data_path / "oxstate" / f"{filename}_oxstate"
+            if oxstate_path.exists():
+                assigner = SiteOxidationStates.from_file(oxstate_path)
+                assigner.assign(structure)
+                oxidation_states = assigner.oxidation_states
+        yield DefectRecord(filename, defectid, rows, structure, oxidation_states)
+
+
+def featurize_records(
+        records: Iterable[DefectRecord],
+        n_workers: Optional[int] = None,
+        chunksize: int = 1,
+        **crystal_kwargs
+) -> Iterator[Tuple[DefectRecord, CrystalFeatures]]:
+    """
+    Featurizes streamed defect records across a process pool, keeping only the records in flight in memory.
+
+    Args:
+        records: The defect records, with parsed structures.
+        n_workers: The number of worker processes. Defaults to the number of CPUs; 1 runs in the current process.
+        chunksize: The number of structures sent to a worker at a time.
+        **crystal_kwargs: Keyword arguments passed to Crystal, e.g. nn_finder or species_symbol.
+
+    Yields:
+        Each record with the features of its structure, in input order.
+
+    Examples:
+        >>> for record, features in featurize_records(iter_witman_records(data_path), n_workers=8):
+        ...     print(record.defectid, features.site_features)
+    """
+    pending = deque()
+
+    def structures():
+        for record in records:
+            pending.append(record)
+            yield record.structure
+
+    for features in iter_featurize_structures(structures(), n_workers=n_workers, chunksize=chunksize, **crystal_kwargs):
+        yield pending.popleft(), features
+
+
+class ColumnBuffer:
+    """
+    Growable NumPy columns that rows are appended to in blocks, materialized as one dataframe at the end.
+
+    Appending copies only the new block, and the capacity doubles when it runs out, so assembling n rows takes O(n)
+    time instead of the O(n^2) of concatenating a growing dataframe.
+
+    Examples:
+        >>> buffer = ColumnBuffer(capacity=len(df))
+        >>> buffer.append({"site": [1, 2], "Eb_sum": [10.2, 11.5]})
+        >>> buffer.to_frame()
+    """
+
+    def __init__(self, capacity: int = 1024):
+        """
+        Initializes the ColumnBuffer object. Columns are allocated on the first append, with the dtypes of its values.
+
+        Args:
+            capacity: The number of rows to allocate.
+        """
+        self._capacity = max(capacity, 1)
+        self._columns: Dict[str, np.ndarray] = {}
+        self._size = 0
+
+    def append(self, columns: Mapping[str, Any]):
+        """
+        Appends a block of rows.
+
+        Args:
+            columns: Arrays of equal length keyed by column name, with the same columns as the first block.
+
+        Raises:
+            ValueError: If the columns differ from those of the first block.
+        """
+        arrays = {name: np.asarray(values) for name, values in columns.items()}
+        # Fixed-width strings would truncate longer strings of later blocks
+        arrays = {name: array.astype(object) if array.dtype.kind in "SU" else array for name, array in arrays.items()}
+        n = len(next(iter(arrays.values()))) if arrays else 0
+        if not self._columns:
+            self._columns = {name: np.empty(self._capacity, dtype=array.dtype) for name, array in arrays.items()}
+        elif arrays.keys() != self._columns.keys():
+            raise ValueError(f"Expected columns {list(self._columns)}, got {list(arrays)}.")
+        if self._size + n > self._capacity:
+            self._capacity = max(2 * self._capacity, self._size + n)
+            for name, column in self._columns.items():
+                grown = np.empty(self._capacity, dtype=column.dtype)
+                grown[:self._size] = column[:self._size]
+                self._columns[name] = grown
+        for name, array in arrays.items():
+            column = self._columns[name]
+            if not np.can_cast(array.dtype, column.dtype, casting="same_kind"):
+                column = self._columns[name] = column.astype(np.result_type(column.dtype, array.dtype))
+            column[self._size:self._size + n] = array
+        self._size += n
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Materializes the appended rows.
+
+        Returns:
+            A dataframe with one column per buffer column.
+        """
+        return pd.DataFrame({name: column[:self._size] for name, column in self._columns.items()})
+
+    def __len__(self) -> int:
+        return self._size
+
+
+def _append_structure(
+        buffer: ColumnBuffer,
+        rows: Dict[str, np.ndarray],
+        features: CrystalFeatures,
+        feature_columns: Optional[Sequence[str]]
+) -> bool:
+    """
+    Appends the dataset rows of one structure with the site features of its symmetry-distinct sites.
+
+    Args:
+        buffer: The buffer to append to.
+        rows: The dataset columns of the rows of the structure.
+        features: The features of the structure.
+        feature_columns: The site feature columns, or None for all of them.
+
+    Returns:
+        True if the rows were appended, False if featurization failed or the rows and sites do not match.
+    """
+    site_features = features.site_features
+    n_rows = len(next(iter(rows.values()))) if rows else 0
+    if features.error is not None or site_features is None or len(site_features) != n_rows:
+        return False
+    feature_columns = list(site_features.columns) if feature_columns is None else feature_columns
+    buffer.append({**rows, **{name: site_features[name].to_numpy() for name in feature_columns}})
+    return True
+
+
+def featurize_dataset(
+        df: pd.DataFrame,
+        structure_column: str = "structure",
+        group_column: str = "defectid",
+        columns: Optional[Sequence[str]] = None,
+        feature_columns: Optional[Sequence[str]] = None,
+        n_workers: Optional[int] = None,
+        chunksize: int = 1,
+        **crystal_kwargs
+) -> pd.DataFrame:
+    """
+    Featurizes the structures of a defect dataset and joins the site features to its rows.
+
+    The rows are grouped once, each structure is featurized once across a process pool, and the results are written
+    into columns preallocated for every row, so assembly time is linear in the size of the dataset. The rows of each
+    structure, in dataset order, are aligned with its symmetry-distinct sites in index order, as when the rows are
+    sorted by site. Structures that fail to featurize, or whose number of rows differs from their number of distinct
+    sites, are left out.
+
+    Args:
+        df: The dataset, with one row per defect and the structure of each row in structure_column.
+        structure_column: The column of pymatgen Structure objects, file paths, or POSCAR strings. The structure of
+            the first row of each group is used.
+        group_column: The column identifying the structure of each row.
+        columns: The dataset columns to keep. Defaults to all but the structure column.
+        feature_columns: The site feature columns to add, e.g. ["Eb_sum", "Vr_max"]. Defaults to all of them.
+        n_workers: The number of worker processes. Defaults to the number of CPUs; 1 runs in the current process.
+        chunksize: The number of structures sent to a worker at a time.
+        **crystal_kwargs: Keyword arguments passed to Crystal, e.g. nn_finder or species_symbol.
+
+    Returns:
+        A dataframe with the kept dataset columns and the site features of each featurized row.
+
+    Examples:
+        >>> df_cf = featurize_dataset(df.sort_values(["defectid", "site"]), feature_columns=["Eb_sum", "Vr_max"])
+    """
+    columns = [c for c in df.columns if c != structure_column] if columns is None else list(columns)
+    groups = df.groupby(group_column, sort=False).indices
+    positions = list(groups.values())
+    structures = df[structure_column].to_numpy()
+    values = {name: df[name].to_numpy() for name in columns}
+
+    buffer = ColumnBuffer(capacity=len(df))
+    results = iter_featurize_structures(
+        (structures[rows[0]] for rows in positions), n_workers=n_workers, chunksize=chunksize, **crystal_kwargs
+    )
+    for result in results:
+        rows = positions[result.index]
+        _append_structure(buffer, {name: column[rows] for name, column in values.items()}, result, feature_columns)
+    if not len(buffer):
+        return pd.DataFrame(columns=columns + list(feature_columns or []))
+    return buffer.to_frame()
+
+
+def featurize_witman(
+        data_path: Union[str, Path],
+        columns: Optional[Sequence[str]] = None,
+        feature_columns: Optional[Sequence[str]] = None,
+        n_workers: Optional[int] = None,
+        chunksize: int = 1,
+        defectname: Optional[str] = "V_O",
+        formula_filter: Optional[Callable[[str], bool]] = None,
+        **crystal_kwargs
+) -> pd.DataFrame:
+    """
+    Streams a dataset in the Witman layout through featurization into one dataframe of rows with site features.
+
+    Only the records in flight are held in memory, and rows are appended to growable columns, so assembly time is
+    linear in the size of the dataset. Rows are aligned with sites as in featurize_dataset.
+
+    Args:
+        data_path: The dataset directory.
+        columns: The dataset columns to keep. Defaults to all of them, with filename and defectid.
+        feature_columns: The site feature columns to add, e.g. ["Eb_sum", "Vr_max"]. Defaults to all of them.
+        n_workers: The number of worker processes. Defaults to the number of CPUs; 1 runs in the current process.
+        chunksize: The number of structures sent to a worker at a time.
+        defectname: The defect name to keep, e.g. "V_O", or None to keep all defects.
+        formula_filter: A function of the formula that returns True for structures to keep.
+        **crystal_kwargs: Keyword arguments passed to Crystal, e.g. nn_finder or species_symbol.
+
+    Returns:
+        A dataframe with the kept dataset columns and the site features of each featurized row.
+    """
+    records = iter_witman_records(data_path, defectname=defectname, formula_filter=formula_filter)
+    buffer = ColumnBuffer()
+    for record, features in featurize_records(records, n_workers=n_workers, chunksize=chunksize, **crystal_kwargs):
+        rows = record.rows if columns is None else record.rows[list(columns)]
+        _append_structure(buffer, {name: rows[name].to_numpy() for name in rows.columns}, features, feature_columns)
+    return buffer.to_frame()
+
+
+class ArchiveIndex:
+    """
+    A persistent index of the member offsets of tar.gz archives.
+
+    Gzip streams cannot be read at random, so finding a member normally means decompressing the archive and parsing
+    every tar header before it. The first time an archive is read, the offset and size of each member are recorded;
+    later reads decompress straight to the needed members without parsing headers or extracting to disk, and stop
+    after the last one. Entries are invalidated when the archive's size or modification time changes.
+
+    Attributes:
+        path: The path to the JSON index file, or None to keep the index in memory only.
+
+    Examples:
+        >>> index = ArchiveIndex("oxygen_vacancies_db_data/index.json")
+        >>> index.read("Li2O/Li2O_Va_O1_0.tar.gz", ["CONTCAR-finish"])["CONTCAR-finish"]
+    """
+
+    def __init__(self, path: Optional[Union[str, Path]] = None):
+        """
+        Initializes the ArchiveIndex object, loading the index file if it exists.
+
+        Args:
+            path: The path to the JSON index file, or None to keep the index in memory only.
+        """
+        self.path = Path(path) if path is not None else None
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        if self.path is not None and self.path.exists():
+            with open(self.path) as file:
+                self._entries = json.load(file)
+
+    @staticmethod
+    def _stamp(archive: str) -> List[int]:
+        """
+        Gets the size and modification time of an archive, which identify its version.
+
+        Args:
+            archive: The path to the archive.
+
+        Returns:
+            A list of the size and modification time in nanoseconds.
+        """
+        stat = os.stat(archive)
+        return [stat.st_size, stat.st_mtime_ns]
+
+    @staticmethod
+    def scan(archive: str) -> Dict[str, Any]:
+        """
+        Scans an archive in one streaming pass and records the offset and size of each regular file member.
+
+        Args:
+            archive: The path to the archive.
+
+        Returns:
+            The index entry of the archive.
+        """
+        members = {}
+        with tarfile.open(archive, "r|gz") as tar:
+            for member in tar:
+                if member.isfile():
+                    members[member.name] = [member.offset_data, member.size]
+        return {"stamp": ArchiveIndex._stamp(archive), "members": members}
+
+    def entry(self, archive: Union[str, Path]) -> Dict[str, Any]:
+        """
+        Gets the index entry of an archive, scanning it if it is not indexed or has changed.
+
+        Args:
+            archive: The path to the archive.
+
+        Returns:
+            The index entry of the archive.
+        """
+        archive = os.path.abspath(archive)
+        entry = self.get_entry(archive)
+        if entry is None:
+            entry = self.scan(archive)
+            self.update({archive: entry})
+        return entry
+
+    def get_entry(self, archive: Union[str, Path]) -> Optional[Dict[str, Any]]:
+        """
+        Gets the index entry of an archive without scanning it.
+
+        Args:
+            archive: The path to the archive.
+
+        Returns:
+            The index entry, or None if the archive is not indexed or has changed.
+        """
+        archive = os.path.abspath(archive)
+        entry = self._entries.get(archive)
+        if entry is None or entry["stamp"] != self._stamp(archive):
+            return None
+        return entry
+
+    def update(self, entries: Dict[str, Dict[str, Any]]):
+        """
+        Adds index entries, e.g. ones built by worker processes.
+
+        Args:
+            entries: The index entries, keyed by absolute archive path.
+        """
+        with self._lock:
+            self._entries.update(entries)
+
+    def save(self):
+        """
+        Writes the index file atomically, so concurrent readers never see a partial file.
+        """
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temporary_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with self._lock, open(temporary_path, "w") as file:
+            json.dump(self._entries, file)
+        os.replace(temporary_path, self.path)
+
+    @staticmethod
+    def _find(members: Dict[str, Any], name: str) -> Optional[str]:
+        """
+        Finds a member by name, ignoring a leading "./" or directory.
+
+        Args:
+            members: The indexed members of an archive.
+            name: The member name, e.g. "CONTCAR-finish".
+
+        Returns:
+            The name of the member in the archive, or None if there is no such member.
+        """
+        if name in members:
+            return name
+        for member_name in members:
+            if member_name.split("/")[-1] == name:
+                return member_name
+        return None
+
+    @staticmethod
+    def read_entry(archive: str, entry: Dict[str, Any], names: Sequence[str]) -> Dict[str, bytes]:
+        """
+        Reads members from an archive using its index entry.
+
+        Args:
+            archive: The path to the archive.
+            entry: The index entry of the archive.
+            names: The member names.
+
+        Returns:
+            A dictionary of member names to contents. Missing members are left out.
+        """
+        located = []
+        for name in names:
+            member_name = ArchiveIndex._find(entry["members"], name)
+            if member_name is not None:
+                offset, size = entry["members"][member_name]
+                located.append((offset, size, name))
+
+        contents = {}
+        with gzip.open(archive, "rb") as file:
+            # Members are read in archive order, so the stream is decompressed at most once and only up to the last
+            for offset, size, name in sorted(located):
+                file.seek(offset)
+                contents[name] = file.read(size)
+        return contents
+
+    def read(self, archive: Union[str, Path], names: Sequence[str]) -> Dict[str, bytes]:
+        """
+        Reads members from an archive without extracting it to disk.
+
+        Args:
+            archive: The path to the archive.
+            names: The member names, e.g. ["CONTCAR-finish", "POSCAR-initial"].
+
+        Returns:
+            A dictionary of member names to contents. Missing members are left out.
+        """
+        return self.read_entry(os.path.abspath(archive), self.entry(archive), names)
+
+
+def _read_archive(
+        archive: str,
+        entry: Optional[Dict[str, Any]],
+        names: Sequence[str]
+) -> Tuple[str, Optional[Dict[str, Any]], Dict[str, Any], Optional[str]]:
+    """
+    Reads and parses members of one archive in a worker process, indexing it first if needed.
+
+    Args:
+        archive: The absolute path to the archive.
+        entry: The index entry of the archive, or None if it is not indexed or has changed.
+        names: The member names.
+
+    Returns:
+        A tuple of the archive path, the new index entry if one was built, the contents keyed by member name, and the
+        error message if reading failed. POSCAR-like members are parsed into Structure objects, others are returned
+        as text.
+    """
+    try:
+        new_entry = None
+        if entry is None:
+            entry = new_entry = ArchiveIndex.scan(archive)
+        contents = {}
+        for name, data in ArchiveIndex.read_entry(archive, entry, names).items():
+            text = data.decode("utf-8")
+            if name.split("-")[0] in ("CONTCAR", "POSCAR"):
+                contents[name] = Structure.from_str(text, fmt="poscar")
+            else:
+                contents[name] = text
+        return archive, new_entry, contents, None
+    except Exception as e:
+        return archive, None, {}, f"{type(e).__name__}: {e}"
+
+
+def iter_archives(
+        archives: Iterable[Union[str, Path]],
+        names: Sequence[str] = ("CONTCAR-finish",),
+        index: Optional[ArchiveIndex] = None,
+        n_workers: Optional[int] = None
+) -> Iterator[Tuple[str, Dict[str, Any], Optional[str]]]:
+    """
+    Reads members of many tar.gz archives across a process pool, such as the Kumagai oxygen vacancy archives.
+
+    Archives missing from the index are scanned by the workers, and the index file is updated at the end.
+
+    Args:
+        archives: The paths to the archives.
+        names: The member names. CONTCAR and POSCAR members are parsed into Structure objects, others are returned as
+            text.
+        index: The archive index. Defaults to an in-memory index.
+        n_workers: The number of worker processes. Defaults to the number of CPUs; 1 runs in the current process.
+
+    Yields:
+        A tuple of the archive path, the contents keyed by member name, and the error message if reading failed, in
+        input order.
+
+    Examples:
+        >>> archives = glob("oxygen_vacancies_db_data/*/*.tar.gz")
+        >>> for archive, contents, error in iter_archives(archives, index=ArchiveIndex("index.json")):
+        ...     crystal = Crystal(pymatgen_structure=contents["CONTCAR-finish"])
+    """
+    index = index or ArchiveIndex()
+
+    def tasks():
+        for archive in archives:
+            archive = os.path.abspath(archive)
+            yield archive, index.get_entry(archive)
+
+    def collect(result):
+        archive, new_entry, contents, error = result
+        if new_entry is not None:
+            index.update({archive: new_entry})
+        return archive, contents, error
+
+    try:
+        if n_workers == 1:
+            for archive, entry in tasks():
+                yield collect(_read_archive(archive, entry, names))
+            return
+        n_workers = n_workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            pending = deque()
+            task_iterator = tasks()
+            while True:
+                for archive, entry in task_iterator:
+                    pending.append(executor.submit(_read_archive, archive, entry, names))
+                    if len(pending) >= 2 * n_workers:
+                        break
+                if not pending:
+                    return
+                yield collect(pending.popleft().result())
+    finally:
+        index.save()
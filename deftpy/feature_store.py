@@ -0,0 +1,312 @@
+import fcntl
+import json
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+STRING = "str"
+CODE_DTYPE = np.dtype("<i4")
+
+RowSelection = Optional[Union[slice, np.ndarray, Sequence[int]]]
+
+
+def _column_dtype(values: np.ndarray) -> str:
+    """
+    Gets the stored dtype of a column from its first values.
+
+    Args:
+        values: The values.
+
+    Returns:
+        STRING for strings and other objects, "<f8" for numbers, so that later float values, including NaN, fit, and
+        otherwise the little-endian NumPy dtype string, e.g. "|b1".
+    """
+    if values.dtype.kind in "OSU":
+        return STRING
+    if values.dtype.kind in "iuf":
+        return np.dtype(np.float64).str
+    return values.dtype.newbyteorder("<").str
+
+
+def _cast(values: np.ndarray, dtype: np.dtype, name: str) -> np.ndarray:
+    """
+    Casts the values of a column to its stored dtype, refusing casts that change or lose values.
+
+    Args:
+        values: The values.
+        dtype: The stored dtype.
+        name: The column name, for the error message.
+
+    Returns:
+        The cast values.
+
+    Raises:
+        ValueError: If the cast is not between kinds of the same kind or safer, or changes any value.
+    """
+    if not np.can_cast(values.dtype, dtype, casting="same_kind"):
+        raise ValueError(f"Cannot store {values.dtype} values in column {name!r} of dtype {dtype}.")
+    cast = values.astype(dtype)
+    if not np.array_equal(cast, values, equal_nan=dtype.kind in "fc"):
+        raise ValueError(f"Storing values in column {name!r} of dtype {dtype} would change them.")
+    return cast
+
+
+class FeatureStore:
+    """
+    An on-disk table of per-site features with one memory-mapped file of fixed-dtype values per column.
+
+    String columns, such as formulas and structure IDs, are stored as int32 codes into a string table kept in a small
+    JSON lines sidecar, so every column file has fixed-size rows. Columns are read through read-only memory maps:
+    reading a column or a slice of rows copies nothing, so training on a few columns of a dataset larger than memory
+    only pages in those columns. Numeric columns are float64 unless the schema says otherwise, and appends whose values
+    a column cannot store unchanged, such as 3.7 or NaN in an integer column, are rejected.
+
+    Appends take an exclusive lock on the store, so worker processes can append to the same store concurrently. The
+    number of rows is committed after the column files are written, and any rows past it, left by an interrupted
+    append, are discarded by the next append.
+
+    Attributes:
+        path: The store directory.
+        schema: A dictionary of column names to dtype strings, with "str" for string columns, or None until the first
+            append.
+
+    Examples:
+        >>> store = FeatureStore("features/")
+        >>> store.append(crystal.site_features, structure_id="mp-1234", formula="CaTiO3", Eg=3.2)
+        >>> store.read(["Eb_sum", "Vr_max", "Eg"], rows=slice(0, 1000000))
+    """
+
+    def __init__(self, path: Union[str, Path], schema: Optional[Mapping[str, Any]] = None):
+        """
+        Initializes the FeatureStore object, creating the store directory if needed.
+
+        Args:
+            path: The store directory.
+            schema: The column names and dtypes of a new store, with "str" for string columns. Defaults to the
+                columns of the first append, with float64 for numeric columns.
+
+        Raises:
+            ValueError: If the store exists with a different schema.
+        """
+        self.path = Path(path).expanduser()
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.schema: Optional[Dict[str, str]] = None
+        self._strings: List[str] = []
+        self._codes: Dict[str, int] = {}
+        self._strings_size = 0
+        self._read_schema()
+        if schema is not None:
+            schema = {name: dtype if dtype == STRING else np.dtype(dtype).newbyteorder("<").str
+                      for name, dtype in schema.items()}
+            if self.schema is None:
+                with self._lock():
+                    self._read_schema()
+                    if self.schema is None:
+                        self._write_schema(schema)
+            if self.schema != schema:
+                raise ValueError(f"The store at {self.path} has schema {self.schema}, not {schema}.")
+
+    @contextmanager
+    def _lock(self) -> Iterator[None]:
+        """
+        Holds the exclusive lock of the store.
+        """
+        with open(self.path / "lock", "a") as file:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+    def _read_schema(self):
+        """
+        Reads the schema, if the store has one.
+        """
+        path = self.path / "schema.json"
+        if self.schema is None and path.exists():
+            with open(path) as file:
+                self.schema = json.load(file)
+
+    def _write_schema(self, schema: Dict[str, str]):
+        """
+        Writes the schema of a new store. Must be called with the lock held.
+
+        Args:
+            schema: The column names and dtype strings.
+        """
+        self._write_atomically("schema.json", json.dumps(schema))
+        self.schema = schema
+
+    def _write_atomically(self, name: str, text: str):
+        """
+        Replaces a small file of the store, so readers never see a partial file.
+
+        Args:
+            name: The file name.
+            text: The contents.
+        """
+        temporary_path = self.path / f"{name}.{os.getpid()}.tmp"
+        with open(temporary_path, "w") as file:
+            file.write(text)
+        os.replace(temporary_path, self.path / name)
+
+    def _column_path(self, name: str) -> Path:
+        return self.path / f"{name}.bin"
+
+    def _dtype(self, name: str) -> np.dtype:
+        dtype = self.schema[name]
+        return CODE_DTYPE if dtype == STRING else np.dtype(dtype)
+
+    def _sync_strings(self, repair: bool = False):
+        """
+        Reads the strings appended to the string table since the last call.
+
+        Args:
+            repair: Whether to truncate an incomplete last line left by an interrupted append. Must only be set with
+                the lock held.
+        """
+        path = self.path / "strings.jsonl"
+        if not path.exists():
+            return
+        with open(path, "rb") as file:
+            file.seek(self._strings_size)
+            for line in file:
+                if not line.endswith(b"\n"):
+                    break
+                string = json.loads(line)
+                self._codes[string] = len(self._strings)
+                self._strings.append(string)
+                self._strings_size += len(line)
+        if repair and path.stat().st_size != self._strings_size:
+            os.truncate(path, self._strings_size)
+
+    def _encode(self, values: np.ndarray) -> np.ndarray:
+        """
+        Encodes strings as codes into the string table, appending new strings to it. Must be called with the lock
+        held, after synchronizing the string table.
+
+        Args:
+            values: The strings.
+
+        Returns:
+            The codes.
+        """
+        unique, inverse = np.unique(values.astype(str), return_inverse=True)
+        new = [string for string in unique.tolist() if string not in self._codes]
+        if new:
+            lines = "".join(json.dumps(string) + "\n" for string in new).encode()
+            with open(self.path / "strings.jsonl", "ab") as file:
+                file.write(lines)
+            for string in new:
+                self._codes[string] = len(self._strings)
+                self._strings.append(string)
+            self._strings_size += len(lines)
+        return np.array([self._codes[string] for string in unique.tolist()], dtype=CODE_DTYPE)[inverse]
+
+    def __len__(self) -> int:
+        path = self.path / "length"
+        if not path.exists():
+            return 0
+        with open(path) as file:
+            return int(file.read())
+
+    def append(self, columns: Union[pd.DataFrame, Mapping[str, Any]], **constants) -> range:
+        """
+        Appends rows.
+
+        Args:
+            columns: Arrays of equal length keyed by column name, or a dataframe, such as Crystal.site_features.
+            **constants: Values shared by all the rows, such as the structure ID, formula, or band gap.
+
+        Returns:
+            The indices of the appended rows.
+
+        Raises:
+            ValueError: If the columns differ from the schema, have different lengths, or hold values that the
+                column dtypes cannot store unchanged.
+        """
+        arrays = {name: np.asarray(values) for name, values in dict(columns).items()}
+        n = len(next(iter(arrays.values()))) if arrays else 0
+        for name, value in constants.items():
+            arrays[name] = np.full(n, value, dtype=object if isinstance(value, str) else None)
+        if any(len(array) != n for array in arrays.values()):
+            raise ValueError("All columns must have the same length.")
+
+        with self._lock():
+            self._read_schema()
+            if self.schema is None:
+                self._write_schema({name: _column_dtype(array) for name, array in arrays.items()})
+            if arrays.keys() != self.schema.keys():
+                raise ValueError(f"Expected columns {sorted(self.schema)}, got {sorted(arrays)}.")
+            # Every value is checked before anything is written
+            data = {name: _cast(array, self._dtype(name), name)
+                    for name, array in arrays.items() if self.schema[name] != STRING}
+            start = len(self)
+            self._sync_strings(repair=True)
+            for name, array in arrays.items():
+                dtype = self._dtype(name)
+                values = self._encode(array) if self.schema[name] == STRING else data[name]
+                with open(self._column_path(name), "ab") as file:
+                    # Drop rows past the committed length, left by an interrupted append
+                    file.truncate(start * dtype.itemsize)
+                    file.write(np.ascontiguousarray(values).tobytes())
+            self._write_atomically("length", str(start + n))
+        return range(start, start + n)
+
+    def column(self, name: str, rows: RowSelection = None) -> np.ndarray:
+        """
+        Gets the stored values of a column, codes for string columns, without copying them into memory.
+
+        Args:
+            name: The column name.
+            rows: A slice, boolean mask, or indices of the rows to get. Slices are views of the memory map; masks and
+                indices copy only the selected rows.
+
+        Returns:
+            A read-only array of the values.
+
+        Raises:
+            KeyError: If the store has no such column.
+        """
+        if self.schema is None or name not in self.schema:
+            raise KeyError(f"The store at {self.path} has no column {name!r}.")
+        n = len(self)
+        dtype = self._dtype(name)
+        if n == 0:
+            values = np.empty(0, dtype=dtype)
+        else:
+            values = np.memmap(self._column_path(name), dtype=dtype, mode="r", shape=(n,))
+        return values if rows is None else values[rows]
+
+    @property
+    def strings(self) -> List[str]:
+        """
+        The string table, indexed by code.
+        """
+        self._sync_strings()
+        return self._strings
+
+    def read(self, columns: Optional[Sequence[str]] = None, rows: RowSelection = None) -> pd.DataFrame:
+        """
+        Reads columns into a dataframe, decoding string columns.
+
+        Args:
+            columns: The column names. Defaults to all columns.
+            rows: A slice, boolean mask, or indices of the rows to read.
+
+        Returns:
+            A dataframe with the selected rows and columns.
+        """
+        if self.schema is None:
+            return pd.DataFrame(columns=list(columns or []))
+        data = {}
+        for name in columns or list(self.schema):
+            values = self.column(name, rows)
+            if self.schema[name] == STRING:
+                values = np.asarray(self.strings, dtype=object)[values]
+            data[name] = values
+        return pd.DataFrame(data)
@@ -1,58 +1,305 @@
-from pysipfenn import Calculator
-import pysipfenn.descriptorDefinitions as desc_defs
-from pymatgen.core import Structure
+import importlib
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import nullcontext
+from itertools import islice
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Optional, Union
+
+import numpy as np
 import pandas as pd
+from pymatgen.core import Structure
+
+from deftpy.cache import DescriptorCache, structure_fingerprint
+from deftpy.structure_store import load_structure
+
+_sessions: Dict[str, "ModelSession"] = {}
+_lock = threading.Lock()
+
+StructureInput = Union[Structure, str, Path]
+
+
+def _structure_from_input(item: StructureInput) -> Structure:
+    """
+    Gets a structure from a structure, a file path, or a POSCAR string. Files whose format cannot be inferred from the
+    filename, such as structure.txt, are read as POSCAR files.
+
+    Args:
+        item: The structure, file path, or POSCAR string.
+
+    Returns:
+        The structure.
+    """
+    if isinstance(item, Structure):
+        return item
+    if isinstance(item, Path) or (isinstance(item, str) and "\n" not in item and os.path.isfile(item)):
+        try:
+            return load_structure(item)
+        except ValueError as error:
+            if "Unrecognized file extension" not in str(error):
+                raise
+        return load_structure(item, fmt="poscar")
+    if isinstance(item, str):
+        return Structure.from_str(item, fmt="poscar")
+    raise TypeError(f"Cannot build a Structure from {type(item).__name__}.")
+
+
+def compute_descriptors(
+        structures: Iterable[StructureInput],
+        generate_descriptor: Callable[[Structure], np.ndarray],
+        descriptor: str,
+        cache: Optional[DescriptorCache] = None,
+        executor: Optional[Executor] = None,
+        chunksize: int = 1
+) -> np.ndarray:
+    """
+    Computes the descriptors of structures, reusing cached ones and computing the rest across an executor.
+
+    Args:
+        structures: Pymatgen Structure objects, file paths, or POSCAR strings.
+        generate_descriptor: The function computing the descriptor of a structure. It must be picklable to run in a
+            process pool.
+        descriptor: The descriptor name, which is part of the cache key.
+        cache: A persistent cache of descriptors. Only structures missing from it are computed.
+        executor: The executor the missing descriptors are computed across, or None to compute them in this process.
+        chunksize: The number of structures sent to a worker at a time.
+
+    Returns:
+        A float32 matrix with one row per structure.
+
+    Examples:
+        >>> with ProcessPoolExecutor() as executor:
+        ...     descriptors = compute_descriptors(paths, KS2022.generate_descriptor, "KS2022", cache, executor)
+    """
+    structures = [_structure_from_input(item) for item in structures]
+    rows: Dict[int, np.ndarray] = {}
+    keys = []
+    if cache is not None:
+        keys = [structure_fingerprint(structure, descriptor=descriptor) for structure in structures]
+        cached = cache.get_many(keys)
+        rows = {i: cached[key] for i, key in enumerate(keys) if key in cached}
+
+    missing = [i for i in range(len(structures)) if i not in rows]
+    if executor is None or len(missing) < 2:
+        computed = [generate_descriptor(structures[i]) for i in missing]
+    else:
+        computed = list(executor.map(generate_descriptor, [structures[i] for i in missing], chunksize=chunksize))
+    computed = [np.asarray(row, dtype=np.float32) for row in computed]
+    rows.update(zip(missing, computed))
+    if cache is not None and missing:
+        cache.put_many({keys[i]: row for i, row in zip(missing, computed)})
+
+    if not structures:
+        return np.empty((0, 0), dtype=np.float32)
+    return np.stack([rows[i] for i in range(len(structures))])
+
+
+class ModelSession:
+    """
+    A pySIPFENN calculator with the models compatible with one descriptor loaded once and kept in memory.
+
+    Loading the models takes far longer than running them, so a session is meant to be created once per process,
+    usually through get_model_session, and used for every prediction. Descriptors, the expensive part, can be computed
+    across a process pool and kept in a DescriptorCache, so repeated screens only compute new or changed structures.
+    The pySIPFENN models predict formation energies in eV/atom, not energies above the hull; they are reported per model
+    and averaged in the formation_energy_mean column. HullService in deftpy.hull2 gives energies above the hull.
+
+    Attributes:
+        descriptor: The descriptor name, e.g. "KS2022".
+        calculator: The pySIPFENN calculator.
+        models: A dictionary of model names to the loaded models compatible with the descriptor.
+        generate_descriptor: The function computing the descriptor of a structure.
+
+    Examples:
+        >>> session = get_model_session()
+        >>> session.predict(glob("data/test_files/*POSCAR*"))
+    """
+
+    def __init__(
+            self,
+            descriptor: str = "KS2022",
+            calculator: Optional[Any] = None,
+            generate_descriptor: Optional[Callable[[Structure], np.ndarray]] = None
+    ):
+        """
+        Initializes the ModelSession object, loading the available models compatible with the descriptor.
+
+        Args:
+            descriptor: The descriptor name, e.g. "KS2022".
+            calculator: The pySIPFENN calculator, by default a new one without any models loaded.
+            generate_descriptor: The function computing the descriptor of a structure, by default the one in
+                pysipfenn.descriptorDefinitions for the descriptor.
+
+        Raises:
+            ValueError: If no compatible model is available.
+        """
+        if calculator is None:
+            from pysipfenn import Calculator
+            calculator = Calculator(autoLoad=False, verbose=False)
+        # The Calculator only sets verbose when it is true, but reads it when making predictions
+        calculator.verbose = False
+        if generate_descriptor is None:
+            module = importlib.import_module(f"pysipfenn.descriptorDefinitions.{descriptor}")
+            generate_descriptor = module.generate_descriptor
+
+        self.descriptor = descriptor
+        self.calculator = calculator
+        self.generate_descriptor = generate_descriptor
+
+        available = set(calculator.network_list_available)
+        names = sorted(name for name in calculator.findCompatibleModels(descriptor) if name in available)
+        if not names:
+            raise ValueError(f"No {descriptor} models are available. Download them with Calculator.downloadModels().")
+        for name in names:
+            if name not in calculator.loadedModels:
+                calculator.loadModels(name)
+        self.models = {name: calculator.loadedModels[name] for name in names}
+
+    def get_descriptors(
+            self,
+            structures: Iterable[StructureInput],
+            cache: Optional[DescriptorCache] = None,
+            executor: Optional[Executor] = None,
+            chunksize: int = 1
+    ) -> np.ndarray:
+        """
+        Computes the descriptors of structures.
+
+        Args:
+            structures: Pymatgen Structure objects, file paths, or POSCAR strings.
+            cache: A persistent cache of descriptors. Only structures missing from it are computed.
+            executor: The executor the missing descriptors are computed across, or None to compute them in this
+                process.
+            chunksize: The number of structures sent to a worker at a time.
+
+        Returns:
+            A float32 matrix with one row per structure.
+        """
+        return compute_descriptors(structures, self.generate_descriptor, self.descriptor, cache, executor, chunksize)
+
+    def predict_descriptors(self, descriptors: np.ndarray) -> pd.DataFrame:
+        """
+        Runs all models on descriptors in one batch.
+
+        Args:
+            descriptors: A matrix with one row per structure.
+
+        Returns:
+            A dataframe with one row per structure, one column per model in eV/atom, and the mean over the models in
+        formation_energy_mean.
+        """
+        names = list(self.models)
+        if len(descriptors) == 0:
+            return pd.DataFrame(columns=names + ["formation_energy_mean"], dtype=float)
+        predictions = self.calculator.makePredictions(self.models, names, list(descriptors))
+        df = pd.DataFrame(np.asarray(predictions, dtype=float).reshape(len(descriptors), len(names)), columns=names)
+        df["formation_energy_mean"] = df[names].mean(axis=1)
+        return df
+
+    def predict(
+            self,
+            structures: Iterable[StructureInput],
+            batch_size: Optional[int] = None,
+            cache: Optional[DescriptorCache] = None,
+            n_workers: Optional[int] = 1,
+            chunksize: int = 1
+    ) -> pd.DataFrame:
+        """
+        Predicts many structures, running the models once per batch on the stacked descriptors.
+
+        Args:
+            structures: Pymatgen Structure objects, file paths, or POSCAR strings.
+            batch_size: The number of structures per batch, or None for a single batch.
+            cache: A persistent cache of descriptors. Only structures missing from it are computed.
+            n_workers: The number of worker processes computing descriptors. None uses the number of CPUs; 1 computes
+                them in the current process.
+            chunksize: The number of structures sent to a worker at a time.
+
+        Returns:
+            A dataframe with one row per structure, one column per model in eV/atom, and the mean over the models in
+        formation_energy_mean.
+        """
+        with nullcontext() if n_workers == 1 else ProcessPoolExecutor(max_workers=n_workers) as executor:
+            if not batch_size:
+                return self.predict_descriptors(self.get_descriptors(structures, cache, executor, chunksize))
+            structures = iter(structures)
+            batches = []
+            while True:
+                batch = list(islice(structures, batch_size))
+                if not batch:
+                    break
+                batches.append(self.predict_descriptors(self.get_descriptors(batch, cache, executor, chunksize)))
+        if not batches:
+            return self.predict_descriptors(np.empty((0, 0)))
+        return pd.concat(batches, ignore_index=True)
+
 
-def calculate_ehull_for_structure(file_path):
-    # Initialize the pySIPFENN Calculator
-    calculator = Calculator()
+def get_model_session(descriptor: str = "KS2022") -> ModelSession:
+    """
+    Gets the model session of a descriptor in this process, loading the models on first use.
 
-    # Load the structure from the file
-    with open(file_path, 'r') as file:
-        structure = Structure.from_str(file.read(), fmt="poscar")
+    Args:
+        descriptor: The descriptor name, e.g. "KS2022".
 
-    # Generate the KS2022 descriptor for the structure
-    # The descriptor generation function is called directly from the descriptorDefinitions module
-    descriptor = desc_defs.KS2022.generate_descriptor(structure)
+    Returns:
+        The shared ModelSession object.
+    """
+    session = _sessions.get(descriptor)
+    if session is None:
+        with _lock:
+            session = _sessions.get(descriptor)
+            if session is None:
+                session = _sessions[descriptor] = ModelSession(descriptor)
+    return session
 
-    # Load models compatible with 'KS2022' descriptors
-    calculator.loadModels()
-    print("Loaded models:", calculator.loadedModels.keys())
 
+def predict_formation_energies(
+        structures: Iterable[StructureInput],
+        batch_size: Optional[int] = 256,
+        descriptor: str = "KS2022",
+        cache: Optional[DescriptorCache] = None,
+        n_workers: Optional[int] = 1,
+        chunksize: int = 1
+) -> pd.DataFrame:
+    """
+    Predicts the formation energies of many structures with the shared model session.
 
-    # Find compatible models for the descriptor
-    compatible_models = calculator.findCompatibleModels('KS2022')
+    Args:
+        structures: Pymatgen Structure objects, file paths, or POSCAR strings.
+        batch_size: The number of structures per batch, or None for a single batch.
+        descriptor: The descriptor name, e.g. "KS2022".
+        cache: A persistent cache of descriptors. Only structures missing from it are computed.
+        n_workers: The number of worker processes computing descriptors. None uses the number of CPUs; 1 computes
+            them in the current process.
+        chunksize: The number of structures sent to a worker at a time.
 
-    # Before making predictions
-    print("Compatible models found:", compatible_models)
-    print("Making predictions using loaded models and calculated descriptor...")
+    Returns:
+        A dataframe with one row per structure, one column per model in eV/atom, and the mean over the models in
+        formation_energy_mean.
 
-    # Make sure you're only using models that have been loaded successfully
-    loaded_and_compatible_models = {model_name: calculator.loadedModels[model_name] 
-                                    for model_name in compatible_models 
-                                    if model_name in calculator.loadedModels}
+    Examples:
+        >>> predict_formation_energies(glob("data/test_files/*POSCAR*"))["formation_energy_mean"]
+    """
+    return get_model_session(descriptor).predict(
+        structures, batch_size=batch_size, cache=cache, n_workers=n_workers, chunksize=chunksize
+    )
 
-    # Now use the filtered dictionary to make predictions
-    predictions = calculator.makePredictions(loaded_and_compatible_models, list(loaded_and_compatible_models.keys()), [descriptor])
 
-    # Initialize an empty list for ehull values
-    ehull_values = []
+def calculate_ehull_for_structure(file_path: Union[str, Path]) -> pd.DataFrame:
+    """
+    Predicts the formation energy of one structure with the shared model session. Despite its name, it does not
+    compute the energy above the hull; use deftpy.hull2.e_above_hull for that.
 
-    # Try to extract 'Ehull' values from predictions
-    try:
-        # Assuming that each prediction is a dictionary with 'Ehull' as one of the keys
-        ehull_values = [pred['Ehull'] for pred in predictions]
-    except KeyError:
-        # If 'Ehull' key is not present in the predictions dictionary
-        print("The 'Ehull' key was not found in the prediction output.")
-    except TypeError:
-        # If the predictions are not in an expected format (not a list or not a dictionary)
-        print("The predictions were not in an expected format.")
+    Args:
+        file_path: The path to the POSCAR file.
 
-    # Create a DataFrame with the 'Ehull' predictions
-    ehull_df = pd.DataFrame({'Ehull': ehull_values})
+    Returns:
+        A dataframe with one row, one column per model in eV/atom, and the mean over the models in
+        formation_energy_mean.
+    """
+    return predict_formation_energies([file_path])
 
-    return ehull_df
 
 # test the function with an example POSCAR file.
 if __name__ == "__main__":
@@ -1,50 +1,217 @@
-from pymatgen.core import Structure
-from pymatgen.io.vasp import Poscar
-from pymatgen.analysis.phase_diagram import PhaseDiagram, PDEntry
-from pymatgen.entries.computed_entries import ComputedEntry
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
 import pandas as pd
+from pymatgen.analysis.phase_diagram import PDEntry, PhaseDiagram
+from pymatgen.core import Composition, Element
+
+REFERENCE_PATH = Path(__file__).parent / "../data/Eb.csv"
+
+_service: Optional["HullService"] = None
+_lock = threading.Lock()
+
+
+def load_reference_entries(filepath: Union[str, Path] = REFERENCE_PATH) -> List[PDEntry]:
+    """
+    Loads reference entries from the formation enthalpies in the bond dissociation enthalpy data.
+
+    Each row with a formation enthalpy becomes an entry of its formula with that enthalpy in eV per formula unit, so
+    that the elements are the zero-energy references.
+
+    Args:
+        filepath: The path to the CSV file, with formula, type, and value columns.
+
+    Returns:
+        A list of reference entries.
+    """
+    df = pd.read_csv(filepath, usecols=["formula", "type", "value"])
+    df = df[(df["type"] == "fH") & df["value"].notna()]
+    return [PDEntry(Composition(formula), float(value)) for formula, value in zip(df["formula"], df["value"])]
+
+
+def _chemical_system(composition: Composition) -> Tuple[str, ...]:
+    """
+    Gets the chemical system of a composition.
+
+    Args:
+        composition: The composition.
+
+    Returns:
+        The sorted element symbols.
+    """
+    return tuple(sorted(element.symbol for element in composition.elements))
+
+
+class HullService:
+    """
+    Energies above the convex hull from phase diagrams built once per chemical system and cached.
+
+    The reference entries are loaded once, from the bond dissociation enthalpy data by default. A phase diagram is
+    built the first time a chemical system is queried and reused for every later entry of that system. It is only
+    rebuilt when the reference entries of the system change, through set_reference_entries, add_reference_entries, or
+    a change of the reference file.
+
+    Attributes:
+        filepath: The reference file, or None if the reference entries were given directly.
+
+    Examples:
+        >>> service = get_hull_service()
+        >>> service.e_above_hull([PDEntry("CaTiO3", -17.3), PDEntry("SrTiO3", -17.1)])
+    """
+
+    def __init__(self, entries: Optional[Iterable[PDEntry]] = None, filepath: Union[str, Path] = REFERENCE_PATH):
+        """
+        Initializes the HullService object.
+
+        Args:
+            entries: The reference entries. Defaults to loading them from filepath on first use.
+            filepath: The reference file, used if entries is not given.
+        """
+        self.filepath = None if entries is not None else Path(filepath)
+        self._entries: Optional[List[PDEntry]] = list(entries) if entries is not None else None
+        self._stamp = None
+        self._diagrams: Dict[Tuple[str, ...], PhaseDiagram] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def reference_entries(self) -> List[PDEntry]:
+        """
+        The reference entries, reloaded if the reference file changed.
+        """
+        if self.filepath is not None:
+            stat = os.stat(self.filepath)
+            stamp = stat.st_size, stat.st_mtime_ns
+            if stamp != self._stamp:
+                with self._lock:
+                    self._entries = load_reference_entries(self.filepath)
+                    self._diagrams = {}
+                    self._stamp = stamp
+        return self._entries
+
+    def set_reference_entries(self, entries: Iterable[PDEntry]):
+        """
+        Replaces the reference entries and discards all cached phase diagrams.
+
+        Args:
+            entries: The reference entries.
+        """
+        with self._lock:
+            self.filepath = None
+            self._entries = list(entries)
+            self._diagrams = {}
+
+    def add_reference_entries(self, entries: Iterable[PDEntry]):
+        """
+        Adds reference entries and discards the cached phase diagrams of the chemical systems they belong to.
+
+        Args:
+            entries: The new reference entries.
+        """
+        entries = list(entries)
+        reference_entries = self.reference_entries
+        with self._lock:
+            self._entries = reference_entries + entries
+            systems = [set(_chemical_system(entry.composition)) for entry in entries]
+            self._diagrams = {
+                system: diagram for system, diagram in self._diagrams.items()
+                if not any(elements <= set(system) for elements in systems)
+            }
+
+    def get_phase_diagram(self, elements: Iterable[Union[str, Element]]) -> PhaseDiagram:
+        """
+        Gets the phase diagram of a chemical system, building it on first use.
+
+        Args:
+            elements: The elements of the chemical system.
+
+        Returns:
+            The phase diagram of the reference entries in the system, with each element at zero energy.
+        """
+        system = tuple(sorted({str(element) for element in elements}))
+        reference_entries = self.reference_entries
+        diagram = self._diagrams.get(system)
+        if diagram is None:
+            elements = set(system)
+            entries = [PDEntry(Composition(element), 0.0) for element in system]
+            entries += [entry for entry in reference_entries if set(_chemical_system(entry.composition)) <= elements]
+            diagram = PhaseDiagram(entries)
+            with self._lock:
+                self._diagrams[system] = diagram
+        return diagram
+
+    def e_above_hull(self, entries: Sequence[PDEntry], allow_negative: bool = True) -> pd.DataFrame:
+        """
+        Computes the energies above the hull of many entries, grouping them by chemical system.
+
+        Args:
+            entries: The entries, with energies on the same scale as the reference entries, e.g. formation enthalpies
+                in eV per formula unit.
+            allow_negative: Whether entries below the hull get negative energies. If False, they raise a ValueError.
+
+        Returns:
+            A dataframe with one row per entry and the formula, chemical system, and energy above the hull in eV/atom.
+        """
+        systems = [_chemical_system(entry.composition) for entry in entries]
+        e_above_hull = np.full(len(entries), np.nan)
+        groups: Dict[Tuple[str, ...], List[int]] = {}
+        for i, system in enumerate(systems):
+            groups.setdefault(system, []).append(i)
+        for system, indices in groups.items():
+            diagram = self.get_phase_diagram(system)
+            # Entries of the same composition share the cached decomposition, so they are processed together
+            for i in sorted(indices, key=lambda i: entries[i].composition.reduced_formula):
+                _, e_above_hull[i] = diagram.get_decomp_and_e_above_hull(
+                    entries[i], allow_negative=allow_negative, check_stable=False
+                )
+        return pd.DataFrame({
+            "formula": [entry.composition.reduced_formula for entry in entries],
+            "chemsys": ["-".join(system) for system in systems],
+            "e_above_hull": e_above_hull,
+        })
+
+    def clear(self):
+        """
+        Discards all cached phase diagrams.
+        """
+        with self._lock:
+            self._diagrams = {}
+
+    def __len__(self) -> int:
+        return len(self._diagrams)
+
+
+def get_hull_service() -> HullService:
+    """
+    Gets the hull service of this process, with reference entries from the bond dissociation enthalpy data.
+
+    Returns:
+        The shared HullService object.
+    """
+    global _service
+    if _service is None:
+        with _lock:
+            if _service is None:
+                _service = HullService()
+    return _service
+
+
+def e_above_hull(entries: Sequence[PDEntry], allow_negative: bool = True) -> pd.DataFrame:
+    """
+    Computes the energies above the hull of many entries with the shared hull service.
+
+    Args:
+        entries: The entries, with formation enthalpies in eV per formula unit.
+        allow_negative: Whether entries below the hull get negative energies. If False, they raise a ValueError.
+
+    Returns:
+        A dataframe with one row per entry and the formula, chemical system, and energy above the hull in eV/atom.
+    """
+    return get_hull_service().e_above_hull(entries, allow_negative=allow_negative)
+
 
-# Load the structure from the POSCAR file
-poscar = Poscar.from_file("OQMD_CaTiO3_POSCAR.txt")
-structure = poscar.structure
-
-# Compute the total energy for the CaTiO3 structure (placeholder function)
-# probably see if the value is attainable from the MP api first
-def compute_total_energy(structure):
-    # Implement the actual computation or retrieve the computed energy from MP
-    return -20.0  # Placeholder energy value
-
-# Create a ComputedEntry for CaTiO3
-ca_tio3_energy = compute_total_energy(structure)
-ca_tio3_entry = ComputedEntry(structure.composition, ca_tio3_energy)
-
-# Load other entries from Eb and Vr datasets (placeholder function)
-# You would replace this with actual data processing
-def load_other_entries(eb_file, vr_file):
-    # Load the Eb and Vr datasets
-    eb_df = pd.read_csv(eb_file)
-    vr_df = pd.read_csv(vr_file)
-
-    # Convert Eb and Vr values to total energies (placeholder)
-    # You need to implement the actual conversion logic
-    entries = []
-    for index, row in eb_df.iterrows():
-        comp = Composition(row['compound'])
-        energy = convert_to_total_energy(row['Eb'], row['Vr'])
-        entry = PDEntry(comp, energy)
-        entries.append(entry)
-    return entries
-
-# Assuming the convert_to_total_energy function exists and Eb.csv and Vr.csv are in the same directory
-other_entries = load_other_entries("Eb.csv", "Vr.csv")
-
-# Combine the CaTiO3 entry with the other entries
-all_entries = other_entries + [ca_tio3_entry]
-
-# Generate the phase diagram
-phase_diagram = PhaseDiagram(all_entries)
-
-# Calculate the Ehull for CaTiO3
-ehull = phase_diagram.get_e_above_hull(ca_tio3_entry)
-
-print(f"Ehull for CaTiO3 is {ehull} eV")
+if __name__ == "__main__":
+    # Placeholder formation enthalpy of CaTiO3 in eV per formula unit
+    print(e_above_hull([PDEntry(Composition("CaTiO3"), -17.0)]))
@@ -0,0 +1,351 @@
+import math
+from itertools import chain
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from pymatgen.analysis.local_env import _get_default_radius, _get_radius
+from pymatgen.core import Structure
+from pymatgen.optimization.neighbors import find_points_in_spheres
+from scipy.spatial import Voronoi
+
+from deftpy.structure_view import StructureView
+
+
+class VectorizedNN:
+    """
+    A near-neighbor finder that analyzes many sites of a structure at once.
+
+    A single periodic cell-list search finds the candidate neighbors of all target sites, and a single Voronoi
+    tessellation of the target sites and their candidates gives the solid angle and area of every facet. CrystalNN
+    weighting is then applied with NumPy: the solid angle with the porous adjustment, the electronegativity-difference
+    weight, the smooth distance cutoffs on the sum of the radii, and the semicircle integral that turns neighbor
+    weights into coordination number probabilities. Weighted and unweighted coordination numbers of every site, not
+    only oxygen sites, match CrystalNN up to the rounding of the weights.
+
+    Structures are analyzed through a StructureView, so per-species properties are computed once per distinct species
+    rather than once per site, and no pymatgen Site objects are built.
+
+    Attributes:
+        weighted_cn: Whether fractional neighbor weights are returned.
+        cation_anion: Whether neighbors are restricted to sites with opposite or zero charge.
+        distance_cutoffs: The distances beyond the sum of the radii at which weights start to decay and reach zero.
+        x_diff_weight: The weight of the electronegativity difference.
+        porous_adjustment: Whether solid angles are scaled by the solid angle per facet area, as for porous structures.
+        search_cutoff: The cutoff in Angstroms of the neighbor search, doubled as needed to close the Voronoi cells.
+
+    Examples:
+        >>> crystal = Crystal(pymatgen_structure=structure, nn_finder=VectorizedNN())
+    """
+
+    def __init__(
+            self,
+            weighted_cn: bool = False,
+            cation_anion: bool = False,
+            distance_cutoffs: Optional[Tuple[float, float]] = (0.5, 1),
+            x_diff_weight: float = 3.0,
+            porous_adjustment: bool = True,
+            search_cutoff: float = 7
+    ):
+        """
+        Initializes the VectorizedNN object.
+
+        Args:
+            weighted_cn: Whether fractional neighbor weights are returned.
+            cation_anion: Whether neighbors are restricted to sites with opposite or zero charge.
+            distance_cutoffs: The distances beyond the sum of the radii at which weights start to decay and reach
+                zero, or None to skip the distance weighting.
+            x_diff_weight: The weight of the electronegativity difference.
+            porous_adjustment: Whether solid angles are scaled by the solid angle per facet area.
+            search_cutoff: The cutoff in Angstroms of the neighbor search.
+        """
+        self.weighted_cn = weighted_cn
+        self.cation_anion = cation_anion
+        self.distance_cutoffs = distance_cutoffs
+        self.x_diff_weight = x_diff_weight or 0
+        self.porous_adjustment = porous_adjustment
+        self.search_cutoff = search_cutoff
+
+    @staticmethod
+    def _species_properties(view: StructureView) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Gets the radius, default radius, electronegativity, and oxidation state of every distinct species.
+
+        Args:
+            view: The structure view.
+
+        Returns:
+            A tuple of arrays indexed by species code.
+        """
+        properties = []
+        for specie in view.species:
+            # The radius helpers only read the species of a site
+            site = SimpleNamespace(specie=specie)
+            properties.append((
+                _get_radius(site),
+                _get_default_radius(site),
+                specie.X,
+                getattr(specie, "oxi_state", None) or 0,
+            ))
+        return tuple(np.array(column, dtype=float) for column in zip(*properties))
+
+    @staticmethod
+    def _semicircle_areas(bins: np.ndarray) -> np.ndarray:
+        """
+        Gets the area under the unit quarter circle between zero and each bin, normalized to one at x = 1.
+
+        Args:
+            bins: The bin edges, between 0 and 1.
+
+        Returns:
+            An array of normalized areas.
+        """
+        bins = np.clip(bins, 0, 1)
+        root = np.sqrt(1 - bins ** 2)
+        with np.errstate(divide="ignore"):
+            areas = 0.5 * (bins * root + np.arctan2(bins, root))
+        return areas / (0.25 * math.pi)
+
+    @staticmethod
+    def _get_facets(
+            view: StructureView,
+            indices: np.ndarray,
+            cutoff: float
+    ) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        Tessellates the target sites and their candidate neighbors, and measures the facets of the target cells.
+
+        Args:
+            view: The structure view.
+            indices: The indices of the target sites, without duplicates.
+            cutoff: The cutoff in Angstroms of the neighbor search.
+
+        Returns:
+            A tuple of the target positions, the neighbor site indices, the neighbor distances, and the solid angle and
+            area of the facet shared with each neighbor, or None if the cutoff is too small to close every target cell.
+        """
+        cart_coords = view.cart_coords
+        centers, neighbors, images, distances = find_points_in_spheres(
+            cart_coords,
+            np.ascontiguousarray(cart_coords[indices]),
+            r=float(cutoff),
+            pbc=np.ones(3, dtype=int),
+            lattice=view.lattice,
+            tol=1e-8,
+        )
+        # Each periodic image of a site is one point of the tessellation, shared by the target sites that find it
+        keys, inverse = np.unique(
+            np.column_stack([neighbors, np.rint(images).astype(int)]), axis=0, return_inverse=True
+        )
+        inverse = inverse.ravel()
+        points = cart_coords[keys[:, 0]] + keys[:, 1:] @ view.lattice
+        own = (distances < 1e-8) & (neighbors == indices[centers])
+        target_points = np.empty(len(indices), dtype=int)
+        target_points[centers[own]] = inverse[own]
+        point_targets = np.full(len(points), -1)
+        point_targets[target_points] = np.arange(len(indices))
+
+        try:
+            voronoi = Voronoi(points)
+        except RuntimeError:
+            return None
+        ridge_points = voronoi.ridge_points
+        lengths = np.fromiter(map(len, voronoi.ridge_vertices), dtype=int, count=len(ridge_points))
+        starts = np.cumsum(lengths) - lengths
+        ridge_vertices = np.fromiter(chain.from_iterable(voronoi.ridge_vertices), dtype=int, count=lengths.sum())
+
+        # A facet between two target sites belongs to both cells
+        ridges, centers, others = [], [], []
+        for side in (0, 1):
+            targets = point_targets[ridge_points[:, side]]
+            has_target = targets >= 0
+            ridges.append(np.flatnonzero(has_target))
+            centers.append(targets[has_target])
+            others.append(ridge_points[has_target, 1 - side])
+        ridges, centers, others = np.concatenate(ridges), np.concatenate(centers), np.concatenate(others)
+        if len(np.unique(centers)) < len(indices):
+            return None
+
+        # Fan-triangulate each facet from its first vertex, as the Voronoi vertices are in order around it
+        n_triangles = lengths[ridges] - 2
+        facets = np.repeat(np.arange(len(ridges)), n_triangles)
+        positions = np.arange(n_triangles.sum()) - np.repeat(np.cumsum(n_triangles) - n_triangles, n_triangles) + 1
+        first = ridge_vertices[starts[ridges][facets]]
+        second = ridge_vertices[starts[ridges][facets] + positions]
+        third = ridge_vertices[starts[ridges][facets] + positions + 1]
+        if (first < 0).any() or (second < 0).any() or (third < 0).any():
+            # A vertex at infinity: the cell is open
+            return None
+        center_points = points[target_points[centers]]
+        r0 = voronoi.vertices[first] - center_points[facets]
+        r1 = voronoi.vertices[second] - center_points[facets]
+        r2 = voronoi.vertices[third] - center_points[facets]
+        n0, n1, n2 = (np.linalg.norm(r, axis=1) for r in (r0, r1, r2))
+        triple = np.abs(np.einsum("ij,ij->i", r0, np.cross(r1, r2)))
+        denominator = (n0 * n1 * n2 + n2 * np.einsum("ij,ij->i", r0, r1) + n1 * np.einsum("ij,ij->i", r0, r2)
+                       + n0 * np.einsum("ij,ij->i", r1, r2))
+        # Solid angle of each triangle seen from the target site, and volume of the tetrahedron they span
+        solid_angles = np.bincount(facets, 2 * np.arctan2(triple, denominator), minlength=len(ridges))
+        volumes = np.bincount(facets, triple / 6, minlength=len(ridges))
+
+        distances = np.linalg.norm(points[others] - center_points, axis=1)
+        # The facet lies halfway to the neighbor, so the cone volume V = A d / 3 gives its area
+        areas = 6 * volumes / distances
+        return centers, keys[others, 0], distances, solid_angles, areas
+
+    def _get_weights(self, view: StructureView, indices: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Finds the Voronoi neighbors of all target sites and weights them.
+
+        Args:
+            view: The structure view.
+            indices: The indices of the target sites, without duplicates.
+
+        Returns:
+            A tuple of the target positions, the neighbor site indices, and the neighbor weights.
+
+        Raises:
+            RuntimeError: If a Voronoi cell stays open with the search cutoff at the longest cell diagonal.
+        """
+        # As in VoronoiNN, the search cutoff is doubled until every cell is closed, up to the longest cell diagonal
+        corners = np.array([[1, 1, 1], [-1, 1, 1], [1, -1, 1], [1, 1, -1]]) @ view.lattice
+        max_cutoff = np.linalg.norm(corners, axis=1).max() + 0.01
+        cutoff = self.search_cutoff
+        facets = self._get_facets(view, indices, cutoff)
+        while facets is None:
+            if cutoff >= max_cutoff:
+                raise RuntimeError("Error in Voronoi neighbor finding; max cutoff exceeded")
+            cutoff = min(cutoff * 2, max_cutoff + 0.001)
+            facets = self._get_facets(view, indices, cutoff)
+        centers, neighbors, distances, solid_angles, areas = facets
+
+        radii, default_radii, electronegativities, oxidation_states = self._species_properties(view)
+        # Per-species properties are indexed by the species codes of the target and neighbor sites
+        center_codes = view.species_codes[indices[centers]]
+        neighbor_codes = view.species_codes[neighbors]
+        if self.cation_anion:
+            keep = oxidation_states[center_codes] * oxidation_states[neighbor_codes] <= 0
+            centers, neighbors, distances = centers[keep], neighbors[keep], distances[keep]
+            center_codes, neighbor_codes = center_codes[keep], neighbor_codes[keep]
+            solid_angles, areas = solid_angles[keep], areas[keep]
+
+        weights = solid_angles.copy()
+        if self.porous_adjustment:
+            weights *= solid_angles / areas
+
+        if self.x_diff_weight > 0:
+            x_diff = np.abs(electronegativities[center_codes] - electronegativities[neighbor_codes])
+            chemical_weights = 1 + self.x_diff_weight * np.sqrt(x_diff / 3.3)
+            weights *= np.where(np.isnan(chemical_weights), 1, chemical_weights)
+
+        highest = np.zeros(len(indices))
+        np.maximum.at(highest, centers, weights)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            weights = np.where(highest[centers] > 0, weights / highest[centers], 0)
+
+        if self.distance_cutoffs:
+            radius_sums = np.where(
+                (radii[center_codes] > 0) & (radii[neighbor_codes] > 0),
+                radii[center_codes] + radii[neighbor_codes],
+                default_radii[center_codes] + default_radii[neighbor_codes],
+            )
+            cutoff_low = radius_sums + self.distance_cutoffs[0]
+            cutoff_high = radius_sums + self.distance_cutoffs[1]
+            fraction = np.clip((distances - cutoff_low) / (cutoff_high - cutoff_low), 0, 1)
+            weights *= (np.cos(fraction * math.pi) + 1) * 0.5
+
+        weights = np.round(weights, 3)
+        keep = weights > 0
+        return centers[keep], neighbors[keep], weights[keep]
+
+    def _get_cn_weights(self, weights: np.ndarray) -> np.ndarray:
+        """
+        Gets the weight each neighbor of one site contributes to the coordination number.
+
+        Args:
+            weights: The neighbor weights of one site.
+
+        Returns:
+            The fractional neighbor weights if weighted_cn is set, otherwise 1 for the neighbors of the most probable
+            coordination number and 0 for the rest.
+        """
+        if len(weights) == 0:
+            return weights
+        bins = np.unique(weights)[::-1]
+        areas = self._semicircle_areas(np.append(bins, 0))
+        cn_weights = areas[:-1] - areas[1:]
+        if self.weighted_cn:
+            # A neighbor belongs to every coordination shell whose threshold is at or below its weight
+            cumulative = np.cumsum(cn_weights[::-1])[::-1]
+            return cumulative[np.searchsorted(-bins, -weights)]
+        cn0_weight = 1 - cn_weights.sum()
+        if cn0_weight > cn_weights.max():
+            return np.zeros_like(weights)
+        threshold = bins[np.argmax(cn_weights)]
+        return (weights >= threshold).astype(float)
+
+    def get_cn_dicts(
+            self,
+            structure: Union[Structure, StructureView],
+            indices: Sequence[int],
+            use_weights: bool = False
+    ) -> List[Dict[str, float]]:
+        """
+        Gets the coordination number of each element bonded to each target site.
+
+        Args:
+            structure: The structure, or a view of it.
+            indices: The indices of the target sites.
+            use_weights: Whether to use weighted coordination numbers. Must match weighted_cn.
+
+        Returns:
+            A list of coordination number dictionaries, one per target site.
+
+        Raises:
+            ValueError: If use_weights does not match weighted_cn.
+        """
+        if self.weighted_cn != use_weights:
+            raise ValueError("The weighted_cn parameter and use_weights parameter should match!")
+        indices = np.asarray(indices, dtype=int)
+        if len(indices) == 0:
+            return []
+        view = structure if isinstance(structure, StructureView) else StructureView.from_structure(structure)
+        # Each site has one cell in the tessellation, however often it is requested
+        indices, requested = np.unique(indices, return_inverse=True)
+        centers, neighbors, weights = self._get_weights(view, indices)
+        species_strings = view.species_strings
+        neighbor_codes = view.species_codes[neighbors]
+
+        # Group neighbors by target site, from highest to lowest weight as CrystalNN reports them
+        order = np.lexsort((-weights, centers))
+        centers, neighbor_codes, weights = centers[order], neighbor_codes[order], weights[order]
+        bounds = np.searchsorted(centers, np.arange(len(indices) + 1))
+
+        cn_dicts = []
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            cn_dict = {}
+            for code, cn_weight in zip(neighbor_codes[start:stop], self._get_cn_weights(weights[start:stop])):
+                if cn_weight > 0:
+                    species_string = species_strings[code]
+                    cn_dict[species_string] = cn_dict.get(species_string, 0) + (cn_weight if use_weights else 1)
+            cn_dicts.append(cn_dict)
+        return [dict(cn_dicts[i]) for i in requested.ravel()]
+
+    def get_cn_dict(
+            self,
+            structure: Union[Structure, StructureView],
+            n: int,
+            use_weights: bool = False
+    ) -> Dict[str, float]:
+        """
+        Gets the coordination number of each element bonded to the site with index n.
+
+        Args:
+            structure: The structure, or a view of it.
+            n: The index of the target site.
+            use_weights: Whether to use weighted coordination numbers. Must match weighted_cn.
+
+        Returns:
+            The coordination number dictionary.
+        """
+        return self.get_cn_dicts(structure, [n], use_weights=use_weights)[0]
@@ -0,0 +1,213 @@
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Union
+
+from pymatgen.analysis.bond_valence import BVAnalyzer
+from pymatgen.core import Composition, Structure
+
+_guesses: Dict[Composition, Optional[Dict[str, float]]] = {}
+_lock = threading.Lock()
+
+
+def has_oxidation_states(structure: Structure) -> bool:
+    """
+    Checks whether any site of a structure carries a nonzero oxidation state.
+
+    Args:
+        structure: The structure.
+
+    Returns:
+        True if the structure is decorated with oxidation states.
+    """
+    return any(getattr(species, "oxi_state", 0) for species in structure.species)
+
+
+def read_oxstate_file(filepath: Union[str, Path]) -> List[float]:
+    """
+    Reads per-site oxidation states from a file of run-length encoded "count*state" entries, e.g. "4*2.0 12*-2.0".
+
+    Args:
+        filepath: The path to the oxidation state file.
+
+    Returns:
+        A list of oxidation states, one per site.
+
+    Examples:
+        >>> read_oxstate_file("oxstate/CaTiO3.mp-4019_oxstate")
+        [2.0, 2.0, 2.0, 2.0, -2.0, ...]
+    """
+    oxidation_states = []
+    with open(filepath) as file:
+        for entry in file.read().split():
+            count, oxidation_state = entry.split("*")
+            oxidation_states += int(count) * [float(oxidation_state)]
+    return oxidation_states
+
+
+def _guess(composition: Composition) -> Optional[Dict[str, float]]:
+    """
+    Gets the most likely charge-balanced oxidation state of each element, memoized by composition.
+
+    Args:
+        composition: The composition.
+
+    Returns:
+        A dictionary of element symbols to oxidation states, or None if no charge-balanced guess exists.
+    """
+    if composition not in _guesses:
+        guesses = composition.oxi_state_guesses()
+        with _lock:
+            _guesses[composition] = guesses[0] if guesses else None
+    return _guesses[composition]
+
+
+def guess_oxidation_states(composition: Composition) -> Dict[str, float]:
+    """
+    Guesses the oxidation state of each element, memoized by reduced composition.
+
+    The guess is computed once per reduced formula and process, and on the reduced composition, which is much cheaper
+    than enumerating the charge combinations of a whole cell as Structure.add_oxidation_state_by_guess does. Some
+    mixed-valence cells have no charge-balanced guess on their reduced formula, e.g. Sb2O4, with Sb3+ and Sb5+,
+    reduces to SbO2, and the whole cell is guessed on instead. Otherwise, for mixed-valence cells the two guesses can
+    still differ when the most likely whole-cell guess splits an element between oxidation states in a way that no
+    single formula unit can.
+
+    Args:
+        composition: The composition.
+
+    Returns:
+        A dictionary of element symbols to oxidation states, all zero if no charge-balanced guess exists.
+    """
+    guess = _guess(composition.reduced_composition)
+    if guess is None and composition != composition.reduced_composition:
+        guess = _guess(composition)
+    return guess if guess is not None else {element.symbol: 0 for element in composition}
+
+
+class GuessOxidationStates:
+    """
+    Assigns oxidation states from the memoized guess for the reduced composition, falling back to the whole cell if
+    the reduced composition has no charge-balanced guess. See guess_oxidation_states.
+
+    Examples:
+        >>> GuessOxidationStates().assign(structure)
+        'guess'
+    """
+
+    def assign(self, structure: Structure) -> str:
+        """
+        Decorates a structure with oxidation states.
+
+        Args:
+            structure: The structure, modified in place.
+
+        Returns:
+            The name of the strategy used.
+        """
+        structure.add_oxidation_state_by_element(guess_oxidation_states(structure.composition))
+        return "guess"
+
+
+class BondValenceOxidationStates:
+    """
+    Assigns oxidation states by bond valence analysis, falling back to another strategy if the analysis fails.
+
+    Attributes:
+        fallback: The strategy used when bond valence analysis fails, or None to raise the error.
+
+    Examples:
+        >>> BondValenceOxidationStates().assign(structure)
+        'bond_valence'
+    """
+
+    def __init__(self, fallback: Optional["OxidationStateAssigner"] = None, strict: bool = False, **kwargs):
+        """
+        Initializes the BondValenceOxidationStates object.
+
+        Args:
+            fallback: The strategy used when bond valence analysis fails, by default a new GuessOxidationStates.
+            strict: Whether to raise the error of a failed bond valence analysis instead of falling back.
+            **kwargs: Keyword arguments passed to BVAnalyzer.
+        """
+        self.fallback = None if strict else fallback or GuessOxidationStates()
+        self.analyzer = BVAnalyzer(**kwargs)
+
+    def assign(self, structure: Structure) -> str:
+        """
+        Decorates a structure with oxidation states.
+
+        Args:
+            structure: The structure, modified in place.
+
+        Returns:
+            The name of the strategy used.
+
+        Raises:
+            ValueError: If bond valence analysis fails and there is no fallback.
+        """
+        try:
+            valences = self.analyzer.get_valences(structure)
+        except ValueError:
+            if self.fallback is None:
+                raise
+            return self.fallback.assign(structure)
+        structure.add_oxidation_state_by_site(valences)
+        return "bond_valence"
+
+
+class SiteOxidationStates:
+    """
+    Assigns user-supplied oxidation states, one per site.
+
+    Attributes:
+        oxidation_states: The oxidation states, one per site.
+
+    Examples:
+        >>> SiteOxidationStates.from_file("oxstate/CaTiO3.mp-4019_oxstate").assign(structure)
+        'by_site'
+    """
+
+    def __init__(self, oxidation_states: Sequence[float]):
+        """
+        Initializes the SiteOxidationStates object.
+
+        Args:
+            oxidation_states: The oxidation states, one per site.
+        """
+        self.oxidation_states = list(oxidation_states)
+
+    @classmethod
+    def from_file(cls, filepath: Union[str, Path]) -> "SiteOxidationStates":
+        """
+        Reads the oxidation states from a file of run-length encoded "count*state" entries.
+
+        Args:
+            filepath: The path to the oxidation state file.
+
+        Returns:
+            The SiteOxidationStates object.
+        """
+        return cls(read_oxstate_file(filepath))
+
+    def assign(self, structure: Structure) -> str:
+        """
+        Decorates a structure with oxidation states.
+
+        Args:
+            structure: The structure, modified in place.
+
+        Returns:
+            The name of the strategy used.
+
+        Raises:
+            ValueError: If the number of oxidation states does not match the number of sites.
+        """
+        if len(self.oxidation_states) != len(structure):
+            raise ValueError(
+                f"Got {len(self.oxidation_states)} oxidation states for a structure with {len(structure)} sites."
+            )
+        structure.add_oxidation_state_by_site(self.oxidation_states)
+        return "by_site"
+
+
+OxidationStateAssigner = Union[GuessOxidationStates, BondValenceOxidationStates, SiteOxidationStates]
@@ -0,0 +1,268 @@
+import json
+import os
+import threading
+import time
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+_enabled = False
+_jsonl_path: Optional[Path] = None
+_jsonl_file = None
+_jsonl_pid = None
+_hooks: List[Callable[[str, float, Any], None]] = []
+_lock = threading.Lock()
+_disabled = nullcontext()
+
+
+class StageStats:
+    """
+    The call count, total duration, and longest duration of each stage.
+
+    Examples:
+        >>> crystal.stats.as_dict()["neighbors"]
+        {'count': 1, 'total': 0.0652, 'max': 0.0652}
+    """
+
+    def __init__(self):
+        """
+        Initializes the StageStats object.
+        """
+        self._stages: Dict[str, List[float]] = {}
+
+    def record(self, stage: str, seconds: float):
+        """
+        Records one call of a stage.
+
+        Args:
+            stage: The stage name.
+            seconds: The duration of the call.
+        """
+        stats = self._stages.get(stage)
+        if stats is None:
+            self._stages[stage] = [1, seconds, seconds]
+        else:
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+
+    def merge(self, other: Union["StageStats", Dict[str, Dict[str, float]]]):
+        """
+        Adds the calls recorded by other stats, e.g. those of a worker process.
+
+        Args:
+            other: The other stats, or their as_dict form.
+        """
+        if isinstance(other, StageStats):
+            other = other.as_dict()
+        for stage, stats in other.items():
+            mine = self._stages.setdefault(stage, [0, 0.0, 0.0])
+            mine[0] += stats["count"]
+            mine[1] += stats["total"]
+            mine[2] = max(mine[2], stats["max"])
+
+    def as_dict(self) -> Dict[str, Dict[str, float]]:
+        """
+        Gets the stats as a JSON-serializable dictionary.
+
+        Returns:
+            A dictionary of stage names to dictionaries with the count, total, and max duration in seconds.
+        """
+        return {stage: {"count": int(count), "total": total, "max": longest}
+                for stage, (count, total, longest) in self._stages.items()}
+
+    def reset(self):
+        """
+        Discards all recorded calls.
+        """
+        self._stages.clear()
+
+    def __bool__(self) -> bool:
+        return bool(self._stages)
+
+    def __repr__(self) -> str:
+        return f"StageStats({self.as_dict()})"
+
+
+_process_stats = StageStats()
+
+
+class _Stage:
+    """
+    Times one call of a stage and reports it to the instance stats, the process stats, the JSON lines file, and the
+    hooks. The JSON lines identify the owner by its profile_label attribute, if it has one.
+    """
+
+    __slots__ = ("stats", "stage", "owner", "start")
+
+    def __init__(self, stats: StageStats, stage: str, owner: Any):
+        self.stats = stats
+        self.stage = stage
+        self.owner = owner
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self.start
+        self.stats.record(self.stage, seconds)
+        with _lock:
+            _process_stats.record(self.stage, seconds)
+        if _jsonl_path is not None:
+            _write_jsonl({
+                "stage": self.stage,
+                "seconds": seconds,
+                "pid": os.getpid(),
+                "owner": getattr(self.owner, "profile_label", None),
+                "error": exc_info[0].__name__ if exc_info[0] is not None else None,
+            })
+        for hook in _hooks:
+            hook(self.stage, seconds, self.owner)
+        return False
+
+
+def stage(stats: StageStats, name: str, owner: Any = None):
+    """
+    Gets a context manager that times a stage if profiling is enabled, and does nothing otherwise.
+
+    Args:
+        stats: The stats of the instance running the stage.
+        name: The stage name.
+        owner: The instance running the stage, passed to the hooks.
+
+    Returns:
+        The context manager.
+
+    Examples:
+        >>> with stage(self.stats, "neighbors", self):
+        ...     cn_dicts = self.nn_finder.get_cn_dicts(view, indices)
+    """
+    if not _enabled:
+        return _disabled
+    return _Stage(stats, name, owner)
+
+
+def _write_jsonl(record: Dict[str, Any]):
+    """
+    Appends a record to the JSON lines file, opening it in each process that writes to it.
+
+    Args:
+        record: The JSON-serializable record.
+    """
+    global _jsonl_file, _jsonl_pid
+    with _lock:
+        if _jsonl_file is None or _jsonl_pid != os.getpid():
+            # Each line is written with one call on a file opened for appending, so lines from several processes
+            # do not interleave
+            _jsonl_file = open(_jsonl_path, "a", buffering=1)
+            _jsonl_pid = os.getpid()
+        _jsonl_file.write(json.dumps(record) + "\n")
+
+
+def enable(jsonl_path: Optional[Union[str, Path]] = None):
+    """
+    Enables profiling in this process.
+
+    Args:
+        jsonl_path: A file to append one JSON line per timed stage call to, or None to only keep stats.
+
+    Examples:
+        >>> enable("profile.jsonl")
+        >>> Crystal(filepath="POSCAR").compute().stats
+    """
+    global _enabled, _jsonl_path, _jsonl_file
+    with _lock:
+        if _jsonl_file is not None:
+            _jsonl_file.close()
+            _jsonl_file = None
+        _jsonl_path = Path(jsonl_path).expanduser() if jsonl_path is not None else None
+        _enabled = True
+
+
+def disable():
+    """
+    Disables profiling in this process. Recorded stats are kept.
+    """
+    global _enabled, _jsonl_path, _jsonl_file
+    with _lock:
+        _enabled = False
+        _jsonl_path = None
+        if _jsonl_file is not None:
+            _jsonl_file.close()
+            _jsonl_file = None
+
+
+def is_enabled() -> bool:
+    """
+    Checks whether profiling is enabled in this process.
+
+    Returns:
+        True if profiling is enabled.
+    """
+    return _enabled
+
+
+def get_settings() -> Tuple[bool, Optional[Path]]:
+    """
+    Gets the profiling settings of this process, to enable the same profiling in worker processes.
+
+    Returns:
+        A tuple of whether profiling is enabled and the JSON lines file, if any.
+    """
+    return _enabled, _jsonl_path
+
+
+def apply_settings(settings: Tuple[bool, Optional[Path]]):
+    """
+    Applies profiling settings from get_settings, e.g. in a worker process. Hooks are not carried over.
+
+    Args:
+        settings: A tuple of whether profiling is enabled and the JSON lines file, if any.
+    """
+    enabled, jsonl_path = settings
+    if enabled:
+        enable(jsonl_path)
+    else:
+        disable()
+
+
+def add_hook(hook: Callable[[str, float, Any], None]):
+    """
+    Adds a function called with the stage name, duration in seconds, and owner after each timed stage call.
+
+    Args:
+        hook: The hook.
+
+    Examples:
+        >>> add_hook(lambda stage, seconds, crystal: seconds > 10 and print(f"{crystal} spent {seconds} s in {stage}"))
+    """
+    _hooks.append(hook)
+
+
+def remove_hook(hook: Callable[[str, float, Any], None]):
+    """
+    Removes a hook added by add_hook.
+
+    Args:
+        hook: The hook.
+    """
+    _hooks.remove(hook)
+
+
+def get_process_stats() -> StageStats:
+    """
+    Gets the stats aggregated over all instances in this process, including those merged from worker processes.
+
+    Returns:
+        The process stats.
+    """
+    return _process_stats
+
+
+def reset_process_stats():
+    """
+    Discards the stats aggregated in this process.
+    """
+    with _lock:
+        _process_stats.reset()
@@ -0,0 +1,93 @@
+import re
+import sys
+import threading
+from typing import Dict, Iterable, List, NamedTuple
+
+from pymatgen.core import Species
+
+_SPECIES_PATTERN = re.compile(r"([A-Z][a-z]*)(\d+(?:\.\d*)?)?([+-])(?:,.*)?")
+
+_keys: Dict[str, "SpeciesKey"] = {}
+_lock = threading.Lock()
+
+
+class SpeciesKey(NamedTuple):
+    """
+    The element symbol and oxidation state of a species string, such as a key of a coordination number dictionary.
+
+    Attributes:
+        symbol: The element symbol, e.g. "Fe".
+        oxidation_state: The oxidation state, e.g. 2.66666667.
+    """
+    symbol: str
+    oxidation_state: float
+
+
+def _parse(species_string: str) -> SpeciesKey:
+    """
+    Parses a species string without memoization.
+
+    Args:
+        species_string: The species string, e.g. "Ti4+", "O2-", "Na+", or "Fe2+,spin=5".
+
+    Returns:
+        The species key.
+
+    Raises:
+        ValueError: If the string is not a species with an oxidation state.
+    """
+    match = _SPECIES_PATTERN.fullmatch(species_string)
+    if match is None:
+        species = Species.from_str(species_string)
+        return SpeciesKey(sys.intern(species.symbol), float(species.oxi_state))
+    symbol, magnitude, sign = match.groups()
+    oxidation_state = float(magnitude) if magnitude else 1.0
+    return SpeciesKey(sys.intern(symbol), -oxidation_state if sign == "-" else oxidation_state)
+
+
+def parse_species(species_string: str) -> SpeciesKey:
+    """
+    Parses a species string into its element symbol and oxidation state, once per distinct string in this process.
+
+    Coordination number dictionaries of a whole dataset use a few dozen distinct species strings, so every later call
+    is a dictionary lookup returning the same SpeciesKey object.
+
+    Args:
+        species_string: The species string, e.g. "Ti4+".
+
+    Returns:
+        The shared species key.
+
+    Raises:
+        ValueError: If the string is not a species with an oxidation state.
+
+    Examples:
+        >>> parse_species("Fe2.67+")
+        SpeciesKey(symbol='Fe', oxidation_state=2.67)
+    """
+    key = _keys.get(species_string)
+    if key is None:
+        key = _keys.setdefault(species_string, _parse(species_string))
+    return key
+
+
+def parse_species_many(species_strings: Iterable[str]) -> List[SpeciesKey]:
+    """
+    Parses many species strings.
+
+    Args:
+        species_strings: The species strings.
+
+    Returns:
+        The shared species keys, aligned with species_strings.
+    """
+    keys = _keys
+    return [keys.get(species_string) or parse_species(species_string) for species_string in species_strings]
+
+
+def reset_species():
+    """
+    Discards all parsed species strings.
+    """
+    with _lock:
+        _keys.clear()
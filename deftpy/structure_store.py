@@ -0,0 +1,194 @@
+import hashlib
+import os
+from pathlib import Path
+from typing import List, Optional, Sequence, Union
+
+import numpy as np
+from pymatgen.core import Lattice, Species, Structure
+from pymatgen.core.periodic_table import Element
+
+_store: Optional["StructureStore"] = None
+
+
+def pack_structure(structure: Structure) -> np.ndarray:
+    """
+    Packs an ordered structure into a flat float64 array.
+
+    The layout is the number of sites, the 3x3 lattice matrix, the atomic numbers, the oxidation states (NaN for
+    undecorated sites), and the fractional coordinates.
+
+    Args:
+        structure: The ordered structure.
+
+    Returns:
+        The packed array.
+
+    Raises:
+        ValueError: If the structure is disordered.
+    """
+    if not structure.is_ordered:
+        raise ValueError("Only ordered structures can be packed.")
+    species = structure.species
+    atomic_numbers = [specie.Z for specie in species]
+    oxidation_states = [getattr(specie, "oxi_state", None) for specie in species]
+    oxidation_states = [np.nan if oxidation_state is None else oxidation_state for oxidation_state in oxidation_states]
+    return np.concatenate([
+        [len(structure)],
+        structure.lattice.matrix.ravel(),
+        atomic_numbers,
+        oxidation_states,
+        structure.frac_coords.ravel(),
+    ]).astype(np.float64)
+
+
+def unpack_structure(packed: np.ndarray) -> Structure:
+    """
+    Unpacks a structure packed by pack_structure.
+
+    Args:
+        packed: The packed array.
+
+    Returns:
+        The structure.
+    """
+    n = int(packed[0])
+    lattice = Lattice(np.array(packed[1:10]).reshape(3, 3))
+    atomic_numbers = packed[10:10 + n].astype(int)
+    oxidation_states = packed[10 + n:10 + 2 * n]
+    frac_coords = np.array(packed[10 + 2 * n:10 + 5 * n]).reshape(n, 3)
+    species = [
+        Element.from_Z(z) if np.isnan(oxidation_state) else Species(Element.from_Z(z).symbol, float(oxidation_state))
+        for z, oxidation_state in zip(atomic_numbers, oxidation_states)
+    ]
+    return Structure(lattice, species, frac_coords)
+
+
+class StructureStore:
+    """
+    A directory of parsed structures in a compact binary format, keyed by source path, size, and modification time.
+
+    Each structure is stored as one packed float64 .npy file, which is memory-mapped on load. A source file that
+    changes gets a new key, so stale entries are never returned. Only the lattice, species, oxidation states, and
+    fractional coordinates are kept; site properties are not.
+
+    Attributes:
+        directory: The directory of packed structures.
+
+    Examples:
+        >>> set_structure_store(StructureStore("~/.cache/deftpy/structures"))
+        >>> crystal = Crystal(filepath="poscars/CaTiO3.0000001_POSCAR_wyck")
+    """
+
+    def __init__(self, directory: Union[str, Path]):
+        """
+        Initializes the StructureStore object, creating the directory if needed.
+
+        Args:
+            directory: The directory of packed structures.
+        """
+        self.directory = Path(directory).expanduser()
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _entry_path(self, filepath: Union[str, Path]) -> Path:
+        """
+        Gets the path of the packed structure of a source file.
+
+        Args:
+            filepath: The path to the source file.
+
+        Returns:
+            The path to the packed structure.
+        """
+        filepath = os.path.abspath(filepath)
+        stat = os.stat(filepath)
+        key = hashlib.sha1(f"{filepath}\0{stat.st_size}\0{stat.st_mtime_ns}".encode()).hexdigest()
+        return self.directory / key[:2] / f"{key}.npy"
+
+    def load(self, filepath: Union[str, Path], fmt: Optional[str] = None) -> Structure:
+        """
+        Loads a structure, parsing the source file and storing the result on a miss.
+
+        Args:
+            filepath: The path to the source file.
+            fmt: The file format, e.g. "poscar" or "cif". Defaults to inferring it from the filename.
+
+        Returns:
+            The structure.
+        """
+        entry_path = self._entry_path(filepath)
+        if entry_path.exists():
+            return unpack_structure(np.load(entry_path, mmap_mode="r"))
+        structure = parse_structure(filepath, fmt)
+        if structure.is_ordered:
+            entry_path.parent.mkdir(exist_ok=True)
+            temporary_path = entry_path.with_name(f"{entry_path.stem}.{os.getpid()}.tmp.npy")
+            np.save(temporary_path, pack_structure(structure))
+            os.replace(temporary_path, entry_path)
+        return structure
+
+    def load_many(self, filepaths: Sequence[Union[str, Path]], fmt: Optional[str] = None) -> List[Structure]:
+        """
+        Loads many structures.
+
+        Args:
+            filepaths: The paths to the source files.
+            fmt: The file format, e.g. "poscar" or "cif". Defaults to inferring it from each filename.
+
+        Returns:
+            A list of structures.
+        """
+        return [self.load(filepath, fmt) for filepath in filepaths]
+
+
+def parse_structure(filepath: Union[str, Path], fmt: Optional[str] = None) -> Structure:
+    """
+    Parses a structure file.
+
+    Args:
+        filepath: The path to the file.
+        fmt: The file format, e.g. "poscar" or "cif". Defaults to inferring it from the filename.
+
+    Returns:
+        The structure.
+    """
+    if fmt is None:
+        return Structure.from_file(filepath)
+    with open(filepath) as file:
+        return Structure.from_str(file.read(), fmt=fmt)
+
+
+def set_structure_store(store: Optional[StructureStore]):
+    """
+    Sets the structure store used by load_structure in this process, or None to always parse files.
+
+    Args:
+        store: The structure store.
+    """
+    global _store
+    _store = store
+
+
+def get_structure_store() -> Optional[StructureStore]:
+    """
+    Gets the structure store used by load_structure in this process.
+
+    Returns:
+        The structure store, or None if files are always parsed.
+    """
+    return _store
+
+
+def load_structure(filepath: Union[str, Path], fmt: Optional[str] = None) -> Structure:
+    """
+    Loads a structure file through the process-wide structure store, if one is set.
+
+    Args:
+        filepath: The path to the file.
+        fmt: The file format, e.g. "poscar" or "cif". Defaults to inferring it from the filename.
+
+    Returns:
+        The structure.
+    """
+    if _store is None:
+        return parse_structure(filepath, fmt)
+    return _store.load(filepath, fmt)
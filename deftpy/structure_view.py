@@ -0,0 +1,167 @@
+from typing import Dict, List
+
+import numpy as np
+import spglib
+from pymatgen.core import Lattice, Structure
+
+
+class StructureView:
+    """
+    A compact, array-backed view of an ordered structure for the feature hot path.
+
+    Sites are stored as arrays instead of pymatgen Site objects: a lattice matrix, fractional coordinates, and an
+    integer species code per site that indexes a small table of distinct species. Symmetry analysis and neighbor search
+    work on these arrays; pymatgen objects are only built by to_structure.
+
+    Attributes:
+        lattice: The 3x3 lattice matrix, one lattice vector per row.
+        frac_coords: The fractional coordinates, one row per site.
+        species_codes: The species code of each site.
+        species: The distinct pymatgen species, indexed by species code.
+        symbols: The element symbol of each distinct species.
+        oxidation_states: The oxidation state of each distinct species, NaN if it has none.
+
+    Examples:
+        >>> view = StructureView.from_structure(structure)
+        >>> view.species_strings
+        ['Ca2+', 'O2-', 'Ti4+']
+    """
+
+    __slots__ = ("lattice", "frac_coords", "species_codes", "species", "symbols", "oxidation_states", "_cart_coords")
+
+    def __init__(self, lattice: np.ndarray, frac_coords: np.ndarray, species_codes: np.ndarray, species: List):
+        """
+        Initializes the StructureView object.
+
+        Args:
+            lattice: The 3x3 lattice matrix.
+            frac_coords: The fractional coordinates.
+            species_codes: The species code of each site.
+            species: The distinct pymatgen species, indexed by species code.
+        """
+        self.lattice = np.ascontiguousarray(lattice, dtype=float)
+        self.frac_coords = np.ascontiguousarray(frac_coords, dtype=float)
+        self.species_codes = np.asarray(species_codes, dtype=np.int32)
+        self.species = list(species)
+        self.symbols = [specie.symbol for specie in self.species]
+        self.oxidation_states = np.array(
+            [getattr(specie, "oxi_state", None) for specie in self.species], dtype=float
+        )
+        self._cart_coords = None
+
+    @classmethod
+    def from_structure(cls, structure: Structure) -> "StructureView":
+        """
+        Builds a view of an ordered pymatgen structure.
+
+        Args:
+            structure: The ordered structure.
+
+        Returns:
+            The StructureView object.
+
+        Raises:
+            ValueError: If the structure is disordered.
+        """
+        if not structure.is_ordered:
+            raise ValueError("Only ordered structures have a StructureView.")
+        codes: Dict = {}
+        species_codes = [codes.setdefault(specie, len(codes)) for specie in structure.species]
+        return cls(structure.lattice.matrix, structure.frac_coords, species_codes, list(codes))
+
+    def to_structure(self) -> Structure:
+        """
+        Builds the pymatgen structure of the view.
+
+        Returns:
+            The structure.
+        """
+        return Structure(Lattice(self.lattice), [self.species[code] for code in self.species_codes], self.frac_coords)
+
+    def remove_site(self, index: int) -> "StructureView":
+        """
+        Gets a view of the structure with one site removed. The species table is shared and unchanged.
+
+        Args:
+            index: The index of the removed site.
+
+        Returns:
+            The new StructureView object.
+        """
+        keep = np.arange(len(self)) != index
+        return StructureView(self.lattice, self.frac_coords[keep], self.species_codes[keep], self.species)
+
+    def replace_site(self, index: int, specie) -> "StructureView":
+        """
+        Gets a view of the structure with the species of one site replaced, adding it to the species table if needed.
+
+        Args:
+            index: The index of the replaced site.
+            specie: The new pymatgen species.
+
+        Returns:
+            The new StructureView object.
+        """
+        species = list(self.species)
+        if specie not in species:
+            species.append(specie)
+        species_codes = self.species_codes.copy()
+        species_codes[index] = species.index(specie)
+        return StructureView(self.lattice, self.frac_coords, species_codes, species)
+
+    def __len__(self) -> int:
+        return len(self.species_codes)
+
+    @property
+    def cart_coords(self) -> np.ndarray:
+        """
+        The Cartesian coordinates, one row per site.
+        """
+        if self._cart_coords is None:
+            self._cart_coords = np.ascontiguousarray(self.frac_coords @ self.lattice)
+        return self._cart_coords
+
+    @property
+    def species_strings(self) -> List[str]:
+        """
+        The pymatgen species string of each distinct species, as used in coordination number dictionaries.
+        """
+        return [str(specie) for specie in self.species]
+
+    def site_indices(self, symbol: str) -> np.ndarray:
+        """
+        Gets the indices of the sites of an element.
+
+        Args:
+            symbol: The element symbol.
+
+        Returns:
+            An array of site indices.
+        """
+        codes = [code for code, code_symbol in enumerate(self.symbols) if code_symbol == symbol]
+        return np.flatnonzero(np.isin(self.species_codes, codes))
+
+    def equivalent_site_groups(self, symprec: float = 0.01, angle_tolerance: float = 5) -> List[np.ndarray]:
+        """
+        Groups the sites into symmetry-equivalent sets with spglib.
+
+        Sites are distinguished by species, including oxidation state, as in pymatgen's SpacegroupAnalyzer. Groups
+        are ordered by, and each group starts with, its lowest site index.
+
+        Args:
+            symprec: The distance tolerance for symmetry finding.
+            angle_tolerance: The angle tolerance for symmetry finding.
+
+        Returns:
+            A list of arrays of site indices.
+        """
+        dataset = spglib.get_symmetry_dataset(
+            (self.lattice, self.frac_coords, self.species_codes + 1), symprec=symprec, angle_tolerance=angle_tolerance
+        )
+        if dataset is None:
+            return [np.array([i]) for i in range(len(self))]
+        equivalent_atoms = np.asarray(dataset.equivalent_atoms)
+        _, inverse = np.unique(equivalent_atoms, return_inverse=True)
+        order = np.argsort(inverse, kind="stable")
+        bounds = np.searchsorted(inverse[order], np.arange(inverse.max() + 2))
+        return [order[start:stop] for start, stop in zip(bounds[:-1], bounds[1:])]
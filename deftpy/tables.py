@@ -0,0 +1,273 @@
+import threading
+from enum import Enum
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+TABLE_SOURCES = {
+    "Eb": {"filepath": "../data/Eb.csv", "usecols": ["elem", "os", "Eb"]},
+    "Vr": {"filepath": "../data/Vr.csv", "usecols": ["elem", "n", "m", "Vr"]},
+}
+
+_tables: Dict[str, pd.DataFrame] = {}
+_indexes: Dict[Tuple[str, str, str], "PropertyIndex"] = {}
+_lock = threading.Lock()
+
+
+class LookupMode(str, Enum):
+    """
+    How oxidation states are matched to the rows of a property table.
+
+    DISCRETE takes the row with the nearest oxidation state of the element within a tolerance, so fractional
+    oxidation states written with fewer digits, e.g. Fe2.67+ for the table's 8/3, still match. CONTINUOUS also
+    interpolates linearly between the two rows of the element that bracket the oxidation state, e.g. for mixed-valence
+    Fe2.8+ between the Fe8/3+ and Fe3+ rows.
+    """
+    DISCRETE = "discrete"
+    CONTINUOUS = "continuous"
+
+
+class PropertyIndex:
+    """
+    An (element, oxidation state) index over one value column of a property table.
+
+    Lookups keep the first matching row of the table and return NaN when there is no match. Single lookups of an
+    oxidation state in the table are answered from a dictionary in O(1). The rows of each element are also kept sorted
+    by oxidation state, so that many species are matched or interpolated in one vectorized search, which single
+    lookups fall back to for oxidation states matched within the tolerance or interpolated.
+
+    Attributes:
+        column_name: The value column, e.g. "Eb" or "Vr".
+        comparison: The oxidation state column, e.g. "os" or "n".
+
+    Examples:
+        >>> index = PropertyIndex(get_table("Eb"), "Eb", "os")
+        >>> index.get("Ce", 4)
+        2.6026499430331875
+        >>> index.get_many(["Fe", "Fe"], [2.67, 2.8], mode="continuous")
+        array([1.92955012, 1.98752806])
+    """
+
+    def __init__(self, dataframe: pd.DataFrame, column_name: str, comparison: str):
+        """
+        Builds the index.
+
+        Args:
+            dataframe: The property table.
+            column_name: The value column.
+            comparison: The oxidation state column.
+        """
+        self.column_name = column_name
+        self.comparison = comparison
+        table = dataframe.dropna(subset=["elem", comparison]).drop_duplicates(["elem", comparison], keep="first")
+        symbols = table["elem"].to_numpy()
+        oxidation_states = table[comparison].to_numpy(dtype=float)
+        values = table[column_name].to_numpy(dtype=float)
+        self._values = dict(zip(zip(symbols.tolist(), oxidation_states.tolist()), values.tolist()))
+
+        # The rows sorted by element code, then oxidation state, searched through a combined key
+        self._codes = {symbol: code for code, symbol in enumerate(dict.fromkeys(symbols))}
+        codes = np.array([self._codes[symbol] for symbol in symbols], dtype=int)
+        order = np.lexsort((oxidation_states, codes))
+        self._grid_codes = codes[order]
+        self._grid_states = oxidation_states[order]
+        self._grid_values = values[order]
+        self._grid_keys = self._key(self._grid_codes, self._grid_states)
+
+    @staticmethod
+    def _key(codes: np.ndarray, oxidation_states: np.ndarray) -> np.ndarray:
+        """
+        Combines element codes and oxidation states into keys that sort by element, then oxidation state.
+
+        Args:
+            codes: The element codes.
+            oxidation_states: The oxidation states, which are far smaller in magnitude than 50.
+
+        Returns:
+            An array of keys.
+        """
+        return codes * 100.0 + oxidation_states
+
+    def get(
+            self,
+            symbol: str,
+            oxidation_state: float,
+            mode: Union[str, LookupMode] = LookupMode.DISCRETE,
+            tolerance: float = 0.01
+    ) -> float:
+        """
+        Looks up the value for a single species, matching it as get_many does.
+
+        Args:
+            symbol: The element symbol.
+            oxidation_state: The oxidation state.
+            mode: "discrete" to take the row with the nearest oxidation state within the tolerance, or "continuous"
+                to also interpolate between the rows of the element that bracket the oxidation state.
+            tolerance: The largest difference between an oxidation state and a matching row.
+
+        Returns:
+            The value, or NaN if the table has no matching row.
+        """
+        value = self._values.get((symbol, float(oxidation_state)))
+        if value is not None:
+            return value
+        return float(self.get_many([symbol], [oxidation_state], mode=mode, tolerance=tolerance)[0])
+
+    def get_many(
+            self,
+            symbols: Iterable[str],
+            oxidation_states: Iterable[float],
+            mode: Union[str, LookupMode] = LookupMode.DISCRETE,
+            tolerance: float = 0.01
+    ) -> np.ndarray:
+        """
+        Looks up the values for many species in one vectorized call.
+
+        Args:
+            symbols: The element symbols.
+            oxidation_states: The oxidation states, aligned with symbols.
+            mode: "discrete" to take the row with the nearest oxidation state within the tolerance, or "continuous"
+                to also interpolate between the rows of the element that bracket the oxidation state.
+            tolerance: The largest difference between an oxidation state and a matching row.
+
+        Returns:
+            An array of values, with NaN where the table has no matching row, or, in continuous mode, where the
+            oxidation state is outside the range of the element's rows.
+        """
+        mode = LookupMode(mode)
+        codes = np.array([self._codes.get(symbol, -1) for symbol in symbols], dtype=int)
+        states = np.asarray(list(oxidation_states), dtype=float)
+        result = np.full(len(codes), np.nan)
+        if len(codes) == 0 or len(self._grid_keys) == 0:
+            return result
+
+        # The rows just below and above each species, valid only if they belong to its element
+        upper = np.searchsorted(self._grid_keys, self._key(codes, states))
+        lower = np.clip(upper - 1, 0, len(self._grid_keys) - 1)
+        upper = np.clip(upper, 0, len(self._grid_keys) - 1)
+        lower_distance = np.where(self._grid_codes[lower] == codes, np.abs(states - self._grid_states[lower]), np.inf)
+        upper_distance = np.where(self._grid_codes[upper] == codes, np.abs(self._grid_states[upper] - states), np.inf)
+
+        nearest = np.where(upper_distance < lower_distance, upper, lower)
+        matched = np.minimum(lower_distance, upper_distance) <= tolerance
+        result[matched] = self._grid_values[nearest[matched]]
+        if mode is LookupMode.CONTINUOUS:
+            between = ~matched & np.isfinite(lower_distance) & np.isfinite(upper_distance) & (lower != upper)
+            lower, upper = lower[between], upper[between]
+            lower_states = self._grid_states[lower]
+            weight = (states[between] - lower_states) / (self._grid_states[upper] - lower_states)
+            result[between] = (1 - weight) * self._grid_values[lower] + weight * self._grid_values[upper]
+        return result
+
+    def __len__(self) -> int:
+        return len(self._grid_keys)
+
+
+def _read_table(name: str) -> pd.DataFrame:
+    """
+    Reads a property table from disk, keeping only the columns needed for lookups.
+
+    Args:
+        name: The table name, a key of TABLE_SOURCES.
+
+    Returns:
+        The property table.
+
+    Raises:
+        KeyError: If no source is known for the table name.
+    """
+    if name not in TABLE_SOURCES:
+        raise KeyError(f"Unknown property table {name!r}; register it with register_table first.")
+    source = TABLE_SOURCES[name]
+    package_dir = Path(__file__).parent
+    return pd.read_csv(package_dir / source["filepath"], usecols=source["usecols"])
+
+
+def get_table(name: str) -> pd.DataFrame:
+    """
+    Gets a property table, reading it from disk the first time it is requested in this process.
+
+    The returned dataframe is shared by every caller in the process and must be treated as read-only.
+
+    Args:
+        name: The table name, e.g. "Eb" or "Vr".
+
+    Returns:
+        The shared property table.
+
+    Examples:
+        >>> eb = get_table("Eb")
+        >>> list(eb.columns)
+        ['elem', 'os', 'Eb']
+    """
+    table = _tables.get(name)
+    if table is None:
+        with _lock:
+            table = _tables.get(name)
+            if table is None:
+                table = _read_table(name)
+                _tables[name] = table
+    return table
+
+
+def get_index(name: str, column_name: str, comparison: str) -> PropertyIndex:
+    """
+    Gets the (element, oxidation state) index of a property table, building it once per process.
+
+    Args:
+        name: The table name, e.g. "Eb" or "Vr".
+        column_name: The value column.
+        comparison: The oxidation state column.
+
+    Returns:
+        The shared index.
+    """
+    key = (name, column_name, comparison)
+    index = _indexes.get(key)
+    if index is None:
+        table = get_table(name)
+        with _lock:
+            index = _indexes.get(key)
+            if index is None:
+                index = PropertyIndex(table, column_name, comparison)
+                _indexes[key] = index
+    return index
+
+
+def register_table(name: str, dataframe: pd.DataFrame):
+    """
+    Registers a custom property table, replacing any table already loaded under the same name.
+
+    Args:
+        name: The table name, e.g. "Eb" or "Vr".
+        dataframe: The property table. It must contain the columns used for lookups.
+
+    Examples:
+        >>> register_table("Vr", my_vr_dataframe)
+    """
+    with _lock:
+        _tables[name] = dataframe
+        for key in [key for key in _indexes if key[0] == name]:
+            del _indexes[key]
+
+
+def load_tables(names: List[str] = None):
+    """
+    Loads property tables eagerly, e.g. once per worker process before a batch job.
+
+    Args:
+        names: The table names to load. Defaults to all tables in TABLE_SOURCES.
+    """
+    for name in names or list(TABLE_SOURCES):
+        get_table(name)
+
+
+def reset_tables():
+    """
+    Drops all loaded and registered tables, so the next lookup reads them from disk again.
+    """
+    with _lock:
+        _tables.clear()
+        _indexes.clear()
@@ -1,20 +1,22 @@
 """ Get crystal features for structures in Yu Kumagai's Physical Review Materials Paper """
-import tarfile
 from glob import glob
 
 import matplotlib.pyplot as plt
 import pandas as pd
 from pymatgen.core import Composition
-from sklearn import linear_model
 from sklearn.metrics import mean_absolute_error
 
+from deftpy.cfm import fit_cfms
+from deftpy.datasets import ArchiveIndex
+
 
 def main():
     # Li2O
-    with tarfile.open(glob("playground/kumagai_data/oxygen_vacancies_db_data/Li2O/*0.tar.gz")[0], "r:gz") as tar:
-        # Read the member with the name "CONTCAR-finish"
-        f = tar.extractfile("CONTCAR-finish")
-        print(f.read().decode("utf-8"))
+    # Read the member with the name "CONTCAR-finish", indexing the archive for later runs
+    index = ArchiveIndex("playground/kumagai_data/oxygen_vacancies_db_data/index.json")
+    archive = glob("playground/kumagai_data/oxygen_vacancies_db_data/Li2O/*0.tar.gz")[0]
+    print(index.read(archive, ["CONTCAR-finish"])["CONTCAR-finish"].decode("utf-8"))
+    index.save()
 
     # Get data
     df_0 = pd.read_csv("playground/kumagai_data/vacancy_formation_energy_ml/charge0.csv")  # neutral vacancies
@@ -69,11 +71,11 @@ def main():
 
     # Fit basic crystal feature model (cfm)
     fig, axs = plt.subplots(ncols=3, figsize=(12, 4))
-    for i, charge in enumerate([0, 1, 2]):
-        cfm = linear_model.HuberRegressor()
-        X = df_plot.loc[df_plot.charge == charge, ["vr", "band_gap"]]
-        y = df_plot.loc[df_plot.charge == charge, "vacancy_formation_energy"]
-        cfm.fit(X, y)
+    cfms = fit_cfms({"kumagai": df_plot}, [["vr", "band_gap"]], target="vacancy_formation_energy")
+    for i, cfm in enumerate(cfms):
+        charge = cfm.metadata["charge"]
+        X = df_plot.loc[df_plot.charge == charge]
+        y = X["vacancy_formation_energy"]
         y_pred = cfm.predict(X)
 
         # Plot results
@@ -87,7 +89,7 @@ def main():
         axs[i].set_ylim(-4, 10)
 
         # Add equation
-        equation = "$E_v = {:.2f} {:+.2f} V_r {:+.2f} E_g$".format(cfm.intercept_, cfm.coef_[0], cfm.coef_[1])
+        equation = "$E_v = {:.2f} {:+.2f} V_r {:+.2f} E_g$".format(cfm.intercept, cfm.coef[0], cfm.coef[1])
         axs[i].set_xlabel(equation)
 
         # Add MAE
@@ -6,10 +6,10 @@ import numpy as np
 import pandas as pd
 from matplotlib import pyplot as plt
 from pymatgen.core import Structure, Composition
-from sklearn.linear_model import HuberRegressor
-from tqdm import tqdm
 
-from deftpy.crystal_analysis import Crystal
+from deftpy.cfm import fit_cfm
+from deftpy.datasets import featurize_dataset
+from deftpy.oxidation import SiteOxidationStates
 
 
 def main():
@@ -45,11 +45,7 @@ def main():
     for _, row in df.iterrows():
         #oxstate_path = f"playground/witman_data/data_01_03_22/oxstate/{row['filename']}_oxstate"
         oxstate_path = data_path + f"oxstate/{row['filename']}_oxstate"
-        oxstate = []
-        for x in open(oxstate_path).read().split():
-            oxstate += int(x.split("*")[0]) * [float(x.split("*")[1])]
-        structure = row["structure"]
-        structure.add_oxidation_state_by_site(oxstate)
+        SiteOxidationStates.from_file(oxstate_path).assign(row["structure"])
 
     # Binary?
     #df["is_binary"] = df["formula"].apply(lambda x: len(Composition(x).elements) == 2)
@@ -63,73 +59,28 @@ def main():
     # Calculate crystal features for binary structures
     #df = df[df["is_binary"]]
     df = df[df["is_binary_or_ternary"]]
-    df_cf = pd.DataFrame()
-    for defectid in tqdm(df["defectid"].unique()):
-        df_defectid = df[df["defectid"] == defectid]
-        structure = df_defectid["structure"].iloc[0]
-        crystal = Crystal(pymatgen_structure=structure)
-
-        CN = crystal.cn_dicts
-        Eb = crystal.bond_dissociation_enthalpies
-        Vr = crystal.reduction_potentials
-
-        # Calculate CN-weighted Eb sum
-        Eb_sum = []
-        for CN_dict, Eb_dict in zip(CN, Eb):
-            CN_array = np.array(list(CN_dict.values()))
-            Eb_array = np.array(list(Eb_dict.values()))
-            Eb_sum.append(np.sum(CN_array * Eb_array))
-
-        # Calculate maximum Vr
-        Vr_max = []
-        for Vr_dict in Vr:
-            try:
-                Vr_max.append(max(Vr_dict.values()))
-            except ValueError:
-                Vr_max.append(np.nan)
-
-        # Make a dataframe
-        formula = df_defectid["formula"].values
-        defectid = df_defectid["defectid"].values
-        site = df_defectid["site"].values
-        Eg = df_defectid["bandgap_eV"].values
-        Ev = df_defectid["dH_eV"].values
-        try:
-            df_cf = pd.concat(
-                [
-                    df_cf,
-                    pd.DataFrame(
-                        {
-                            "formula": formula,
-                            "defectid": defectid,
-                            "site": site,
-                            "Eb_sum": Eb_sum,
-                            "Vr_max": Vr_max,
-                            "Eg": Eg,
-                            "Ev": Ev,
-                        }
-                    ),
-                ]
-            )
-        except ValueError:
-            pass
-    df_cf = df_cf.reset_index(drop=True)
+    # Featurize each structure once and join the CN-weighted Eb sum and maximum Vr of its sites to its rows
+    df_cf = featurize_dataset(
+        df,
+        columns=["formula", "defectid", "site", "bandgap_eV", "dH_eV"],
+        feature_columns=["Eb_sum", "Vr_max"],
+    )
+    df_cf = df_cf.rename(columns={"bandgap_eV": "Eg", "dH_eV": "Ev"})
+    df_cf = df_cf[["formula", "defectid", "site", "Eb_sum", "Vr_max", "Eg", "Ev"]]
     df_cf.to_csv("witman_data1.5.csv", index=False)
 
     # plot witman-based cfm
     # remove NaNs
     df_cf = df_cf.dropna()
-    cfm = HuberRegressor()
-    #X = df_cf[["Vr_max", "Eg"]]
-    X = df_cf[["Eb_sum", "Vr_max", "Eg"]]
+    #cfm = fit_cfm(df_cf, ["Vr_max", "Eg"])
+    cfm = fit_cfm(df_cf, ["Eb_sum", "Vr_max", "Eg"])
     y = df_cf["Ev"]
-    cfm.fit(X, y)
-    y_pred = cfm.predict(X)
+    y_pred = cfm.predict(df_cf)
 
     plt.scatter(y, y_pred)
     plt.plot([1, 9], [1, 9], "k--")
-    #equation = f"$E_v$ = {cfm.intercept_:.2f} + {cfm.coef_[0]:.2f} $V_r$ + {cfm.coef_[1]:.2f} $E_g$"
-    equation = f"$E_v$ = {cfm.intercept_:.2f} + {cfm.coef_[0]:.2f} $\\Sigma E_b$ + {cfm.coef_[1]:.2f} $V_r$ + {cfm.coef_[2]:.2f} $E_g$"
+    #equation = f"$E_v$ = {cfm.intercept:.2f} + {cfm.coef[0]:.2f} $V_r$ + {cfm.coef[1]:.2f} $E_g$"
+    equation = f"$E_v$ = {cfm.intercept:.2f} + {cfm.coef[0]:.2f} $\\Sigma E_b$ + {cfm.coef[1]:.2f} $V_r$ + {cfm.coef[2]:.2f} $E_g$"
     plt.text(1, 9, equation, fontsize=9)
     mae = np.mean(np.abs(y - y_pred))
     plt.text(1, 8, f"MAE = {mae:.2f} eV", fontsize=9)
@@ -14,4 +14,13 @@ setup(
         'tqdm',
         'pySIPFENN',
     ],
+    extras_require={
+        'cfm': ['scikit-learn'],
+        'parquet': ['pyarrow'],
+    },
+    entry_points={
+        'console_scripts': [
+            'deftpy=deftpy.cli:main',
+        ],
+    },
 )
@@ -0,0 +1,77 @@
+import io
+import json
+import tarfile
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from deftpy.datasets import ArchiveIndex, iter_archives
+
+TEST_FILES = Path(__file__).parent.parent / "data" / "test_files"
+
+
+def write_archive(path, members):
+    with tarfile.open(path, "w:gz") as tar:
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+
+
+class TestArchiveIndex(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = Path(self.directory.name)
+        self.contcar = (TEST_FILES / "OQMD_CeO2_POSCAR.txt").read_bytes()
+        self.poscar = (TEST_FILES / "OQMD_HfO2_POSCAR.txt").read_bytes()
+        self.archives = []
+        for i in range(3):
+            archive = self.path / f"CeO2_Va_O1_{i}.tar.gz"
+            write_archive(archive, {
+                "./POSCAR-initial": self.poscar,
+                "OUTCAR-finish": b"x" * 100000,
+                "./CONTCAR-finish": self.contcar,
+            })
+            self.archives.append(archive)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_read_members(self):
+        index = ArchiveIndex()
+        contents = index.read(self.archives[0], ["CONTCAR-finish", "POSCAR-initial", "missing"])
+        self.assertEqual(contents, {"CONTCAR-finish": self.contcar, "POSCAR-initial": self.poscar})
+
+    def test_index_is_persisted_and_reused(self):
+        index_path = self.path / "index.json"
+        index = ArchiveIndex(index_path)
+        index.read(self.archives[0], ["CONTCAR-finish"])
+        index.save()
+        self.assertEqual(len(json.loads(index_path.read_text())), 1)
+        with mock.patch.object(ArchiveIndex, "scan", side_effect=AssertionError("archive was rescanned")):
+            contents = ArchiveIndex(index_path).read(self.archives[0], ["CONTCAR-finish"])
+        self.assertEqual(contents["CONTCAR-finish"], self.contcar)
+
+    def test_changed_archive_is_rescanned(self):
+        index = ArchiveIndex()
+        index.read(self.archives[0], ["CONTCAR-finish"])
+        write_archive(self.archives[0], {"CONTCAR-finish": self.poscar})
+        self.assertEqual(index.read(self.archives[0], ["CONTCAR-finish"])["CONTCAR-finish"], self.poscar)
+
+    def test_iter_archives(self):
+        index_path = self.path / "index.json"
+        archives = self.archives + [self.path / "broken.tar.gz"]
+        (self.path / "broken.tar.gz").write_bytes(b"not an archive")
+        results = list(iter_archives(archives, ["CONTCAR-finish", "OUTCAR-finish"], ArchiveIndex(index_path), 2))
+        self.assertEqual([Path(archive) for archive, _, _ in results], archives)
+        for _, contents, error in results[:3]:
+            self.assertIsNone(error)
+            self.assertEqual(contents["CONTCAR-finish"].composition.reduced_formula, "CeO2")
+            self.assertEqual(len(contents["OUTCAR-finish"]), 100000)
+        self.assertIsNotNone(results[3][2])
+        self.assertEqual(len(json.loads(index_path.read_text())), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+from pathlib import Path
+
+from pymatgen.core import Structure
+
+from deftpy.crystal_analysis import Crystal, featurize_structures
+
+
+def oxidized(structure):
+    structure.add_oxidation_state_by_guess()
+    return structure
+
+
+class TestFeaturizeStructures(unittest.TestCase):
+    def setUp(self):
+        test_files = Path(__file__).parent.parent / "data" / "test_files"
+        self.structures = [
+            oxidized(Structure.from_file(test_files / "OQMD_CeO2_POSCAR.txt")),
+            oxidized(Structure.from_file(test_files / "ICSD_CaTiO3_CIF.cif")),
+        ]
+        self.inputs = [self.structures[0], "not a POSCAR", self.structures[1]]
+
+    def check_results(self, results):
+        self.assertEqual([r.index for r in results], [0, 1, 2])
+        self.assertIsNone(results[0].error)
+        self.assertIsNotNone(results[1].error)
+        self.assertIsNone(results[1].cn_dicts)
+        for result, structure in zip([results[0], results[2]], self.structures):
+            crystal = Crystal(pymatgen_structure=structure)
+            self.assertEqual(result.cn_dicts, crystal.cn_dicts)
+            self.assertEqual(result.bond_dissociation_enthalpies, crystal.bond_dissociation_enthalpies)
+            self.assertEqual(result.reduction_potentials, crystal.reduction_potentials)
+
+    def test_in_process(self):
+        self.check_results(featurize_structures(self.inputs, n_workers=1))
+
+    def test_process_pool(self):
+        self.check_results(featurize_structures(self.inputs, n_workers=2, chunksize=2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+from pymatgen.analysis.local_env import CrystalNN
+from pymatgen.core import Structure
+
+from deftpy.cache import CoordinationCache, DescriptorCache, structure_fingerprint
+from deftpy.crystal_analysis import Crystal, featurize_structures
+
+TEST_FILES = Path(__file__).parent.parent / "data" / "test_files"
+
+
+class CountingCrystalNN(CrystalNN):
+    calls = 0
+
+    def get_cn_dict(self, structure, n, use_weights=False, **kwargs):
+        CountingCrystalNN.calls += 1
+        return super().get_cn_dict(structure, n, use_weights, **kwargs)
+
+
+class TestCoordinationCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = Path(self.directory.name) / "cache.sqlite"
+        self.structure = Structure.from_file(TEST_FILES / "OQMD_CaTiO3_POSCAR.txt")
+        self.structure.add_oxidation_state_by_guess()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_hit_skips_neighbor_analysis(self):
+        cache = CoordinationCache(self.path)
+        first = Crystal(pymatgen_structure=self.structure.copy(), nn_finder=CountingCrystalNN(), cache=cache)
+        first.compute()
+        calls = CountingCrystalNN.calls
+        self.assertGreater(calls, 0)
+        second = Crystal(pymatgen_structure=self.structure.copy(), nn_finder=CountingCrystalNN(), cache=cache)
+        cn_dicts = second.cn_dicts
+        self.assertEqual(CountingCrystalNN.calls, calls)
+        self.assertEqual(cn_dicts, first.cn_dicts)
+        self.assertEqual(second.site_indices, first.site_indices)
+        self.assertEqual(second.bond_dissociation_enthalpies, first.bond_dissociation_enthalpies)
+
+    def test_fingerprint_depends_on_settings(self):
+        key = structure_fingerprint(self.structure, nn_finder=CrystalNN(), species_symbol="O")
+        self.assertEqual(key, structure_fingerprint(self.structure.copy(), nn_finder=CrystalNN(), species_symbol="O"))
+        self.assertNotEqual(key, structure_fingerprint(self.structure, nn_finder=CrystalNN(), species_symbol="Ca"))
+        self.assertNotEqual(key, structure_fingerprint(self.structure, nn_finder=CrystalNN(search_cutoff=5)))
+        perturbed = self.structure.copy()
+        perturbed.translate_sites([0], [0.01, 0, 0])
+        self.assertNotEqual(key, structure_fingerprint(perturbed, nn_finder=CrystalNN(), species_symbol="O"))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = CoordinationCache(self.path, max_entries=2)
+        cache.put("a", {"value": 1})
+        cache.put("b", {"value": 2})
+        cache.get("a")
+        cache.put("c", {"value": 3})
+        self.assertEqual(len(cache), 2)
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+
+    def test_size_limit(self):
+        cache = CoordinationCache(self.path, max_bytes=40)
+        for key in "abcde":
+            cache.put(key, {"value": key})
+        self.assertLess(len(cache), 5)
+        self.assertIn("e", cache)
+
+    def test_shared_by_worker_processes(self):
+        cache = CoordinationCache(self.path)
+        results = featurize_structures([self.structure.copy(), self.structure.copy()], n_workers=2, cache=cache)
+        self.assertTrue(all(result.error is None for result in results))
+        self.assertEqual(len(cache), 1)
+
+
+class TestDescriptorCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = DescriptorCache(Path(self.directory.name) / "descriptors.sqlite", max_entries=2)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        self.cache.put_many({"a": np.arange(3.0), "b": np.ones(2)})
+        hits = self.cache.get_many(["a", "b", "c"])
+        self.assertEqual(set(hits), {"a", "b"})
+        self.assertEqual(hits["a"].dtype, np.float32)
+        np.testing.assert_array_equal(hits["a"], [0, 1, 2])
+        self.assertIsNone(self.cache.get("c"))
+
+    def test_eviction(self):
+        self.cache.put_many({"a": np.zeros(1), "b": np.zeros(1)})
+        self.cache.put("c", np.zeros(1))
+        self.assertEqual(len(self.cache), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
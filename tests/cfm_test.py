@@ -0,0 +1,111 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from deftpy.cfm import CrystalFeatureModel, fit_cfm, fit_cfms, kfold_indices, load_models, predict_many, save_models
+
+
+class LeastSquares:
+    def fit(self, X, y):
+        solution = np.linalg.lstsq(np.column_stack([X, np.ones(len(X))]), y, rcond=None)[0]
+        self.coef_, self.intercept_ = solution[:-1], solution[-1]
+        return self
+
+
+def make_dataset(n=60, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "Eb_sum": rng.uniform(5, 20, n),
+        "Vr_max": rng.uniform(-2, 2, n),
+        "Eg": rng.uniform(0, 8, n),
+        "charge": np.repeat([0, 1, 2], n // 3),
+    })
+    df["Ev"] = 1.0 + 0.2 * df["Eb_sum"] - 0.5 * df["Vr_max"] + 0.3 * df["Eg"] - df["charge"]
+    return df
+
+
+class TestCrystalFeatureModel(unittest.TestCase):
+    def test_fit_recovers_coefficients(self):
+        df = make_dataset()
+        df = df[df["charge"] == 0].copy()
+        df.loc[df.index[0], "Eb_sum"] = np.nan
+        model = fit_cfm(df, ["Eb_sum", "Vr_max", "Eg"], regressor=LeastSquares)
+        np.testing.assert_allclose(model.coef, [0.2, -0.5, 0.3])
+        self.assertAlmostEqual(model.intercept, 1.0)
+        self.assertEqual(model.metadata["n"], len(df) - 1)
+        self.assertAlmostEqual(model.metadata["cv_mae"], 0)
+        self.assertEqual(model.equation, "Ev = 1.00 + 0.20 Eb_sum - 0.50 Vr_max + 0.30 Eg")
+
+    def test_predict_inputs(self):
+        model = CrystalFeatureModel(["Vr_max", "Eg"], [-0.5, 0.3], 2.0)
+        df = make_dataset()
+        expected = 2.0 - 0.5 * df["Vr_max"].to_numpy() + 0.3 * df["Eg"].to_numpy()
+        np.testing.assert_allclose(model.predict(df), expected)
+        np.testing.assert_allclose(model.predict({"Vr_max": df["Vr_max"], "Eg": df["Eg"]}), expected)
+        np.testing.assert_allclose(model.predict(df[["Vr_max", "Eg"]].to_numpy()), expected)
+        with self.assertRaises(ValueError):
+            model.predict(df.to_numpy())
+
+    def test_kfold_indices(self):
+        folds = kfold_indices(11, 3)
+        self.assertEqual(sorted(np.concatenate(folds).tolist()), list(range(11)))
+        self.assertEqual([len(fold) for fold in folds], [4, 4, 3])
+        with self.assertRaises(ValueError):
+            kfold_indices(2, 3)
+
+
+class TestFitCFMs(unittest.TestCase):
+    def setUp(self):
+        self.datasets = {"a": make_dataset(seed=0), "b": make_dataset(seed=1).drop(columns="charge")}
+        self.feature_sets = [["Vr_max", "Eg"], ["Eb_sum", "Vr_max", "Eg"]]
+
+    def test_combinations(self):
+        models = fit_cfms(self.datasets, self.feature_sets, regressor=LeastSquares, n_workers=1)
+        self.assertEqual(len(models), 3 * 2 + 2)
+        self.assertEqual([(m.metadata["dataset"], m.metadata["charge"]) for m in models[:2]], [("a", 0), ("a", 0)])
+        self.assertEqual(models[-1].metadata["charge"], None)
+        self.assertAlmostEqual(models[1].intercept, 1.0)
+        self.assertAlmostEqual(models[5].intercept, -1.0)
+
+    def test_sparse_groups(self):
+        df = make_dataset()
+        sparse = pd.DataFrame({"Eb_sum": [10.0, 12.0, 14.0, 8.0], "Vr_max": [0.5, 1.0, -1.0, 0.0],
+                               "Eg": [1.0, 2.0, 3.0, 4.0], "charge": [3, 3, 3, 4]})
+        sparse["Ev"] = [1.0, 2.0, 3.0, np.nan]
+        df = pd.concat([df, sparse], ignore_index=True)
+        models = fit_cfms({"a": df}, [["Vr_max", "Eg"]], regressor=LeastSquares, n_workers=1)
+        self.assertEqual([m.metadata["charge"] for m in models], [0, 1, 2, 3])
+        self.assertEqual([m.metadata["n_splits"] for m in models], [5, 5, 5, 3])
+        self.assertEqual(models[-1].metadata["n"], 3)
+        self.assertIn("cv_mae", models[-1].metadata)
+
+        model = fit_cfm(df[df["charge"] == 3].head(1), ["Vr_max", "Eg"], regressor=LeastSquares)
+        self.assertEqual(model.metadata["n_splits"], 0)
+        self.assertNotIn("cv_mae", model.metadata)
+        with self.assertRaises(ValueError):
+            fit_cfm(df[df["charge"] == 4], ["Vr_max", "Eg"], regressor=LeastSquares)
+
+    def test_parallel_matches_serial(self):
+        serial = fit_cfms(self.datasets, self.feature_sets, regressor=LeastSquares, n_workers=1)
+        parallel = fit_cfms(self.datasets, self.feature_sets, regressor=LeastSquares, n_workers=2)
+        self.assertEqual([m.to_dict() for m in serial], [m.to_dict() for m in parallel])
+
+    def test_predict_many_and_serialization(self):
+        models = fit_cfms(self.datasets, self.feature_sets, regressor=LeastSquares, n_workers=1)
+        df = make_dataset(seed=2)
+        df.loc[0, "Eb_sum"] = np.nan
+        predictions = predict_many(models, df)
+        for k, model in enumerate(models):
+            np.testing.assert_allclose(predictions[k], model.predict(df))
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "cfms.json"
+            save_models(models, path)
+            loaded = load_models(path)
+        self.assertEqual([m.to_dict() for m in loaded], [m.to_dict() for m in models])
+
+
+if __name__ == '__main__':
+    unittest.main()
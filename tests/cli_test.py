@@ -0,0 +1,99 @@
+import importlib.util
+import json
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+import pandas as pd
+
+from deftpy.cli import CHECKPOINT_NAME, iter_inputs, main, read_checkpoint
+
+TEST_FILES = Path(__file__).parent.parent / "data" / "test_files"
+
+
+class TestCommandLine(unittest.TestCase):
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.inputs = self.directory / "inputs"
+        self.inputs.mkdir()
+        for name in ["OQMD_CeO2_POSCAR.txt", "OQMD_HfO2_POSCAR.txt", "OQMD_CaTiO3_POSCAR.txt"]:
+            shutil.copy(TEST_FILES / name, self.inputs / name)
+        self.output = self.directory / "features"
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def run_main(self, *args):
+        return main([str(self.inputs), "-o", str(self.output), "--format", "csv", "-j", "1", "-q", *args])
+
+    def read_shards(self):
+        return pd.concat([pd.read_csv(path) for path in sorted(self.output.glob("part-*.csv"))], ignore_index=True)
+
+    def test_iter_inputs(self):
+        manifest = self.directory / "manifest.txt"
+        manifest.write_text("# structures\ninputs/OQMD_CeO2_POSCAR.txt\n\ninputs/OQMD_HfO2_POSCAR.txt\n")
+        paths = list(iter_inputs([self.inputs / "*CeO2*", self.inputs], pattern="*CaTiO3*", manifests=[manifest]))
+        self.assertEqual([Path(path).name for path in paths],
+                         ["OQMD_CeO2_POSCAR.txt", "OQMD_HfO2_POSCAR.txt", "OQMD_CaTiO3_POSCAR.txt"])
+        with self.assertRaises(FileNotFoundError):
+            list(iter_inputs([self.directory / "missing*"]))
+
+    def test_structure_files_as_inputs(self):
+        files = sorted(str(path) for path in self.inputs.glob("*POSCAR*"))
+        self.assertEqual(list(iter_inputs(files)), files)
+        self.assertEqual(main([*files, "-o", str(self.output), "--format", "csv", "-j", "1", "-q"]), 0)
+        self.assertEqual(read_checkpoint(self.output)[0]["inputs"], files)
+        self.assertEqual(sorted(self.read_shards()["input"].unique()), files)
+
+    def test_manifest_option(self):
+        manifest = self.directory / "manifest.txt"
+        manifest.write_text("inputs/OQMD_CeO2_POSCAR.txt\n")
+        self.assertEqual(main(["--manifest", str(manifest), "-o", str(self.output), "--format", "csv", "-j", "1", "-q"]), 0)
+        self.assertEqual([Path(path).name for path in read_checkpoint(self.output)[0]["inputs"]],
+                         ["OQMD_CeO2_POSCAR.txt"])
+
+    def test_shards_and_resume(self):
+        self.assertEqual(self.run_main("--shard-size", "2", "--pattern", "*Ce*"), 0)
+        self.assertEqual(self.run_main("--shard-size", "2"), 0)
+        records = read_checkpoint(self.output)
+        self.assertEqual([len(record["inputs"]) for record in records], [1, 2])
+        self.assertEqual(self.run_main(), 0)
+        self.assertEqual(len(read_checkpoint(self.output)), 2)
+        df = self.read_shards()
+        self.assertEqual(sorted(Path(path).name for path in df["input"].unique()),
+                         sorted(path.name for path in self.inputs.iterdir()))
+        self.assertIn("Eb_sum", df.columns)
+
+    def test_interrupted_shard_is_redone(self):
+        self.assertEqual(self.run_main("--shard-size", "1"), 0)
+        checkpoint = self.output / CHECKPOINT_NAME
+        lines = checkpoint.read_text().splitlines()
+        checkpoint.write_text("\n".join(lines[:-1]) + "\n" + lines[-1][:10])
+        (self.output / json.loads(lines[-1])["shard"]).unlink()
+        self.assertEqual(self.run_main("--shard-size", "1"), 0)
+        self.assertEqual(len(read_checkpoint(self.output)), 3)
+        self.assertEqual(len(self.read_shards()["input"].unique()), 3)
+
+    def test_weights(self):
+        for args in [("--weights",), ("--weights", "--vectorized")]:
+            shutil.rmtree(self.output, ignore_errors=True)
+            self.assertEqual(self.run_main(*args), 0)
+            self.assertEqual(len(self.read_shards()["input"].unique()), 3)
+            self.assertEqual(read_checkpoint(self.output)[0]["errors"], {})
+
+    def test_failed_inputs(self):
+        (self.inputs / "broken_POSCAR").write_text("not a POSCAR")
+        self.assertEqual(self.run_main(), 1)
+        errors = read_checkpoint(self.output)[0]["errors"]
+        self.assertEqual([Path(path).name for path in errors], ["broken_POSCAR"])
+        self.assertEqual(self.run_main(), 0)
+        self.assertEqual(self.run_main("--retry-failed"), 1)
+
+    @unittest.skipIf(importlib.util.find_spec("pyarrow") is not None, "pyarrow is installed")
+    def test_parquet_requires_pyarrow(self):
+        self.assertEqual(main([str(self.inputs), "-o", str(self.output), "-q"]), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
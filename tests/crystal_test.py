@@ -0,0 +1,125 @@
+import unittest
+from pathlib import Path
+
+import pandas as pd
+from pymatgen.analysis.local_env import CrystalNN
+from pymatgen.core import Structure
+
+from deftpy import tables
+from deftpy.crystal_analysis import Crystal
+from deftpy.neighbors import VectorizedNN
+
+
+def load_structure(filename):
+    structure = Structure.from_file(Path(__file__).parent.parent / "data" / "test_files" / filename)
+    structure.add_oxidation_state_by_guess()
+    return structure
+
+
+class TestEquivalentSites(unittest.TestCase):
+    def setUp(self):
+        self.structure = load_structure("OQMD_CaTiO3_POSCAR.txt")
+
+    def test_distinct_sites(self):
+        crystal = Crystal(pymatgen_structure=self.structure)
+        self.assertEqual(crystal.site_indices, [4, 5])
+        self.assertEqual(crystal.multiplicities, [4, 8])
+        self.assertEqual(len(crystal.cn_dicts), 2)
+
+    def test_all_sites_are_broadcast(self):
+        crystal = Crystal(pymatgen_structure=self.structure, all_sites=True)
+        oxygen_indices = [i for i, site in enumerate(self.structure) if site.specie.symbol == "O"]
+        self.assertEqual(crystal.site_indices, oxygen_indices)
+        self.assertEqual(sum(1 / m for m in crystal.multiplicities), 2)
+        nn_finder = CrystalNN()
+        self.assertEqual(crystal.cn_dicts, [nn_finder.get_cn_dict(self.structure, i) for i in oxygen_indices])
+        self.assertEqual(len(crystal.bond_dissociation_enthalpies), len(oxygen_indices))
+
+
+class TestLazyFeatures(unittest.TestCase):
+    def setUp(self):
+        self.structure = load_structure("OQMD_CeO2_POSCAR.txt")
+
+    def test_construction_does_not_analyze(self):
+        crystal = Crystal(pymatgen_structure=self.structure, nn_finder=FailingCrystalNN())
+        self.assertIs(crystal.structure, self.structure)
+        with self.assertRaises(RuntimeError):
+            crystal.compute()
+
+    def test_compute_and_invalidate(self):
+        crystal = Crystal(pymatgen_structure=self.structure).compute()
+        self.assertEqual(crystal.cn_dicts, [{"Ce4+": 4}])
+        self.assertAlmostEqual(crystal.bond_dissociation_enthalpies[0]["Ce4+"], 2.6026499430331875)
+        crystal.structure.replace_species({"Ce4+": "Hf4+"})
+        crystal.invalidate()
+        self.assertEqual(crystal.cn_dicts, [{"Hf4+": 4}])
+        self.assertAlmostEqual(crystal.reduction_potentials[0]["Hf4+"], -2.8955178124350454)
+
+
+class TestSiteFeatures(unittest.TestCase):
+    def tearDown(self):
+        tables.reset_tables()
+
+    def test_aggregates_match_dicts(self):
+        crystal = Crystal(pymatgen_structure=load_structure("OQMD_CaTiO3_POSCAR.txt"), all_sites=True)
+        features = crystal.site_features
+        self.assertEqual(list(features["site_index"]), crystal.site_indices)
+        for row, cn_dict, eb, vr in zip(features.itertuples(), crystal.cn_dicts, crystal.bond_dissociation_enthalpies,
+                                        crystal.reduction_potentials):
+            self.assertEqual(row.CN, sum(cn_dict.values()))
+            self.assertAlmostEqual(row.Eb_sum, sum(cn * eb[s] for s, cn in cn_dict.items()))
+            self.assertAlmostEqual(row.Vr_max, max(vr.values()))
+            self.assertAlmostEqual(row.Vr_mean, sum(cn * vr[s] for s, cn in cn_dict.items()) / row.CN)
+
+    def test_missing_values_are_nan(self):
+        tables.register_table("Vr", pd.DataFrame({"elem": ["Ti"], "n": [4.0], "m": [3.0], "Vr": [-1.0]}))
+        features = Crystal(pymatgen_structure=load_structure("OQMD_CaTiO3_POSCAR.txt")).site_features
+        self.assertTrue(features["Vr_max"].isna().all())
+        self.assertFalse(features["Eb_sum"].isna().any())
+
+
+class RecordingVectorizedNN(VectorizedNN):
+    def get_cn_dicts(self, structure, indices, use_weights=False):
+        self.indices = list(indices)
+        return super().get_cn_dicts(structure, indices, use_weights=use_weights)
+
+
+class TestDerivedCrystal(unittest.TestCase):
+    def setUp(self):
+        self.structure = load_structure("OQMD_CaTiO3_POSCAR.txt") * (2, 2, 2)
+
+    def assertSameAnalysis(self, derived):
+        full = Crystal(pymatgen_structure=derived.structure.copy(), nn_finder=derived.nn_finder, all_sites=True)
+        self.assertEqual(derived.site_indices, full.site_indices)
+        self.assertEqual(derived.cn_dicts, full.cn_dicts)
+        self.assertEqual(derived.multiplicities, full.multiplicities)
+
+    def test_vacancy(self):
+        crystal = Crystal(pymatgen_structure=self.structure, nn_finder=VectorizedNN())
+        for index in crystal.view.site_indices("O")[:4]:
+            derived = crystal.with_vacancy(int(index))
+            self.assertEqual(len(derived.structure), len(self.structure) - 1)
+            self.assertSameAnalysis(derived)
+
+    def test_only_nearby_sites_are_analyzed(self):
+        nn_finder = RecordingVectorizedNN(search_cutoff=4)
+        crystal = Crystal(pymatgen_structure=self.structure, nn_finder=nn_finder, all_sites=True)
+        derived = crystal.with_vacancy(crystal.site_indices[0])
+        self.assertLess(len(nn_finder.indices), len(derived.site_indices))
+        self.assertSameAnalysis(derived)
+
+    def test_substitution(self):
+        crystal = Crystal(pymatgen_structure=load_structure("OQMD_CaTiO3_POSCAR.txt"))
+        derived = crystal.with_substitution(crystal.site_indices[0], "N3-")
+        self.assertNotIn(crystal.site_indices[0], derived.site_indices)
+        self.assertSameAnalysis(derived)
+        self.assertIn("Eb_sum", derived.site_features)
+
+
+class FailingCrystalNN(CrystalNN):
+    def get_cn_dict(self, structure, n, use_weights=False, **kwargs):
+        raise RuntimeError("neighbor analysis was run")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from pymatgen.core import Composition
+
+from deftpy.crystal_analysis import Crystal
+from deftpy.datasets import ColumnBuffer, featurize_dataset, featurize_records, featurize_witman, iter_witman_records
+
+TEST_FILES = Path(__file__).parent.parent / "data" / "test_files"
+
+
+class TestWitmanRecords(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.data_path = Path(self.directory.name)
+        for subdirectory in ["csvs", "poscars", "oxstate"]:
+            (self.data_path / subdirectory).mkdir()
+        self.add_structure("CaTiO3.0000001", "CaTiO3", "OQMD_CaTiO3_POSCAR.txt", "4*2.0 12*-2.0 4*4.0")
+        self.add_structure("CeO2.0000002", "CeO2", "OQMD_CeO2_POSCAR.txt", "1*4.0 2*-2.0")
+        # Filtered out before its POSCAR would be read, so the file does not need to exist
+        pd.DataFrame({"defectname": ["V_O"], "formula": ["Li2O"], "site": [1]}).to_csv(
+            self.data_path / "csvs" / "Li2O.0000003.csv", index=False
+        )
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def add_structure(self, filename, formula, poscar, oxstate):
+        pd.DataFrame({
+            "defectname": ["V_O", "V_O", "V_Ca"],
+            "formula": [formula] * 3,
+            "site": [1, 2, 3],
+            "dH_eV": [5.0, 5.5, 7.0],
+        }).to_csv(self.data_path / "csvs" / f"{filename}.csv", index=False)
+        shutil.copy(TEST_FILES / poscar, self.data_path / "poscars" / f"{filename}_POSCAR_wyck")
+        (self.data_path / "oxstate" / f"{filename}_oxstate").write_text(oxstate)
+
+    def test_records_are_filtered_and_parsed(self):
+        is_not_li2o = lambda formula: Composition(formula).reduced_formula != "Li2O"
+        records = list(iter_witman_records(self.data_path, formula_filter=is_not_li2o))
+        self.assertEqual([record.defectid for record in records], ["0000001", "0000002"])
+        self.assertEqual(list(records[0].rows["site"]), [1, 2])
+        self.assertEqual(str(records[0].structure[0].specie), "Ca2+")
+        self.assertEqual(records[1].oxidation_states, [4.0, -2.0, -2.0])
+
+    def test_unparsed_records(self):
+        records = iter_witman_records(self.data_path, defectname="V_Ca", parse_structures=False)
+        self.assertEqual([(record.defectid, record.structure) for record in records],
+                         [("0000001", None), ("0000002", None)])
+
+    def test_featurize_records(self):
+        records = iter_witman_records(self.data_path, formula_filter=lambda formula: formula != "Li2O")
+        results = list(featurize_records(records, n_workers=2))
+        self.assertEqual([record.defectid for record, _ in results], ["0000001", "0000002"])
+        self.assertEqual([features.index for _, features in results], [0, 1])
+        self.assertEqual(results[1][1].cn_dicts, [{"Ce4+": 4}])
+
+    def test_featurize_witman(self):
+        df = featurize_witman(self.data_path, columns=["defectid", "site"], feature_columns=["Eb_sum"], n_workers=1,
+                              formula_filter=lambda formula: formula != "Li2O")
+        # CeO2 has two V_O rows but one distinct oxygen site, so it is left out
+        self.assertEqual(list(df.columns), ["defectid", "site", "Eb_sum"])
+        self.assertEqual(list(df["site"]), [1, 2])
+        structure = next(iter_witman_records(self.data_path)).structure
+        np.testing.assert_allclose(df["Eb_sum"], Crystal(pymatgen_structure=structure).site_features["Eb_sum"])
+
+
+class TestFeaturizeDataset(unittest.TestCase):
+    def test_rows_are_joined_in_order(self):
+        records = [("b", "OQMD_CaTiO3_POSCAR.txt", 2), ("a", "OQMD_CeO2_POSCAR.txt", 1), ("c", "OQMD_HfO2_POSCAR.txt", 3)]
+        df = pd.DataFrame([
+            {"defectid": defectid, "site": site, "formula": poscar.split("_")[1], "structure": str(TEST_FILES / poscar)}
+            for defectid, poscar, n_rows in records for site in range(n_rows)
+        ])
+        result = featurize_dataset(df, feature_columns=["Eb_sum", "Vr_max"], n_workers=1)
+        self.assertEqual(list(result.columns), ["defectid", "site", "formula", "Eb_sum", "Vr_max"])
+        crystals = {defectid: Crystal(filepath=str(TEST_FILES / poscar)) for defectid, poscar, _ in records}
+        expected_ids = [d for d, _, n in records if len(crystals[d].site_indices) == n for _ in range(n)]
+        self.assertEqual(list(result["defectid"]), expected_ids)
+        expected = np.concatenate([crystals[d].site_features["Eb_sum"] for d in dict.fromkeys(expected_ids)])
+        np.testing.assert_allclose(result["Eb_sum"], expected)
+
+    def test_column_buffer_grows(self):
+        buffer = ColumnBuffer(capacity=2)
+        for i in range(5):
+            buffer.append({"id": ["x" * (i + 1)] * 3, "value": np.arange(3) + 0.5 * i})
+        df = buffer.to_frame()
+        self.assertEqual(len(df), 15)
+        self.assertEqual(df["id"].iloc[-1], "xxxxx")
+        self.assertEqual(df["value"].iloc[-1], 4.0)
+        with self.assertRaises(ValueError):
+            buffer.append({"id": ["y"]})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from deftpy.crystal_analysis import Crystal
+from deftpy.feature_store import FeatureStore
+
+TEST_FILES = Path(__file__).parent.parent / "data" / "test_files"
+
+
+def append_block(path, worker):
+    store = FeatureStore(path)
+    for block in range(5):
+        values = np.arange(10, dtype=float) + 100 * worker + 10 * block
+        store.append({"value": values}, structure_id=f"w{worker}-b{block}", worker=worker)
+
+
+class TestFeatureStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = Path(self.directory.name) / "store"
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_crystal_features(self):
+        store = FeatureStore(self.path)
+        frames = []
+        for name, eg in [("OQMD_CaTiO3_POSCAR.txt", 2.5), ("OQMD_CeO2_POSCAR.txt", 3.3)]:
+            site_features = Crystal(filepath=str(TEST_FILES / name), all_sites=True).site_features
+            rows = store.append(site_features, structure_id=name, formula=name.split("_")[1], Eg=eg)
+            self.assertEqual(len(rows), len(site_features))
+            frames.append(site_features.assign(structure_id=name, formula=name.split("_")[1], Eg=eg))
+        expected = pd.concat(frames, ignore_index=True)
+
+        reopened = FeatureStore(self.path)
+        self.assertEqual(len(reopened), len(expected))
+        self.assertEqual(reopened.schema["formula"], "str")
+        pd.testing.assert_frame_equal(reopened.read(list(expected.columns)), expected, check_dtype=False)
+        self.assertEqual(sorted(reopened.strings), sorted(set(expected["structure_id"]) | set(expected["formula"])))
+
+    def test_zero_copy_columns(self):
+        store = FeatureStore(self.path, schema={"Eb_sum": "float64", "formula": "str"})
+        store.append({"Eb_sum": np.arange(100.0), "formula": ["CaTiO3"] * 50 + ["CeO2"] * 50})
+        column = store.column("Eb_sum", rows=slice(10, 20))
+        self.assertIsInstance(column.base, np.memmap)
+        self.assertFalse(column.flags.writeable)
+        np.testing.assert_array_equal(column, np.arange(10.0, 20.0))
+        df = store.read(["formula"], rows=store.column("Eb_sum") >= 50)
+        self.assertEqual(set(df["formula"]), {"CeO2"})
+        with self.assertRaises(KeyError):
+            store.column("Vr_max")
+        with self.assertRaises(ValueError):
+            store.append({"Eb_sum": [1.0]})
+        with self.assertRaises(ValueError):
+            FeatureStore(self.path, schema={"Eb_sum": "float32", "formula": "str"})
+
+    def test_numeric_columns_keep_their_values(self):
+        store = FeatureStore(self.path)
+        store.append({"Eb_sum": [1, 2]}, Eg=3)
+        self.assertEqual(store.schema, {"Eb_sum": "<f8", "Eg": "<f8"})
+        store.append({"Eb_sum": [np.nan]}, Eg=3.7)
+        np.testing.assert_array_equal(store.column("Eg"), [3.0, 3.0, 3.7])
+        self.assertTrue(np.isnan(store.column("Eb_sum")[2]))
+
+    def test_lossy_casts_are_rejected(self):
+        store = FeatureStore(self.path, schema={"site_index": "int32", "Eb_sum": "float32"})
+        store.append({"site_index": [0, 1], "Eb_sum": [1.5, 2.5]})
+        for columns in [{"site_index": [0.5], "Eb_sum": [1.0]}, {"site_index": [np.nan], "Eb_sum": [1.0]},
+                        {"site_index": [2 ** 40], "Eb_sum": [1.0]}, {"site_index": [2], "Eb_sum": [0.1]},
+                        {"site_index": ["2"], "Eb_sum": [1.0]}]:
+            with self.assertRaises(ValueError):
+                store.append(columns)
+        self.assertEqual(len(store), 2)
+        store.append({"site_index": np.array([2], dtype=np.int64), "Eb_sum": [0.5]})
+        np.testing.assert_array_equal(store.column("site_index"), [0, 1, 2])
+
+    def test_interrupted_append_is_discarded(self):
+        store = FeatureStore(self.path)
+        store.append({"value": [1.0, 2.0]}, formula="CeO2")
+        with open(self.path / "value.bin", "ab") as file:
+            file.write(np.array([9.0]).tobytes())
+        with open(self.path / "strings.jsonl", "ab") as file:
+            file.write(b'"Hf')
+        self.assertEqual(len(store), 2)
+        store.append({"value": [3.0]}, formula="HfO2")
+        df = FeatureStore(self.path).read()
+        self.assertEqual(list(df["value"]), [1.0, 2.0, 3.0])
+        self.assertEqual(list(df["formula"]), ["CeO2", "CeO2", "HfO2"])
+
+    def test_concurrent_appends(self):
+        with ProcessPoolExecutor(max_workers=4) as executor:
+            list(executor.map(append_block, [self.path] * 4, range(4)))
+        df = FeatureStore(self.path).read()
+        self.assertEqual(len(df), 4 * 5 * 10)
+        expected = np.concatenate([np.arange(50.0) + 100 * worker for worker in range(4)])
+        np.testing.assert_array_equal(np.sort(df["value"]), expected)
+        for structure_id, rows in df.groupby("structure_id"):
+            worker, block = int(structure_id[1]), int(structure_id.split("b")[1])
+            np.testing.assert_array_equal(rows["value"], np.arange(10.0) + 100 * worker + 10 * block)
+            self.assertTrue((rows["worker"] == worker).all())
+
+
+if __name__ == '__main__':
+    unittest.main()
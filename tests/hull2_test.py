@@ -0,0 +1,58 @@
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+import pandas as pd
+from pymatgen.analysis.phase_diagram import PDEntry, PhaseDiagram
+from pymatgen.core import Composition
+
+from deftpy.hull2 import REFERENCE_PATH, HullService, load_reference_entries
+
+
+class TestHullService(unittest.TestCase):
+    def setUp(self):
+        self.references = [PDEntry(Composition("CaO"), -6.0), PDEntry(Composition("TiO2"), -9.0)]
+        self.service = HullService(self.references)
+
+    def test_matches_phase_diagram(self):
+        entries = [PDEntry(Composition("CaTiO3"), -16.0), PDEntry(Composition("Ca2TiO4"), -20.0)]
+        df = self.service.e_above_hull(entries)
+        elements = [PDEntry(Composition(element), 0.0) for element in ["Ca", "Ti", "O"]]
+        diagram = PhaseDiagram(elements + self.references)
+        for row, entry in zip(df.itertuples(), entries):
+            self.assertEqual(row.chemsys, "Ca-O-Ti")
+            self.assertAlmostEqual(row.e_above_hull, diagram.get_e_above_hull(entry, allow_negative=True))
+        self.assertLess(df["e_above_hull"][0], 0)
+
+    def test_diagrams_are_cached_per_system(self):
+        self.service.e_above_hull([PDEntry(Composition("CaTiO3"), -16.0), PDEntry(Composition("CaO2"), -6.0)])
+        self.assertEqual(len(self.service), 2)
+        diagram = self.service.get_phase_diagram(["Ti", "Ca", "O"])
+        self.assertIs(self.service.get_phase_diagram(["O", "Ca", "Ti"]), diagram)
+
+    def test_adding_references_invalidates_affected_systems(self):
+        ca_ti_o = self.service.get_phase_diagram(["Ca", "Ti", "O"])
+        ca_o = self.service.get_phase_diagram(["Ca", "O"])
+        self.service.add_reference_entries([PDEntry(Composition("CaTiO3"), -17.0)])
+        self.assertIs(self.service.get_phase_diagram(["Ca", "O"]), ca_o)
+        self.assertIsNot(self.service.get_phase_diagram(["Ca", "Ti", "O"]), ca_ti_o)
+        df = self.service.e_above_hull([PDEntry(Composition("CaTiO3"), -17.0)])
+        self.assertAlmostEqual(df["e_above_hull"][0], 0)
+
+    def test_reference_file_changes_are_reloaded(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "Eb.csv"
+            shutil.copy(REFERENCE_PATH, path)
+            service = HullService(filepath=path)
+            self.assertEqual(len(service.reference_entries), len(load_reference_entries()))
+            diagram = service.get_phase_diagram(["Ca", "O"])
+            self.assertIs(service.get_phase_diagram(["Ca", "O"]), diagram)
+            df = pd.read_csv(path)
+            pd.concat([df, pd.DataFrame({"type": ["fH"], "formula": ["CaO2"], "value": [-5.0]})]).to_csv(path)
+            self.assertIsNot(service.get_phase_diagram(["Ca", "O"]), diagram)
+            self.assertEqual(len(service.reference_entries), len(load_reference_entries()) + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
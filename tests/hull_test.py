@@ -0,0 +1,118 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from deftpy.cache import DescriptorCache
+from deftpy.hull import ModelSession
+
+TEST_FILES = Path(__file__).parent.parent / "data" / "test_files"
+
+
+def site_count_descriptor(structure):
+    return np.array([len(structure), structure.volume])
+
+
+class FakeCalculator:
+    """
+    Stands in for a pySIPFENN Calculator with two KS2022 models that predict the first descriptor entry plus an offset.
+    """
+
+    def __init__(self):
+        self.network_list_available = ["NN_b", "NN_a", "NN_ward"]
+        self.loadedModels = {}
+        self.loaded = []
+        self.prediction_calls = 0
+
+    def findCompatibleModels(self, descriptor):
+        return ["NN_a", "NN_b"] if descriptor == "KS2022" else ["NN_ward"]
+
+    def loadModels(self, network="all"):
+        self.loaded.append(network)
+        self.loadedModels[network] = {"NN_a": 0.0, "NN_b": 1.0, "NN_ward": 2.0}[network]
+
+    def makePredictions(self, models, toRun, dataInList):
+        self.prediction_calls += 1
+        return [[float(data[0]) + models[name] for name in toRun] for data in dataInList]
+
+
+class TestModelSession(unittest.TestCase):
+    def setUp(self):
+        self.calculator = FakeCalculator()
+        self.session = ModelSession(
+            calculator=self.calculator, generate_descriptor=lambda structure: np.array([len(structure), 0.0])
+        )
+        self.paths = sorted(TEST_FILES.glob("OQMD_*"))
+
+    def test_loads_compatible_models_once(self):
+        self.assertEqual(self.calculator.loaded, ["NN_a", "NN_b"])
+        ModelSession(calculator=self.calculator, generate_descriptor=len)
+        self.assertEqual(self.calculator.loaded, ["NN_a", "NN_b"])
+
+    def test_batches(self):
+        df = self.session.predict(self.paths, batch_size=2)
+        self.assertEqual(self.calculator.prediction_calls, 2)
+        self.assertEqual(list(df.columns), ["NN_a", "NN_b", "formation_energy_mean"])
+        self.assertEqual(list(df["NN_a"]), [20.0, 3.0, 12.0])
+        self.assertEqual(list(df["formation_energy_mean"]), [20.5, 3.5, 12.5])
+
+    def test_single_batch(self):
+        df = self.session.predict(self.paths)
+        self.assertEqual(self.calculator.prediction_calls, 1)
+        self.assertEqual(len(df), 3)
+
+    def test_structure_inputs(self):
+        path = TEST_FILES / "OQMD_CeO2_POSCAR.txt"
+        with tempfile.TemporaryDirectory() as directory:
+            renamed = Path(directory) / "ceo2.txt"
+            renamed.write_text(path.read_text())
+            df = self.session.predict([str(renamed), renamed, path.read_text(), TEST_FILES / "ICSD_CeO2_CIF.cif"])
+        self.assertEqual(list(df["NN_a"]), [3.0, 3.0, 3.0, 12.0])
+
+    def test_empty(self):
+        df = self.session.predict([], batch_size=2)
+        self.assertEqual(len(df), 0)
+        self.assertEqual(self.calculator.prediction_calls, 0)
+
+    def test_no_models(self):
+        self.calculator.network_list_available = []
+        with self.assertRaises(ValueError):
+            ModelSession(calculator=self.calculator, generate_descriptor=len)
+
+
+class TestDescriptorPipeline(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = DescriptorCache(Path(self.directory.name) / "descriptors.sqlite")
+        self.calls = 0
+
+        def counting_descriptor(structure):
+            self.calls += 1
+            return site_count_descriptor(structure)
+
+        self.session = ModelSession(calculator=FakeCalculator(), generate_descriptor=counting_descriptor)
+        self.paths = sorted(TEST_FILES.glob("OQMD_*"))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_cached_descriptors_are_reused(self):
+        first = self.session.get_descriptors(self.paths, cache=self.cache)
+        self.assertEqual(self.calls, 3)
+        self.assertEqual(first.dtype, np.float32)
+        second = self.session.get_descriptors(self.paths[:1] + self.paths, cache=self.cache)
+        self.assertEqual(self.calls, 3)
+        np.testing.assert_array_equal(second[1:], first)
+        np.testing.assert_array_equal(second[0], first[0])
+
+    def test_parallel_matches_serial(self):
+        session = ModelSession(calculator=FakeCalculator(), generate_descriptor=site_count_descriptor)
+        serial = session.predict(self.paths)
+        parallel = session.predict(self.paths, batch_size=2, cache=self.cache, n_workers=2)
+        self.assertTrue(serial.equals(parallel))
+        self.assertEqual(len(self.cache), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
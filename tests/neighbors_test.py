@@ -0,0 +1,61 @@
+import unittest
+from pathlib import Path
+
+from pymatgen.analysis.local_env import CrystalNN
+from pymatgen.core import Structure
+
+from deftpy.crystal_analysis import Crystal
+from deftpy.neighbors import VectorizedNN
+
+TEST_FILES = Path(__file__).parent.parent / "data" / "test_files"
+
+
+class TestVectorizedNN(unittest.TestCase):
+    def setUp(self):
+        self.structures = []
+        for filename in ["OQMD_CaTiO3_POSCAR.txt", "OQMD_HfO2_POSCAR.txt", "ICSD_CeO2_CIF.cif", "ICSD_CaTiO3_CIF.cif"]:
+            structure = Structure.from_file(TEST_FILES / filename)
+            structure.add_oxidation_state_by_guess()
+            self.structures.append(structure)
+
+    def test_matches_crystal_nn(self):
+        crystal_nn = CrystalNN()
+        for structure in self.structures:
+            indices = [i for i, site in enumerate(structure) if site.specie.symbol == "O"]
+            expected = [crystal_nn.get_cn_dict(structure, i) for i in indices]
+            self.assertEqual(VectorizedNN().get_cn_dicts(structure, indices), expected)
+
+    def test_matches_crystal_nn_all_sites(self):
+        for structure in self.structures:
+            indices = range(len(structure))
+            expected = [CrystalNN().get_cn_dict(structure, i) for i in indices]
+            self.assertEqual(VectorizedNN().get_cn_dicts(structure, indices), expected)
+
+    def test_matches_weighted_crystal_nn(self):
+        crystal_nn = CrystalNN(weighted_cn=True)
+        for structure in self.structures:
+            indices = range(len(structure))
+            cn_dicts = VectorizedNN(weighted_cn=True).get_cn_dicts(structure, indices, use_weights=True)
+            for i, cn_dict in zip(indices, cn_dicts):
+                expected = crystal_nn.get_cn_dict(structure, i, use_weights=True)
+                self.assertEqual(cn_dict.keys(), expected.keys())
+                for species_string, cn in expected.items():
+                    self.assertAlmostEqual(cn_dict[species_string], cn)
+
+    def test_supercell(self):
+        structure = self.structures[0] * (2, 2, 2)
+        cn_dicts = VectorizedNN().get_cn_dicts(structure, range(len(structure)))
+        self.assertEqual(len(cn_dicts), len(structure))
+        self.assertEqual(cn_dicts[0], VectorizedNN().get_cn_dict(self.structures[0], 0))
+
+    def test_weights_must_match(self):
+        with self.assertRaises(ValueError):
+            VectorizedNN().get_cn_dicts(self.structures[0], [4], use_weights=True)
+
+    def test_crystal_nn_finder(self):
+        crystal = Crystal(pymatgen_structure=self.structures[0], nn_finder=VectorizedNN())
+        self.assertEqual(crystal.cn_dicts, Crystal(pymatgen_structure=self.structures[0]).cn_dicts)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from pymatgen.core import Lattice, Structure
+
+from deftpy.crystal_analysis import Crystal
+from deftpy.oxidation import (
+    BondValenceOxidationStates,
+    GuessOxidationStates,
+    SiteOxidationStates,
+    guess_oxidation_states,
+    has_oxidation_states,
+    read_oxstate_file,
+)
+
+TEST_FILES = Path(__file__).parent.parent / "data" / "test_files"
+
+
+class TestOxidationStates(unittest.TestCase):
+    def setUp(self):
+        self.structure = Structure.from_file(TEST_FILES / "OQMD_CaTiO3_POSCAR.txt")
+
+    def test_guess_matches_pymatgen(self):
+        expected = self.structure.copy()
+        expected.add_oxidation_state_by_guess()
+        self.assertEqual(GuessOxidationStates().assign(self.structure), "guess")
+        self.assertEqual(self.structure.species, expected.species)
+
+    def test_guess_is_memoized_by_reduced_composition(self):
+        guess = guess_oxidation_states(self.structure.composition)
+        self.assertIs(guess, guess_oxidation_states((self.structure * (2, 1, 1)).composition))
+
+    def test_mixed_valence_guess_matches_pymatgen(self):
+        # Sb2O4 holds Sb3+ and Sb5+, which no single SbO2 formula unit can balance
+        coords = [[0, 0, 0], [0.5, 0.5, 0.5], [0.25, 0, 0], [0, 0.25, 0], [0.75, 0.5, 0.5], [0.5, 0.75, 0.5]]
+        structure = Structure(Lattice.cubic(5), ["Sb", "Sb", "O", "O", "O", "O"], coords)
+        expected = structure.copy()
+        expected.add_oxidation_state_by_guess()
+        GuessOxidationStates().assign(structure)
+        self.assertEqual(structure.species, expected.species)
+        self.assertEqual(structure[0].specie.oxi_state, 4)
+
+    def test_bond_valence(self):
+        self.assertEqual(BondValenceOxidationStates().assign(self.structure), "bond_valence")
+        self.assertTrue(has_oxidation_states(self.structure))
+
+    def test_bond_valence_fallback(self):
+        error = ValueError("Valences cannot be assigned!")
+        assigner = BondValenceOxidationStates()
+        self.assertIsInstance(assigner.fallback, GuessOxidationStates)
+        self.assertIsNot(assigner.fallback, BondValenceOxidationStates().fallback)
+        with mock.patch.object(assigner.analyzer, "get_valences", side_effect=error):
+            self.assertEqual(assigner.assign(self.structure), "guess")
+        strict = BondValenceOxidationStates(strict=True)
+        with mock.patch.object(strict.analyzer, "get_valences", side_effect=error):
+            with self.assertRaises(ValueError):
+                strict.assign(self.structure.copy())
+
+    def test_site_oxidation_states_from_file(self):
+        with tempfile.NamedTemporaryFile("w", suffix="_oxstate") as file:
+            file.write("4*2.0 12*-2.0 4*4.0\n")
+            file.flush()
+            self.assertEqual(read_oxstate_file(file.name), 4 * [2.0] + 12 * [-2.0] + 4 * [4.0])
+            assigner = SiteOxidationStates.from_file(file.name)
+        self.assertEqual(assigner.assign(self.structure), "by_site")
+        self.assertEqual(str(self.structure[0].specie), "Ca2+")
+        with self.assertRaises(ValueError):
+            SiteOxidationStates([2.0]).assign(self.structure)
+
+    def test_crystal_reports_strategy(self):
+        crystal = Crystal(pymatgen_structure=self.structure.copy())
+        self.assertEqual(crystal.cn_dicts, [{"Ti4+": 2, "Ca2+": 2}, {"Ti4+": 2, "Ca2+": 3}])
+        self.assertEqual(crystal.oxidation_strategy, "guess")
+        crystal = Crystal(pymatgen_structure=crystal.structure)
+        crystal.compute()
+        self.assertEqual(crystal.oxidation_strategy, "structure")
+
+
+if __name__ == '__main__':
+    unittest.main()
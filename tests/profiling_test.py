@@ -0,0 +1,72 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from deftpy import profiling
+from deftpy.crystal_analysis import Crystal, featurize_structures
+
+TEST_FILES = Path(__file__).parent.parent / "data" / "test_files"
+
+
+class TestProfiling(unittest.TestCase):
+    def setUp(self):
+        profiling.reset_process_stats()
+
+    def tearDown(self):
+        profiling.disable()
+        profiling.reset_process_stats()
+
+    def test_disabled_by_default(self):
+        crystal = Crystal(filepath=str(TEST_FILES / "OQMD_CeO2_POSCAR.txt")).compute()
+        self.assertFalse(crystal.stats)
+        self.assertFalse(profiling.get_process_stats())
+
+    def test_stage_stats(self):
+        profiling.enable()
+        crystal = Crystal(filepath=str(TEST_FILES / "OQMD_CeO2_POSCAR.txt")).compute()
+        stats = crystal.stats.as_dict()
+        for stage in ["parse", "oxidation", "view", "vacancy_sites", "neighbors", "lookup", "site_features"]:
+            self.assertIn(stage, stats)
+            self.assertGreaterEqual(stats[stage]["total"], stats[stage]["max"])
+        self.assertEqual(stats["lookup"]["count"], 2)
+        self.assertEqual(profiling.get_process_stats().as_dict()["neighbors"]["count"], 1)
+
+    def test_merge(self):
+        stats = profiling.StageStats()
+        stats.record("neighbors", 1.0)
+        stats.merge({"neighbors": {"count": 2, "total": 3.0, "max": 2.0}})
+        self.assertEqual(stats.as_dict(), {"neighbors": {"count": 3, "total": 4.0, "max": 2.0}})
+
+    def test_jsonl_and_hooks(self):
+        calls = []
+
+        def hook(stage, seconds, owner):
+            calls.append((stage, owner))
+
+        profiling.add_hook(hook)
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                path = Path(directory) / "profile.jsonl"
+                profiling.enable(path)
+                filepath = str(TEST_FILES / "OQMD_CeO2_POSCAR.txt")
+                crystal = Crystal(filepath=filepath).compute()
+                profiling.disable()
+                with open(path) as file:
+                    records = [json.loads(line) for line in file]
+        finally:
+            profiling.remove_hook(hook)
+        self.assertEqual(len(records), len(calls))
+        self.assertEqual({record["owner"] for record in records}, {filepath})
+        self.assertIn(("neighbors", crystal), calls)
+
+    def test_worker_stats_are_merged(self):
+        profiling.enable()
+        paths = [TEST_FILES / "OQMD_CeO2_POSCAR.txt", TEST_FILES / "OQMD_HfO2_POSCAR.txt"]
+        results = featurize_structures(paths, n_workers=2)
+        self.assertTrue(all(result.stats for result in results))
+        self.assertEqual(profiling.get_process_stats().as_dict()["neighbors"]["count"], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
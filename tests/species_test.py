@@ -0,0 +1,43 @@
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from pymatgen.core import Species
+
+from deftpy import species
+from deftpy.crystal_analysis import Crystal
+from deftpy.species import SpeciesKey, parse_species, parse_species_many
+
+
+class TestParseSpecies(unittest.TestCase):
+    def tearDown(self):
+        species.reset_species()
+
+    def test_matches_pymatgen(self):
+        for species_string in ["Ti4+", "O2-", "Na+", "Cl-", "Fe2.66666667+", "Fe2.67+", "Fe0+", "Fe2+,spin=5"]:
+            expected = Species.from_str(species_string)
+            key = parse_species(species_string)
+            self.assertEqual(key, SpeciesKey(expected.symbol, expected.oxi_state))
+            self.assertIsInstance(key.oxidation_state, float)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            parse_species("Fe")
+
+    def test_parsed_once(self):
+        species.reset_species()
+        with mock.patch("deftpy.species._parse", wraps=species._parse) as parse:
+            keys = parse_species_many(["Ti4+", "Ca2+", "Ti4+"] * 100)
+        self.assertEqual(parse.call_count, 2)
+        self.assertIs(keys[0], keys[2])
+
+    def test_crystal_lookups_do_not_construct_species(self):
+        crystal = Crystal(filepath=str(Path(__file__).parent.parent / "data" / "test_files" / "OQMD_CaTiO3_POSCAR.txt"))
+        crystal.cn_dicts
+        with mock.patch("deftpy.crystal_analysis.Species", side_effect=AssertionError("Species was constructed")):
+            self.assertFalse(crystal.site_features["Eb_sum"].isna().any())
+            self.assertEqual(len(crystal.bond_dissociation_enthalpies), len(crystal.cn_dicts))
+
+
+if __name__ == '__main__':
+    unittest.main()
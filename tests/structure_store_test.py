@@ -0,0 +1,59 @@
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from pymatgen.core import Structure
+
+from deftpy import structure_store
+from deftpy.crystal_analysis import Crystal
+from deftpy.structure_store import StructureStore, pack_structure, set_structure_store, unpack_structure
+
+TEST_FILES = Path(__file__).parent.parent / "data" / "test_files"
+
+
+class TestStructureStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = Path(self.directory.name)
+        self.store = StructureStore(self.path / "store")
+
+    def tearDown(self):
+        set_structure_store(None)
+        self.directory.cleanup()
+
+    def test_pack_round_trip(self):
+        structure = Structure.from_file(TEST_FILES / "ICSD_CaTiO3_CIF.cif")
+        self.assertEqual(unpack_structure(pack_structure(structure)), structure)
+        structure.add_oxidation_state_by_guess()
+        self.assertEqual(unpack_structure(pack_structure(structure)).species, structure.species)
+
+    def test_second_load_skips_parsing(self):
+        filepath = TEST_FILES / "ICSD_CeO2_CIF.cif"
+        first = self.store.load(filepath)
+        with mock.patch.object(structure_store, "parse_structure", side_effect=AssertionError("file was parsed")):
+            second = self.store.load(filepath)
+        self.assertEqual(second, first)
+        self.assertEqual(second.lattice, first.lattice)
+
+    def test_changed_file_is_parsed_again(self):
+        filepath = self.path / "POSCAR"
+        shutil.copy(TEST_FILES / "OQMD_CeO2_POSCAR.txt", filepath)
+        self.store.load(filepath)
+        shutil.copy(TEST_FILES / "OQMD_HfO2_POSCAR.txt", filepath)
+        os.utime(filepath, ns=(0, 10 ** 18))
+        self.assertEqual(self.store.load(filepath).composition.reduced_formula, "HfO2")
+
+    def test_crystal_loads_through_store(self):
+        set_structure_store(self.store)
+        filepath = TEST_FILES / "OQMD_CeO2_POSCAR.txt"
+        Crystal(filepath=str(filepath))
+        with mock.patch.object(structure_store, "parse_structure", side_effect=AssertionError("file was parsed")):
+            crystal = Crystal(filepath=str(filepath))
+        self.assertEqual(crystal.cn_dicts, [{"Ce4+": 4}])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+from pathlib import Path
+
+import numpy as np
+from pymatgen.analysis.defects.generators import VacancyGenerator
+from pymatgen.core import Structure
+
+from deftpy.crystal_analysis import Crystal
+from deftpy.neighbors import VectorizedNN
+from deftpy.structure_view import StructureView
+
+TEST_FILES = Path(__file__).parent.parent / "data" / "test_files"
+
+
+class TestStructureView(unittest.TestCase):
+    def setUp(self):
+        self.structures = []
+        for path in sorted(TEST_FILES.iterdir()):
+            structure = Structure.from_file(path)
+            structure.add_oxidation_state_by_guess()
+            self.structures.append(structure)
+
+    def test_round_trip(self):
+        for structure in self.structures:
+            view = StructureView.from_structure(structure)
+            self.assertEqual(len(view), len(structure))
+            self.assertEqual(view.to_structure(), structure)
+            np.testing.assert_allclose(view.cart_coords, structure.cart_coords)
+            self.assertEqual([view.species_strings[code] for code in view.species_codes],
+                             [site.species_string for site in structure])
+
+    def test_matches_vacancy_generator(self):
+        for structure in self.structures:
+            vacancies = VacancyGenerator().get_defects(structure)
+            expected = [(int(v.defect_site_index), len(v.equivalent_sites)) for v in vacancies]
+            groups = StructureView.from_structure(structure).equivalent_site_groups()
+            self.assertEqual([(int(group[0]), len(group)) for group in groups], expected)
+
+    def test_crystal_matches_vacancy_generator(self):
+        for structure in self.structures:
+            vacancies = [v for v in VacancyGenerator().get_defects(structure) if v.site.specie.symbol == "O"]
+            crystal = Crystal(pymatgen_structure=structure)
+            self.assertEqual(crystal.site_indices, [int(v.defect_site_index) for v in vacancies])
+            self.assertEqual(crystal.multiplicities, [len(v.equivalent_sites) for v in vacancies])
+
+    def test_vectorized_nn_accepts_view(self):
+        structure = self.structures[0]
+        view = StructureView.from_structure(structure)
+        indices = view.site_indices("O")
+        self.assertEqual(VectorizedNN().get_cn_dicts(view, indices), VectorizedNN().get_cn_dicts(structure, indices))
+
+    def test_disordered(self):
+        structure = Structure(self.structures[0].lattice, [{"Fe": 0.5, "Ni": 0.5}], [[0, 0, 0]])
+        with self.assertRaises(ValueError):
+            StructureView.from_structure(structure)
+
+
+if __name__ == '__main__':
+    unittest.main()
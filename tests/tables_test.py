@@ -0,0 +1,93 @@
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from pymatgen.core import Lattice, Structure
+
+from deftpy import tables
+from deftpy.crystal_analysis import Crystal
+
+
+class TestPropertyTables(unittest.TestCase):
+    def tearDown(self):
+        tables.reset_tables()
+
+    def test_tables_are_loaded_once(self):
+        self.assertIs(tables.get_table("Eb"), tables.get_table("Eb"))
+        self.assertIs(tables.get_table("Vr"), tables.get_table("Vr"))
+
+    def test_only_lookup_columns_are_read(self):
+        self.assertEqual(list(tables.get_table("Eb").columns), ["elem", "os", "Eb"])
+        self.assertEqual(list(tables.get_table("Vr").columns), ["elem", "n", "m", "Vr"])
+
+    def test_registered_table_is_used_by_crystal(self):
+        tables.register_table("Vr", pd.DataFrame({"elem": ["Ce"], "n": [4.0], "m": [3.0], "Vr": [-1.0]}))
+        crystal = Crystal(pymatgen_structure=cerium_oxide())
+        self.assertIs(crystal.vr, tables.get_table("Vr"))
+        self.assertEqual(crystal.reduction_potentials[0]["Ce4+"], -1.0)
+
+    def test_index_matches_first_row_semantics(self):
+        vr = tables.get_table("Vr")
+        index = tables.get_index("Vr", "Vr", "n")
+        for symbol, oxidation_state in [("Li", 2), ("Na", 4), ("Ce", 4), ("Ce", 7), ("Xx", 1)]:
+            rows = vr.loc[(vr.elem == symbol) & (vr.n == oxidation_state), "Vr"]
+            expected = rows.iloc[0] if not rows.empty else float("nan")
+            np.testing.assert_equal(index.get(symbol, oxidation_state), expected)
+            np.testing.assert_equal(index.get_many([symbol], [oxidation_state])[0], expected)
+
+    def test_index_is_rebuilt_for_registered_table(self):
+        index = tables.get_index("Eb", "Eb", "os")
+        self.assertIs(index, tables.get_index("Eb", "Eb", "os"))
+        tables.register_table("Eb", pd.DataFrame({"elem": ["Ce"], "os": [4.0], "Eb": [1.5]}))
+        self.assertEqual(tables.get_index("Eb", "Eb", "os").get("Ce", 4), 1.5)
+
+    def test_lookup_modes(self):
+        eb = pd.DataFrame({"elem": ["Fe", "Fe", "Fe"], "os": [2.0, 8 / 3, 3.0], "Eb": [1.0, 2.0, 4.0]})
+        tables.register_table("Eb", eb)
+        index = tables.get_index("Eb", "Eb", "os")
+        symbols = ["Fe", "Fe", "Fe", "Fe", "Fe", "Ce"]
+        states = [2.0, 2.67, 2.8, 3.5, 1.5, 4.0]
+        np.testing.assert_equal(index.get_many(symbols, states), [1.0, 2.0, np.nan, np.nan, np.nan, np.nan])
+        np.testing.assert_allclose(
+            index.get_many(symbols, states, mode="continuous"), [1.0, 2.0, 2.8, np.nan, np.nan, np.nan]
+        )
+        self.assertEqual(index.get("Fe", 2.67), 2.0)
+        self.assertTrue(np.isnan(index.get("Fe", 2.8)))
+        self.assertAlmostEqual(index.get("Fe", 2.8, mode="continuous"), 2.8)
+        self.assertTrue(np.isnan(index.get("Fe", 2.67, tolerance=0.001)))
+
+    def test_exact_lookups_skip_the_search(self):
+        tables.register_table("Eb", pd.DataFrame({"elem": ["Fe", "Fe"], "os": [2.0, 3.0], "Eb": [1.0, 4.0]}))
+        index = tables.get_index("Eb", "Eb", "os")
+        with mock.patch.object(index, "get_many", wraps=index.get_many) as get_many:
+            self.assertEqual(index.get("Fe", 3), 4.0)
+            self.assertEqual(index.get("Fe", 2.0, mode="continuous"), 1.0)
+            get_many.assert_not_called()
+            self.assertAlmostEqual(index.get("Fe", 2.5, mode="continuous"), 2.5)
+            get_many.assert_called_once()
+
+    def test_mixed_valence_crystal(self):
+        structure = Structure.from_spacegroup("Fm-3m", Lattice.cubic(4.3), ["Fe", "O"], [[0, 0, 0], [0.5, 0.5, 0.5]])
+        structure.add_oxidation_state_by_element({"Fe": 2.8, "O": -2})
+        discrete = Crystal(pymatgen_structure=structure).site_features
+        continuous = Crystal(pymatgen_structure=structure, lookup_mode="continuous").site_features
+        eb = tables.get_table("Eb")
+        eb = eb[eb.elem == "Fe"].sort_values("os")
+        expected = 6 * np.interp(2.8, eb["os"], eb["Eb"])
+        self.assertTrue(np.isnan(discrete["Eb_sum"][0]))
+        self.assertAlmostEqual(continuous["Eb_sum"][0], expected)
+
+    def test_unknown_table(self):
+        with self.assertRaises(KeyError):
+            tables.get_table("Ec")
+
+
+def cerium_oxide():
+    structure = Structure.from_spacegroup("Fm-3m", Lattice.cubic(5.41), ["Ce", "O"], [[0, 0, 0], [0.25, 0.25, 0.25]])
+    structure.add_oxidation_state_by_element({"Ce": 4, "O": -2})
+    return structure
+
+
+if __name__ == '__main__':
+    unittest.main()